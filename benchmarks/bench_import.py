@@ -0,0 +1,71 @@
+"""Import-time benchmark.
+
+Measures, in fresh interpreters, how long `import tinycert` followed by creating a Session takes, and checks that
+neither the HTTP stack nor the Python 2 compatibility shims are loaded along the way. Exits with status 1 if the
+median exceeds --max-ms or a deferred module was imported, so it can guard against regressions in CI.
+
+Usage: python benchmarks/bench_import.py [--runs N] [--max-ms MS]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# Modules that must only be imported once a request is made, or never on Python 3.
+DEFERRED = ('requests', 'urllib3', 'concurrent.futures')
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {deferred!r} if m in sys.modules]}}))
+'''
+
+STATEMENTS = [
+    ('import tinycert', 'import tinycert'),
+    ('Session()', 'from tinycert import Session\nSession("key")'),
+    ('import requests (for reference)', 'import requests'),
+]
+
+
+def measure(statement, runs):
+    samples = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', PROBE.format(statement=statement,
+                                                                             deferred=DEFERRED)], cwd=ROOT)
+        result = json.loads(output.decode('utf-8'))
+        samples.append(result['seconds'] * 1000)
+        loaded.update(result['loaded'])
+    return statistics.median(samples), sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=20, help='fresh interpreters per measurement')
+    parser.add_argument('--max-ms', type=float, default=50.0, help='fail if creating a Session takes longer')
+    args = parser.parse_args()
+
+    failed = False
+    for label, statement in STATEMENTS:
+        median_ms, loaded = measure(statement, args.runs)
+        print('%-34s %8.2f ms   loaded: %s' % (label, median_ms, ', '.join(loaded) or '-'))
+        if statement.startswith('import requests'):
+            continue
+        if loaded:
+            print('  FAIL: %s imported eagerly' % ', '.join(loaded))
+            failed = True
+        if median_ms > args.max_ms:
+            print('  FAIL: slower than %.1f ms' % args.max_ms)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Micro-benchmark for request signing.
+
+Measures signed payloads per second for a simple cert/details payload and a SAN-heavy cert/new payload, using
+both the original per-call algorithm and tinycert.signing.RequestSigner, and checks that both produce identical
+output.
+
+Usage: python benchmarks/bench_signing.py [--sans N] [--seconds S]
+"""
+
+import argparse
+import collections
+import hashlib
+import hmac
+import os
+import sys
+import timeit
+import urllib.parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from tinycert.session import Session  # noqa: E402
+from tinycert.signing import RequestSigner  # noqa: E402
+
+API_KEY = 'ThisIsMySuperSecretAPIKey'
+TOKEN = 'd7dd6880c206216a9ed74f92ca8edaef88728bbb2c8b23020c624de9a7d08d6f'
+
+
+def legacy_sign(params):
+    """The original Session._sign_request_payload: re-keyed HMAC, OrderedDict and urlencode per call."""
+    flattened_params = Session._flatten_array_elements(params)
+    ordered_params = collections.OrderedDict(sorted(flattened_params.items()))
+    query_string = urllib.parse.urlencode(ordered_params, True)
+    hasher = hmac.new(API_KEY.encode('utf-8'), digestmod=hashlib.sha256)
+    hasher.update(query_string.encode('utf-8'))
+    return query_string + '&digest=%s' % hasher.hexdigest()
+
+
+def payloads(san_count):
+    simple = {'cert_id': 123456, 'token': TOKEN}
+    san_heavy = {
+        'token': TOKEN,
+        'ca_id': 123,
+        'C': 'US',
+        'CN': '*.example.com',
+        'O': 'ACME, Inc.',
+        'OU': 'IT Department',
+        'SANs': [{'DNS': 'host%d.example.com' % i} for i in range(san_count)],
+    }
+    return [('simple cert/details', simple), ('cert/new with %d SANs' % san_count, san_heavy)]
+
+
+def rate(func, params, seconds):
+    timer = timeit.Timer(lambda: func(params))
+    number, elapsed = timer.autorange()
+    while elapsed < seconds:
+        number *= 2
+        elapsed = timer.timeit(number)
+    return number / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sans', type=int, default=100, help='number of SANs in the heavy payload')
+    parser.add_argument('--seconds', type=float, default=1.0, help='minimum time per measurement')
+    args = parser.parse_args(argv)
+
+    signer = RequestSigner(API_KEY)
+    print('%-28s %14s %14s %8s' % ('payload', 'legacy/s', 'signer/s', 'speedup'))
+    for name, params in payloads(args.sans):
+        if signer.sign(params) != legacy_sign(params):
+            raise SystemExit('signer output differs from the legacy algorithm for %s' % name)
+        legacy = rate(legacy_sign, params, args.seconds)
+        fast = rate(signer.sign, params, args.seconds)
+        print('%-28s %14.0f %14.0f %7.2fx' % (name, legacy, fast, fast / legacy))
+
+
+if __name__ == '__main__':
+    main()
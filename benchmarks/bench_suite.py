@@ -0,0 +1,232 @@
+"""End-to-end benchmark suite with regression thresholds.
+
+Measures, for each case, throughput, median/99th percentile latency and peak traced memory:
+
+- sign/flatten: Session._sign_request_payload and Session._flatten_array_elements on a cert/new payload with a
+  large SAN list
+- round-trip: a full Session.request of ca/list against a local FakeTinyCertServer over loopback HTTP
+- list/get/create: cert/list, cert/get and cert/new at 1, 8 and 64 concurrent threads sharing one session
+
+Latency and throughput are measured first; peak memory is measured in a second, shorter run under tracemalloc,
+so tracing does not slow the timed run. Each network case runs against its own freshly seeded server, for both
+runs, so results do not depend on which cases ran before. Memory includes the fake server's allocations, which
+run in-process.
+
+Results can be saved as a JSON baseline and later runs compared against it. A case regresses when its throughput
+falls, or its latency or peak memory grows, by more than the threshold (a fraction of the baseline value); the
+script then exits with status 1. Baselines are only comparable on the same machine and Python version.
+
+Usage: python benchmarks/bench_suite.py [--save FILE] [--compare FILE] [--threshold FRACTION] [--only TEXT]
+"""
+
+import argparse
+from contextlib import contextmanager
+from functools import partial
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from tinycert.fakeserver import FakeTinyCertServer  # noqa: E402
+from tinycert.session import Session, auto_session  # noqa: E402
+
+API_KEY = 'ThisIsMySuperSecretAPIKey'
+ACCOUNT = 'me@foo.com'
+PASSPHRASE = 'my passphrase'
+TOKEN = 'd7dd6880c206216a9ed74f92ca8edaef88728bbb2c8b23020c624de9a7d08d6f'
+CONCURRENCY = (1, 8, 64)
+ROUNDS = 8  # minimum calls per thread in the list, get and create cases
+DEFAULT_THRESHOLD = 0.25
+METRICS = (('ops_per_sec', 'ops/s', -1), ('p50_ms', 'p50 ms', 1), ('p99_ms', 'p99 ms', 1), ('peak_kib', 'peak KiB', 1))
+
+
+def san_payload(san_count):
+    return {
+        'token': TOKEN,
+        'ca_id': 123,
+        'C': 'US',
+        'CN': '*.example.com',
+        'O': 'ACME, Inc.',
+        'OU': 'IT Department',
+        'SANs': [{'DNS': 'host%d.example.com' % i} for i in range(san_count)],
+    }
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def timed(func, items, concurrency):
+    """Call func on every item from concurrency threads, returning (elapsed seconds, sorted per-call latencies)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def call(item):
+        started = time.perf_counter()
+        func(item)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        for item in items:
+            call(item)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(call, items))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return elapsed, latencies
+
+
+def measure(prepare, count, concurrency):
+    """Return the metrics of a case.
+
+    prepare(count) is a context manager yielding (func, items) with count items; it is entered once for the timed
+    run and once for the shorter traced run, so neither sees state left behind by the other.
+    """
+    with prepare(count) as (func, items):
+        timed(func, items[:concurrency], concurrency)  # warm up caches and open the connections
+        elapsed, latencies = timed(func, items, concurrency)
+    with prepare(max(concurrency, count // 10)) as (func, items):
+        timed(func, items[:concurrency], concurrency)
+        tracemalloc.start()
+        try:
+            timed(func, items, concurrency)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        'ops_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 4),
+        'peak_kib': round(peak / 1024.0, 1),
+    }
+
+
+@contextmanager
+def offline(func, item, count):
+    yield func, [item] * count
+
+
+@contextmanager
+def loopback(args, workload, concurrency, count):
+    """Start a freshly seeded FakeTinyCertServer and yield the workload's (func, items) on a connected session."""
+    server = FakeTinyCertServer().start()
+    try:
+        server.add_account(ACCOUNT, PASSPHRASE, API_KEY)
+        ca_id = server.add_ca()
+        cert_ids = [server.add_cert(ca_id, 'host%d.example.com' % i, sans=[{'DNS': 'alt%d.example.com' % i}])
+                    for i in range(args.certs)]
+        new_ca_id = server.add_ca('New certificates')  # so cert/new does not grow the listed CA
+        details = dict(san_payload(10), CN='new.example.com')
+        del details['token'], details['ca_id']
+
+        with auto_session(API_KEY, ACCOUNT, PASSPHRASE, base_url=server.base_url,
+                          pool_maxsize=concurrency) as session:
+            if workload == 'round-trip':
+                yield lambda _: session.request('ca/list'), [None] * count
+            elif workload == 'list':
+                yield lambda _: session.cert.list(ca_id), [None] * count
+            elif workload == 'get':
+                yield lambda cert_id: session.cert.get(cert_id, 'cert'), [
+                    cert_ids[i % len(cert_ids)] for i in range(count)]
+            else:
+                yield lambda _: session.cert.create(new_ca_id, details), [None] * count
+    finally:
+        server.stop()
+
+
+def cases(args):
+    """Yield (name, prepare, count, concurrency) for every benchmark case; see measure()."""
+    payload = san_payload(args.sans)
+    yield ('sign: cert/new with %d SANs' % args.sans,
+           partial(offline, Session(API_KEY)._sign_request_payload, payload), args.iterations, 1)
+    yield 'flatten: %d SANs' % args.sans, partial(offline, Session._flatten_array_elements, payload), args.iterations, 1
+    yield 'round-trip: ca/list', partial(loopback, args, 'round-trip', 1), args.calls, 1
+    for concurrency in CONCURRENCY:
+        for workload, calls in (('list', args.calls // 4), ('get', args.calls), ('create', args.calls)):
+            # Enough calls for every thread to make several, so the threads really overlap.
+            count = max(calls, concurrency * ROUNDS)
+            yield ('%s x%d' % (workload, concurrency), partial(loopback, args, workload, concurrency), count,
+                   concurrency)
+
+
+def run(args):
+    results = {}
+    for name, prepare, count, concurrency in cases(args):
+        if args.only and args.only not in name:
+            continue
+        results[name] = measure(prepare, count, concurrency)
+        print('%-30s %s' % (name, '  '.join('%s %10.4g' % (label, results[name][key])
+                                            for key, label, _ in METRICS)))
+    return results
+
+
+def regressions(results, baseline, threshold):
+    """Return a description of every metric in results that is worse than baseline by more than threshold."""
+    found = []
+    for name, metrics in sorted(results.items()):
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for key, label, direction in METRICS:
+            if not expected.get(key):
+                continue
+            change = (metrics[key] - expected[key]) / float(expected[key])
+            if change * direction > threshold:
+                found.append('%s: %s %.4g vs baseline %.4g (%+.0f%%)' % (
+                    name, label, metrics[key], expected[key], change * 100))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sans', type=int, default=500, help='number of SANs in the sign and flatten payload')
+    parser.add_argument('--iterations', type=int, default=2000, help='calls per sign and flatten case')
+    parser.add_argument('--calls', type=int, default=1000,
+                        help='calls per round-trip, get and create case; list makes a quarter, and no case fewer than '
+                             '%d per thread' % ROUNDS)
+    parser.add_argument('--certs', type=int, default=200, help='certificates in the listed CA')
+    parser.add_argument('--only', help='run only the cases whose name contains this text')
+    parser.add_argument('--save', metavar='FILE', help='write the results to FILE as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare the results with the baseline in FILE')
+    parser.add_argument('--threshold', type=float,
+                        help='allowed regression as a fraction, e.g. 0.25 (default: from the baseline, else %s)'
+                        % DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as source:
+            baseline = json.load(source)
+    results = run(args)
+
+    if args.save:
+        threshold = args.threshold if args.threshold is not None else DEFAULT_THRESHOLD
+        with open(args.save, 'w') as target:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'threshold': threshold,
+                       'results': results}, target, indent=2, sort_keys=True)
+            target.write('\n')
+        print('saved baseline to %s' % args.save)
+
+    if baseline is not None:
+        threshold = args.threshold if args.threshold is not None else baseline.get('threshold', DEFAULT_THRESHOLD)
+        found = regressions(results, baseline['results'], threshold)
+        for line in found:
+            print('REGRESSION %s' % line)
+        if found:
+            return 1
+        print('no regressions beyond %.0f%% of %s' % (threshold * 100, args.compare))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
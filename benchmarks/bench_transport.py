@@ -0,0 +1,99 @@
+"""Transport benchmark.
+
+Runs the same batch of cert/details calls through each transport from a pool of worker threads and reports
+requests per second and median/99th percentile latency. By default the calls go to a local FakeTinyCertServer,
+which speaks HTTP/1.1 only; pass --base-url and credentials for a server that negotiates HTTP/2 over TLS to
+measure multiplexing against it.
+
+Usage: python benchmarks/bench_transport.py [--calls N] [--workers N]
+       python benchmarks/bench_transport.py --base-url URL --api-key KEY --account EMAIL --passphrase PW --cert-id ID
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from tinycert.fakeserver import FakeTinyCertServer  # noqa: E402
+from tinycert.session import auto_session  # noqa: E402
+from tinycert.transport import InProcessTransport, RequestsTransport  # noqa: E402
+
+
+def transports(args, server):
+    options = [('requests (HTTP/1.1 pool)', lambda: RequestsTransport(pool_maxsize=args.workers))]
+    try:
+        import h2  # noqa: F401 pylint: disable=unused-import
+        from tinycert.transport import Http2Transport
+        options.append(('httpx (HTTP/2 if offered)', lambda: Http2Transport(max_connections=args.workers)))
+    except ImportError:
+        print('httpx[http2] not installed; skipping Http2Transport')
+    if server is not None:
+        options.append(('in-process', lambda: InProcessTransport(server)))
+    return options
+
+
+def measure(session, cert_ids, workers):
+    latencies = []
+    lock = threading.Lock()
+
+    def call(cert_id):
+        started = time.perf_counter()
+        session.cert.details(cert_id)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(call, cert_ids))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(cert_ids) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--calls', type=int, default=2000, help='cert/details calls per transport')
+    parser.add_argument('--workers', type=int, default=32, help='concurrent threads')
+    parser.add_argument('--base-url', help='benchmark against this server instead of a local fake')
+    parser.add_argument('--api-key', default='somekey')
+    parser.add_argument('--account', default='me@foo.com')
+    parser.add_argument('--passphrase', default='my passphrase')
+    parser.add_argument('--cert-id', type=int, help='certificate to fetch details for, with --base-url')
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url:
+        if args.cert_id is None:
+            parser.error('--base-url requires --cert-id')
+        base_url, cert_ids = args.base_url, [args.cert_id] * args.calls
+    else:
+        server = FakeTinyCertServer().start()
+        server.add_account(args.account, args.passphrase, args.api_key)
+        ca_id = server.add_ca()
+        base_url = server.base_url
+        cert_ids = [server.add_cert(ca_id, 'host%d.example.com' % i) for i in range(100)]
+        cert_ids = (cert_ids * (args.calls // len(cert_ids) + 1))[:args.calls]
+
+    print('%d calls, %d workers, %s' % (args.calls, args.workers, base_url))
+    try:
+        for label, make_transport in transports(args, server):
+            transport = make_transport()
+            with auto_session(args.api_key, args.account, args.passphrase, base_url=base_url,
+                              transport=transport) as session:
+                session.cert.details(cert_ids[0])
+                rate, p50, p99 = measure(session, cert_ids, args.workers)
+            version = getattr(transport, 'http_version', None)
+            print('%-28s %9.0f req/s   p50 %7.2f ms   p99 %7.2f ms%s' % (
+                label, rate, p50 * 1000, p99 * 1000, '   (%s)' % version if version else ''))
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
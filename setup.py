@@ -43,11 +43,15 @@ from setuptools import setup
 VERSION = '0.1.2'
 
 INSTALL_DEPS = [
-    'enum34>=1.1.2',
-    'future>=0.16.0',
     'requests>=2.9.1'
 ]
 
+EXTRAS = {
+    'async': ['httpx>=0.18.0'],
+    'http2': ['httpx[http2]>=0.18.0'],
+    'scan': ['cryptography>=35.0'],
+}
+
 TEST_DEPS = [
     'mock>=1.3.0',
     'nose>=1.3.7',
@@ -67,7 +71,12 @@ setup(
     license='MIT',
     long_description=__doc__,
     packages=['tinycert'],
+    python_requires='>=3.7',
     install_requires=INSTALL_DEPS,
+    extras_require=EXTRAS,
+    entry_points={
+        'console_scripts': ['tinycert=tinycert.cli:main'],
+    },
     tests_require=TEST_DEPS,
     test_suite='nose.collector',
     platforms='any',
@@ -78,8 +87,13 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.7',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Topic :: Security',
         'Topic :: Security :: Cryptography',
         'Topic :: Software Development :: Libraries :: Python Modules'
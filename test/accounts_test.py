@@ -0,0 +1,103 @@
+"""Unit tests for the accounts module."""
+
+import os
+import time
+import unittest
+
+from tinycert.accounts import Account, AccountManager, WorkerError
+from tinycert.fakeserver import FakeTinyCertServer
+
+
+def timed_details(session, cert_id):
+    """Fetch a certificate's details, returning when the call started and ended with the certificate id."""
+    started = time.time()
+    details = session.cert.details(cert_id)
+    return started, time.time(), details['id']
+
+
+def exit_worker(session, item):
+    os._exit(1)
+
+
+def max_overlap(intervals):
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    current = peak = 0
+    for _, change in events:
+        current += change
+        peak = max(peak, current)
+    return peak
+
+
+class AccountManagerTest(unittest.TestCase):
+    """Unit tests for the AccountManager class, run against FakeTinyCertServer."""
+    PROCESSES = 2
+
+    def setUp(self):
+        self.server = FakeTinyCertServer(latency=lambda path: 0.02 if path == 'cert/details' else 0.0).start()
+        self.accounts = [Account('key-%d' % number, 'user%d@example.com' % number, 'secret %d' % number)
+                         for number in range(3)]
+        for account in self.accounts:
+            self.server.add_account(account.email, account.passphrase, account.api_key)
+        ca_id = self.server.add_ca()
+        self.cert_ids = [self.server.add_cert(ca_id, 'host%d.example.com' % number) for number in range(40)]
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _manager(self, **options):
+        return AccountManager(self.accounts, processes=self.PROCESSES, base_url=self.server.base_url, **options)
+
+    def testRunsAcrossAccountsWithOneSessionEach(self):
+        emails = [account.email for account in self.accounts]
+        with self._manager() as manager:
+            self.assertEqual(manager.accounts, emails)
+            work = dict((email, self.cert_ids[:5]) for email in emails)
+            results = list(manager.run('cert.details', work))
+            self.assertEqual(len(results), 15)
+            self.assertTrue(all(result.ok for result in results))
+            self.assertEqual(sorted((result.account, result.index) for result in results),
+                             sorted((email, index) for email in emails for index in range(5)))
+            self.assertTrue(all(result.result['id'] == result.item for result in results))
+
+            results = list(manager.run('ca.list', dict((email, [()]) for email in emails)))
+            self.assertEqual([len(result.result) for result in results], [1, 1, 1])
+            self.assertEqual(self.server.calls['connect'], 3)
+
+            failed = list(manager.run('cert.details', {emails[0]: [999]}))
+            self.assertEqual(failed[0].account, emails[0])
+            self.assertIn('400', str(failed[0].error))
+            with self.assertRaises(ValueError):
+                list(manager.run('cert.details', {'nobody@example.com': [1]}))
+        self.assertEqual(self.server.calls['disconnect'], 3)
+
+    def testLimitsAndFairness(self):
+        big, small, other = [account.email for account in self.accounts]
+        work = {big: self.cert_ids, small: self.cert_ids[:4], other: self.cert_ids[:4]}
+        with self._manager(max_concurrency=2, limits={big: 3}) as manager:
+            results = list(manager.run(timed_details, work))
+
+        self.assertEqual(len(results), 48)
+        for email, limit in ((big, 3), (small, 2), (other, 2)):
+            intervals = [result.result[:2] for result in results if result.account == email]
+            self.assertLessEqual(max_overlap(intervals), limit)
+        # The small accounts finish long before the large one, rather than queueing behind it.
+        last_small = max(position for position, result in enumerate(results) if result.account != big)
+        self.assertLess(last_small, 24)
+
+    def testWorkerExit(self):
+        if not self.PROCESSES:
+            self.skipTest('thread shards cannot exit on their own')
+        email = self.accounts[0].email
+        with self._manager() as manager:
+            results = list(manager.run(exit_worker, {email: [1]}, poll_interval=0.05))
+            self.assertIsInstance(results[0].error, WorkerError)
+            self.assertTrue(list(manager.run('cert.details', {email: self.cert_ids[:1]}))[0].ok)
+
+
+class InProcessAccountManagerTest(AccountManagerTest):
+    """The same tests with the shards run as threads."""
+    PROCESSES = 0
+
+
+if __name__ == '__main__':
+    unittest.main()
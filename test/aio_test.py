@@ -0,0 +1,138 @@
+"""Unit tests for the aio module."""
+
+import asyncio
+import unittest
+
+from tinycert.deadline import ConnectTimeout, ReadTimeout
+
+try:
+    import httpx
+    from tinycert.aio import AsyncSession, async_auto_session
+except ImportError:  # optional dependency
+    httpx = None
+
+
+@unittest.skipIf(httpx is None, 'httpx is not installed')
+class AsyncSessionTest(unittest.TestCase):
+    """Unit tests for the AsyncSession class."""
+    FAKE_API_KEY = 'somekey'
+    FAKE_SESSION_TOKEN = 'sometoken'
+    FAKE_ACCOUNT = 'me@foo.com'
+    FAKE_PASSPHRASE = 'my passphrase'
+
+    EXPECTED_CONNECT_BODY = ('email=me%40foo.com'
+                             '&passphrase=my+passphrase'
+                             '&digest=9b8062b8ab91dd2ff4bb9d24d7be5234659ba94c772a8e056d26388e052b8537')
+    EXPECTED_DISCONNECT_BODY = ('token=sometoken'
+                                '&digest=a83d65e81eb4e6cae1b0fc95c26f6ac838e278f22b0a94d8a42c4a193a58420d')
+
+    def setUp(self):
+        self.requests = []
+
+    def _handler(self, request):
+        body = request.content.decode('utf-8')
+        path = request.url.path
+        self.requests.append((path, body))
+        if path == '/api/v1/connect':
+            if body == self.EXPECTED_CONNECT_BODY:
+                return httpx.Response(200, json={'token': self.FAKE_SESSION_TOKEN})
+            return httpx.Response(400, json={})
+        if path == '/api/v1/disconnect':
+            if body == self.EXPECTED_DISCONNECT_BODY:
+                return httpx.Response(200, json={})
+            return httpx.Response(400, json={})
+        if path == '/api/v1/cert/details':
+            return httpx.Response(200, json={'id': 123, 'status': 'good'})
+        return httpx.Response(404)
+
+    def testConnectAndDisconnect(self):
+        async def run():
+            session = AsyncSession(self.FAKE_API_KEY, transport=httpx.MockTransport(self._handler))
+            await session.connect(self.FAKE_ACCOUNT, self.FAKE_PASSPHRASE)
+            self.assertEqual(session._session_token, self.FAKE_SESSION_TOKEN)
+            await session.disconnect()
+            self.assertIsNone(session._session_token)
+            self.assertIsNone(session._client)
+
+        asyncio.run(run())
+
+    def testContextManagerAwaitsApiMethods(self):
+        async def run():
+            async with async_auto_session(self.FAKE_API_KEY, self.FAKE_ACCOUNT, self.FAKE_PASSPHRASE,
+                                          transport=httpx.MockTransport(self._handler)) as session:
+                result = await session.cert.details(123)
+                self.assertEqual(result, {'id': 123, 'status': 'good'})
+            self.assertIsNone(session._session_token)
+
+        asyncio.run(run())
+        self.assertEqual([path for path, _ in self.requests],
+                         ['/api/v1/connect', '/api/v1/cert/details', '/api/v1/disconnect'])
+        self.assertTrue(self.requests[1][1].startswith('cert_id=123&token=sometoken&digest='))
+
+    def testThreadedHelpersAreRejected(self):
+        session = AsyncSession(self.FAKE_API_KEY, self.FAKE_SESSION_TOKEN)
+        for call in (lambda: session.cert.iter_list(1), lambda: session.cert.export_many([(1, 'cert')]),
+                     lambda: session.cert.create_many(1, [{'CN': 'a'}])):
+            with self.assertRaises(TypeError) as raised:
+                call()
+            self.assertIn('AsyncSession', str(raised.exception))
+        self.assertEqual(self.requests, [])
+
+    def testHttpErrorRaised(self):
+        async def run():
+            session = AsyncSession(self.FAKE_API_KEY, transport=httpx.MockTransport(self._handler))
+            with self.assertRaises(httpx.HTTPStatusError):
+                await session.connect(self.FAKE_ACCOUNT, 'wrong passphrase')
+            await session.close()
+
+        asyncio.run(run())
+
+    def testTimeoutsAreMapped(self):
+        seen = []
+
+        def handler(request):
+            seen.append(request.extensions['timeout'])
+            if request.url.path == '/api/v1/connect':
+                raise httpx.ConnectTimeout('timed out', request=request)
+            raise httpx.ReadTimeout('timed out', request=request)
+
+        async def run():
+            session = AsyncSession(self.FAKE_API_KEY, self.FAKE_SESSION_TOKEN, timeout=(2.0, 5.0),
+                                   transport=httpx.MockTransport(handler))
+            with self.assertRaises(ConnectTimeout) as connect_error:
+                await session.connect(self.FAKE_ACCOUNT, self.FAKE_PASSPHRASE)
+            with self.assertRaises(ReadTimeout) as read_error:
+                await session.cert.details(1)
+            await session.close()
+            return connect_error.exception, read_error.exception
+
+        connect_error, read_error = asyncio.run(run())
+        self.assertEqual(connect_error.path, 'connect')
+        self.assertEqual(read_error.path, 'cert/details')
+        self.assertEqual(seen[0], {'connect': 2.0, 'read': 5.0, 'write': 5.0, 'pool': 2.0})
+
+    def testConcurrencyIsBounded(self):
+        in_flight = [0]
+        peak = [0]
+
+        async def handler(request):
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(0.001)
+            in_flight[0] -= 1
+            return httpx.Response(200, json={'id': 1})
+
+        async def run():
+            session = AsyncSession(self.FAKE_API_KEY, self.FAKE_SESSION_TOKEN, max_concurrency=5,
+                                   transport=httpx.MockTransport(handler))
+            results = await asyncio.gather(*[session.cert.details(i) for i in range(50)])
+            await session.close()
+            return results
+
+        results = asyncio.run(run())
+        self.assertEqual(len(results), 50)
+        self.assertEqual(peak[0], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
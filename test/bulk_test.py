@@ -0,0 +1,70 @@
+"""Unit tests for the bulk module."""
+
+import threading
+import time
+import unittest
+
+from tinycert.bulk import run_bulk
+
+
+class RunBulkTest(unittest.TestCase):
+    """Unit tests for the run_bulk function."""
+    def testOrderedResults(self):
+        def slow_first(item):
+            if item == 0:
+                time.sleep(0.05)
+            return item * 2
+
+        results = list(run_bulk(slow_first, range(20), max_workers=4, ordered=True))
+        self.assertEqual([r.index for r in results], list(range(20)))
+        self.assertEqual([r.result for r in results], [i * 2 for i in range(20)])
+        self.assertTrue(all(r.ok for r in results))
+
+    def testCompletionOrderResults(self):
+        def slow_first(item):
+            if item == 0:
+                time.sleep(0.05)
+            return item
+
+        results = list(run_bulk(slow_first, range(6), max_workers=3))
+        self.assertEqual(sorted(r.result for r in results), list(range(6)))
+        self.assertEqual(results[-1].index, 0)
+
+    def testErrorsArePerItem(self):
+        def fail_odd(item):
+            if item % 2:
+                raise ValueError(item)
+            return item
+
+        results = list(run_bulk(fail_odd, range(10), max_workers=3, ordered=True))
+        self.assertEqual([r.ok for r in results], [i % 2 == 0 for i in range(10)])
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertIsNone(results[1].result)
+
+    def testBoundedConcurrencyAndLazyInput(self):
+        lock = threading.Lock()
+        state = {'in_flight': 0, 'peak': 0, 'pulled': 0}
+
+        def work(item):
+            with lock:
+                state['in_flight'] += 1
+                state['peak'] = max(state['peak'], state['in_flight'])
+            time.sleep(0.001)
+            with lock:
+                state['in_flight'] -= 1
+            return item
+
+        def source():
+            for i in range(1000):
+                state['pulled'] += 1
+                yield i
+
+        results = run_bulk(work, source(), max_workers=4)
+        next(results)
+        self.assertLessEqual(state['pulled'], 9)
+        self.assertEqual(len(list(results)), 999)
+        self.assertLessEqual(state['peak'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
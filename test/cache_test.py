@@ -0,0 +1,91 @@
+"""Unit tests for the cache module."""
+
+import unittest
+
+import requests_mock
+
+from tinycert.cache import ReadCache
+from tinycert.session import Session
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ReadCacheTest(unittest.TestCase):
+    """Unit tests for the ReadCache class."""
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ReadCache({'ca/details': 10, 'cert/details': 10}, maxsize=2, clock=self.clock)
+
+    def _put(self, path, params, value):
+        key = self.cache.key(path, params)
+        self.cache.put(key, value, self.cache.generation)
+        return key
+
+    def testTtlExpiry(self):
+        key = self._put('ca/details', {'ca_id': 1, 'token': 'x'}, 'one')
+        self.assertEqual(self.cache.get(key), (True, 'one'))
+        self.clock.now += 11
+        self.assertEqual(self.cache.get(key), (False, None))
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 0})
+
+    def testTokenIsNotPartOfKey(self):
+        self.assertEqual(self.cache.key('ca/details', {'ca_id': 1, 'token': 'a'}),
+                         self.cache.key('ca/details', {'ca_id': 1, 'token': 'b'}))
+
+    def testUncachedPaths(self):
+        self.assertIsNone(self.cache.key('cert/get', {'cert_id': 1}))
+        self.assertIsNone(self.cache.key('ca/details', {'ca_id': [1]}))
+
+    def testLruEviction(self):
+        first = self._put('ca/details', {'ca_id': 1}, 'one')
+        second = self._put('ca/details', {'ca_id': 2}, 'two')
+        self.cache.get(first)
+        self._put('ca/details', {'ca_id': 3}, 'three')
+        self.assertEqual(self.cache.get(first), (True, 'one'))
+        self.assertEqual(self.cache.get(second), (False, None))
+        self.assertEqual(self.cache.evictions, 1)
+
+    def testInvalidationByParam(self):
+        first = self._put('cert/details', {'cert_id': 1}, 'one')
+        second = self._put('cert/details', {'cert_id': 2}, 'two')
+        self.cache.invalidate('cert/status', {'cert_id': 1, 'status': 'hold'})
+        self.assertEqual(self.cache.get(first), (False, None))
+        self.assertEqual(self.cache.get(second), (True, 'two'))
+
+    def testStalePutAfterInvalidationIsDropped(self):
+        key = self.cache.key('cert/details', {'cert_id': 1})
+        generation = self.cache.generation
+        self.cache.invalidate('cert/reissue', {'cert_id': 1})
+        self.cache.put(key, 'stale', generation)
+        self.assertEqual(len(self.cache), 0)
+
+
+class SessionCacheTest(unittest.TestCase):
+    """Unit tests for caching through Session.request."""
+    @requests_mock.Mocker()
+    def testStatusChangeInvalidatesDetails(self, mock_requests):
+        statuses = ['good', 'hold']
+        mock_requests.register_uri('POST', 'https://www.tinycert.org/api/v1/cert/details',
+                                   json=lambda request, context: {'id': 5, 'status': statuses[0]})
+        mock_requests.register_uri('POST', 'https://www.tinycert.org/api/v1/cert/status', json={})
+
+        session = Session('somekey', 'sometoken', cache=ReadCache())
+        self.assertEqual(session.cert.details(5)['status'], 'good')
+        self.assertEqual(session.cert.details(5)['status'], 'good')
+        self.assertEqual(mock_requests.call_count, 1)
+
+        session.cert.set_status(5, 'hold')
+        statuses.pop(0)
+        self.assertEqual(session.cert.details(5)['status'], 'hold')
+        self.assertEqual(mock_requests.call_count, 3)
+        self.assertEqual(session.cache.stats()['hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
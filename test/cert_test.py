@@ -14,6 +14,7 @@ class CertificateApiTest(unittest.TestCase):
     def setUp(self):
         self.session = mock.MagicMock()
         self.session.request = mock.MagicMock()
+        self.session.asynchronous = False
         self.api = CertificateApi(self.session)
 
     def list_test(self):
@@ -101,3 +102,22 @@ class CertificateApiTest(unittest.TestCase):
         result = self.api.create(123, create_detail)
         self.assertEqual(result, expected_result)
         self.session.request.assert_called_with('cert/new', expected_detail)
+
+    def create_many_test(self):
+        def create(path, params):
+            if params['CN'] == 'bad':
+                raise ValueError('bad SANs')
+            return {'cert_id': params['CN']}
+        self.session.request.side_effect = create
+
+        details = [{'CN': 'a'}, {'CN': 'bad'}, {'CN': 'c'}]
+        results = list(self.api.create_many(123, details, max_workers=2, ordered=True))
+        self.assertEqual([r.result for r in results], [{'cert_id': 'a'}, None, {'cert_id': 'c'}])
+        self.assertIsInstance(results[1].error, ValueError)
+        self.session.request.assert_any_call('cert/new', {'CN': 'a', 'ca_id': 123})
+
+    def export_many_test(self):
+        with mock.patch('tinycert.cert.export') as export:
+            self.api.export_many([(1, 'cert')], directory='/tmp/out', max_workers=2)
+            export.assert_called_with(self.session, [(1, 'cert')], directory='/tmp/out', sink=None, max_workers=2,
+                                      ordered=False, overwrite=False)
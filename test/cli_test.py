@@ -0,0 +1,139 @@
+"""Unit tests for the cli module."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from tinycert.cli import main, read_manifest
+from tinycert.fakeserver import FakeTinyCertServer
+
+
+class CliTest(unittest.TestCase):
+    """Unit tests for the tinycert command-line tool, run against FakeTinyCertServer."""
+    API_KEY = 'somekey'
+    ACCOUNT = 'me@foo.com'
+    PASSPHRASE = 'my passphrase'
+
+    def setUp(self):
+        self.server = FakeTinyCertServer().start()
+        self.server.add_account(self.ACCOUNT, self.PASSPHRASE, self.API_KEY)
+        self.ca_id = self.server.add_ca('Acme CA')
+        self.cert_id = self.server.add_cert(self.ca_id, 'www.example.com')
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def _run(self, *argv, **kwargs):
+        stdout = io.StringIO()
+        argv = ['--api-key', self.API_KEY, '--account', self.ACCOUNT, '--passphrase', self.PASSPHRASE,
+                '--base-url', self.server.base_url] + list(argv)
+        status = main(argv, stdin=kwargs.get('stdin'), stdout=stdout)
+        return status, stdout.getvalue()
+
+    def testSingleOperations(self):
+        status, output = self._run('list')
+        self.assertEqual(status, 0)
+        self.assertEqual([ca['name'] for ca in json.loads(output)], ['Acme CA'])
+
+        status, output = self._run('list', str(self.ca_id), '--state', 'good')
+        self.assertEqual([cert['id'] for cert in json.loads(output)], [self.cert_id])
+        status, output = self._run('list', str(self.ca_id), '--state', 'revoked')
+        self.assertEqual(json.loads(output), [])
+
+        self.assertEqual(json.loads(self._run('details', str(self.cert_id))[1])['CN'], 'www.example.com')
+        self.assertEqual(json.loads(self._run('details', '--ca', str(self.ca_id))[1])['id'], self.ca_id)
+        self.assertIn('BEGIN CERTIFICATE', self._run('get', str(self.cert_id), '--what', 'chain')[1])
+
+        status, output = self._run('create', str(self.ca_id), '{"CN": "new.example.com", "C": "US", "O": "Acme"}')
+        new_id = json.loads(output)['cert_id']
+        self.assertEqual(self.server.certs[new_id]['CN'], 'new.example.com')
+
+        detail_path = os.path.join(self.directory, 'ca.json')
+        with io.open(detail_path, 'w', encoding='utf-8') as detail:
+            detail.write('{"C": "US", "O": "Acme", "hash_method": "sha256"}')
+        self.assertIn('ca_id', json.loads(self._run('create', '--ca', '@' + detail_path)[1]))
+
+        self.assertIn('cert_id', json.loads(self._run('reissue', str(self.cert_id))[1]))
+        self.assertEqual(self._run('status', str(self.cert_id), 'revoked')[0], 0)
+        self.assertEqual(self.server.certs[self.cert_id]['status'], 'revoked')
+        self.assertEqual(self.server.calls['connect'], self.server.calls['disconnect'])
+
+    def testApiErrorsSetExitStatus(self):
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            status, output = self._run('details', '999')
+        self.assertEqual((status, output), (1, ''))
+        self.assertIn('400', stderr.getvalue())
+
+    def testTimeouts(self):
+        self.server.latency = lambda path: 0.3 if path == 'cert/details' else 0.0
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            self.assertEqual(self._run('--timeout', '0.05', 'details', str(self.cert_id))[0], 1)
+        self.assertIn('no response within 0.05s', stderr.getvalue())
+
+        lines = [json.dumps({'op': 'details', 'cert_id': self.cert_id})] * 20
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            status, output = self._run('--deadline', '0.5', 'batch', '-j', '1', stdin=io.StringIO('\n'.join(lines)))
+        self.assertEqual(status, 1)
+        self.assertLess(len(output.splitlines()), 20)
+        self.assertIn('deadline exceeded', stderr.getvalue())
+        self.assertEqual(self.server.calls['connect'], self.server.calls['disconnect'])
+
+    def testCredentialsFromEnvironment(self):
+        environ = {'TINYCERT_API_KEY': self.API_KEY, 'TINYCERT_ACCOUNT': self.ACCOUNT,
+                   'TINYCERT_PASSPHRASE': self.PASSPHRASE, 'TINYCERT_BASE_URL': self.server.base_url}
+        stdout = io.StringIO()
+        with mock.patch.dict(os.environ, environ):
+            self.assertEqual(main(['list'], stdout=stdout), 0)
+        with mock.patch.dict(os.environ, {'TINYCERT_API_KEY': ''}):
+            with mock.patch('sys.stderr', new_callable=io.StringIO):
+                with self.assertRaises(SystemExit):
+                    main(['--account', self.ACCOUNT, '--passphrase', self.PASSPHRASE, 'list'])
+
+    def testBatch(self):
+        lines = [json.dumps({'op': 'details', 'cert_id': self.cert_id, 'id': 'a'}), '',
+                 json.dumps({'op': 'create', 'ca_id': self.ca_id, 'detail': {'CN': 'b.example.com'}}),
+                 'not json',
+                 json.dumps({'op': 'status', 'cert_id': self.cert_id}),
+                 json.dumps({'op': 'explode'})]
+        lines += [json.dumps({'op': 'get', 'cert_id': self.cert_id})] * 50
+        status, output = self._run('batch', '-j', '16', '--ordered', stdin=io.StringIO('\n'.join(lines) + '\n'))
+        records = [json.loads(line) for line in output.splitlines()]
+
+        self.assertEqual(status, 1)
+        self.assertEqual(len(records), 55)
+        self.assertEqual([record['line'] for record in records[:5]], [1, 3, 4, 5, 6])
+        self.assertEqual(records[0]['id'], 'a')
+        self.assertEqual(records[0]['result']['CN'], 'www.example.com')
+        self.assertTrue(records[1]['ok'])
+        self.assertIn('invalid manifest line', records[2]['error'])
+        self.assertEqual(records[3]['error'], 'OperationError: status requires status')
+        self.assertIn('unknown op', records[4]['error'])
+        self.assertTrue(all(record['ok'] and 'pem' in record['result'] for record in records[5:]))
+
+    def testBatchFromFile(self):
+        manifest = os.path.join(self.directory, 'manifest.jsonl')
+        with io.open(manifest, 'w', encoding='utf-8') as out:
+            for _ in range(200):
+                out.write(json.dumps({'op': 'list', 'ca_id': self.ca_id, 'states': ['good']}) + '\n')
+        status, output = self._run('batch', manifest, '--workers', '8')
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(json.loads(line)['line'] for line in output.splitlines()), list(range(1, 201)))
+
+    def testManifestIsReadLazily(self):
+        def lines():
+            yield '{"op": "list"}'
+            raise AssertionError('read too far')
+
+        manifest = read_manifest(lines())
+        self.assertEqual(next(manifest), (1, {'op': 'list'}))
+
+
+if __name__ == '__main__':
+    unittest.main()
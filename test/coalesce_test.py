@@ -0,0 +1,172 @@
+"""Unit tests for the coalesce module."""
+
+import threading
+import unittest
+
+from tinycert.cache import ReadCache
+from tinycert.coalesce import Coalescer
+from tinycert.fakeserver import FakeTinyCertServer
+from tinycert.session import auto_session
+
+
+class Interrupted(BaseException):
+    pass
+
+
+class CoalescerTest(unittest.TestCase):
+    """Unit tests for the Coalescer class."""
+    def setUp(self):
+        self.coalescer = Coalescer()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def _fetch(self, value):
+        def fetch():
+            self.calls += 1
+            self.release.wait(5)
+            if isinstance(value, BaseException):
+                raise value
+            return value
+        return fetch
+
+    def _start(self, path, params, value, results, count):
+        threads = [threading.Thread(target=self._call, args=(path, params, value, results)) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _call(self, path, params, value, results):
+        try:
+            results.append(self.coalescer.call(path, params, self._fetch(value)))
+        except Exception as error:  # pylint: disable=broad-except
+            results.append(error)
+
+    def _wait_for_waiters(self, count):
+        while self.coalescer.stats()['coalesced'] < count:
+            threading.Event().wait(0.001)
+
+    def testConcurrentIdenticalReadsShareOneCall(self):
+        results = []
+        threads = self._start('ca/details', {'ca_id': 1}, {'id': 1}, results, 10)
+        self._wait_for_waiters(9)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [{'id': 1}] * 10)
+        self.assertEqual(self.coalescer.stats(), {'executed': 1, 'coalesced': 9, 'in_flight': 0})
+
+    def testErrorsAreShared(self):
+        results = []
+        error = ValueError('boom')
+        threads = self._start('cert/details', {'cert_id': 1}, error, results, 3)
+        self._wait_for_waiters(2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [error] * 3)
+        self.assertEqual(self.coalescer.in_flight, 0)
+
+    def testInterruptionIsNotShared(self):
+        leader_result = []
+
+        def lead():
+            try:
+                self.coalescer.call('cert/details', {'cert_id': 1}, self._fetch(Interrupted()))
+            except Interrupted as error:
+                leader_result.append(error)
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        while self.coalescer.in_flight < 1:
+            threading.Event().wait(0.001)
+        results = []
+        threads = self._start('cert/details', {'cert_id': 1}, {'id': 1}, results, 2)
+        self._wait_for_waiters(2)
+        self.release.set()
+        for thread in [leader] + threads:
+            thread.join()
+        self.assertIsInstance(leader_result[0], Interrupted)
+        self.assertEqual(results, [{'id': 1}] * 2)
+        self.assertEqual(self.coalescer.in_flight, 0)
+
+    def testKeys(self):
+        self.assertEqual(self.coalescer.key('ca/details', {'ca_id': 1, 'token': 'a'}),
+                         self.coalescer.key('ca/details', {'ca_id': 1, 'token': 'b'}))
+        self.assertNotEqual(self.coalescer.key('ca/details', {'ca_id': 1}),
+                            self.coalescer.key('ca/details', {'ca_id': 2}))
+        self.assertIsNone(self.coalescer.key('cert/new', {'ca_id': 1}))
+        self.assertIsNone(self.coalescer.key('cert/details', {'cert_id': [1]}))
+
+        self.release.set()
+        self.assertEqual(self.coalescer.call('cert/new', {}, self._fetch('new')), 'new')
+        self.assertEqual(self.coalescer.stats()['executed'], 0)
+
+    def testWritesDetachInFlightReads(self):
+        first = []
+        threads = self._start('cert/details', {'cert_id': 1}, 'before', first, 1)
+        while self.coalescer.in_flight == 0:
+            threading.Event().wait(0.001)
+        self.coalescer.invalidate('cert/status', {'cert_id': 2})
+        self.assertEqual(self.coalescer.in_flight, 1)
+        self.coalescer.invalidate('cert/status', {'cert_id': 1})
+        self.assertEqual(self.coalescer.in_flight, 0)
+
+        self.release.set()
+        self.assertEqual(self.coalescer.call('cert/details', {'cert_id': 1}, self._fetch('after')), 'after')
+        threads[0].join()
+        self.assertEqual(first, ['before'])
+        self.assertEqual(self.coalescer.stats(), {'executed': 2, 'coalesced': 0, 'in_flight': 0})
+
+
+class SessionCoalescingTest(unittest.TestCase):
+    """Tests of Session(coalescer=...) against FakeTinyCertServer."""
+    API_KEY = 'somekey'
+    ACCOUNT = 'me@foo.com'
+    PASSPHRASE = 'my passphrase'
+
+    def setUp(self):
+        self.server = FakeTinyCertServer(latency=lambda path: 0.2 if path == 'ca/details' else 0.0).start()
+        self.server.add_account(self.ACCOUNT, self.PASSPHRASE, self.API_KEY)
+        self.ca_id = self.server.add_ca()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _hammer(self, session, count):
+        barrier = threading.Barrier(count)
+        results = []
+
+        def lookup():
+            barrier.wait()
+            results.append(session.ca.details(self.ca_id))
+
+        threads = [threading.Thread(target=lookup) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def testConcurrentDetailsAreCoalesced(self):
+        coalescer = Coalescer()
+        with auto_session(self.API_KEY, self.ACCOUNT, self.PASSPHRASE, base_url=self.server.base_url,
+                          coalescer=coalescer, pool_maxsize=20) as session:
+            results = self._hammer(session, 20)
+        self.assertEqual(len(results), 20)
+        self.assertTrue(all(result['name'] == 'Test CA' for result in results))
+        self.assertEqual(self.server.calls['ca/details'], 1)
+        self.assertEqual(coalescer.stats(), {'executed': 1, 'coalesced': 19, 'in_flight': 0})
+
+    def testWithCache(self):
+        coalescer = Coalescer()
+        with auto_session(self.API_KEY, self.ACCOUNT, self.PASSPHRASE, base_url=self.server.base_url,
+                          coalescer=coalescer, cache=ReadCache(), pool_maxsize=20) as session:
+            self._hammer(session, 10)
+            self._hammer(session, 10)
+        self.assertEqual(self.server.calls['ca/details'], 1)
+        self.assertEqual(session.cache.stats()['hits'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
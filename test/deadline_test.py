@@ -0,0 +1,239 @@
+"""Unit tests for the deadline module."""
+
+import threading
+import time
+import unittest
+
+import requests
+
+from tinycert.bulk import run_bulk
+from tinycert.coalesce import Coalescer
+from tinycert.deadline import (ConnectTimeout, Deadline, DeadlineExceeded, ReadTimeout, TimeoutException,
+                               call_timeout, request_timeout)
+from tinycert.fakeserver import FakeTinyCertServer
+from tinycert.scheduler import AdaptiveScheduler
+from tinycert.session import Session, auto_session
+from tinycert.transport import InProcessTransport, Transport
+
+API_KEY = 'somekey'
+ACCOUNT = 'me@foo.com'
+PASSPHRASE = 'my passphrase'
+
+
+class DeadlineTest(unittest.TestCase):
+    """Unit tests for the Deadline class and request_timeout."""
+    def setUp(self):
+        self.now = 100.0
+        self.clock = lambda: self.now
+
+    def testRemainingAndCancel(self):
+        deadline = Deadline(10, clock=self.clock)
+        self.now += 4
+        self.assertEqual(deadline.remaining(), 6.0)
+        self.assertFalse(deadline.expired)
+        deadline.cancel()
+        self.assertEqual(deadline.remaining(), 0.0)
+        with self.assertRaises(DeadlineExceeded) as raised:
+            deadline.check('cert/list')
+        self.assertEqual(str(raised.exception), 'cert/list: deadline cancelled')
+
+        unlimited = Deadline()
+        self.assertIsNone(unlimited.remaining())
+        unlimited.cancel()
+        self.assertTrue(unlimited.expired)
+
+    def testRequestTimeout(self):
+        self.assertEqual(request_timeout('ca/list', (5, 30)), (5, 30))
+        with call_timeout(2):
+            self.assertEqual(request_timeout('ca/list', (5, 30)), (2, 2))
+            with Deadline(10, clock=self.clock), Deadline(20, clock=self.clock):
+                self.assertEqual(request_timeout('ca/list', None), (2, 2))
+                self.now += 9
+                self.assertEqual(request_timeout('ca/list', None), (1.0, 1.0))
+                self.now += 1
+                with self.assertRaises(DeadlineExceeded):
+                    request_timeout('ca/list', None)
+            self.assertEqual(Deadline.active(), ())
+        self.assertEqual(request_timeout('ca/list', None), (None, None))
+
+
+class SessionTimeoutTest(unittest.TestCase):
+    """Timeouts and deadlines of Session requests, run against a slow FakeTinyCertServer."""
+    def setUp(self):
+        self.delays = {}
+        self.server = FakeTinyCertServer(latency=lambda path: self.delays.get(path, 0.0)).start()
+        self.server.add_account(ACCOUNT, PASSPHRASE, API_KEY)
+        self.ca_id = self.server.add_ca()
+        self.cert_id = self.server.add_cert(self.ca_id, 'www.example.com')
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _session(self, **options):
+        return auto_session(API_KEY, ACCOUNT, PASSPHRASE, base_url=self.server.base_url, **options)
+
+    def testReadTimeout(self):
+        self.delays['cert/details'] = 0.5
+        with self._session(timeout=(5, 0.1)) as session:
+            with self.assertRaises(ReadTimeout) as raised:
+                session.cert.details(self.cert_id)
+            self.assertEqual(raised.exception.path, 'cert/details')
+            self.assertNotIsInstance(raised.exception, requests.RequestException)
+            self.assertEqual(len(session.ca.list()), 1)
+
+    def testPerCallTimeout(self):
+        self.delays['cert/details'] = 0.3
+        with self._session() as session:
+            with self.assertRaises(ReadTimeout):
+                session.request('cert/details', {'cert_id': self.cert_id}, timeout=0.05)
+            with call_timeout((5, 0.05)):
+                with self.assertRaises(ReadTimeout):
+                    session.cert.details(self.cert_id)
+            self.assertEqual(session.cert.details(self.cert_id)['id'], self.cert_id)
+
+    def testDeadlineSpansCompoundOperations(self):
+        self.delays['cert/details'] = 0.1
+        started = time.time()
+        calls = 0
+        with self.assertRaises(DeadlineExceeded):
+            with Deadline(0.35):
+                with self._session() as session:
+                    while True:
+                        session.cert.details(self.cert_id)
+                        calls += 1
+        self.assertLess(time.time() - started, 1.0)
+        self.assertIn(calls, (2, 3))
+        self.assertEqual(self.server.calls['disconnect'], 1)
+
+    def testDeadlineShortensTimeout(self):
+        self.delays['cert/list'] = 2.0
+        with self._session() as session:
+            started = time.time()
+            with self.assertRaises(DeadlineExceeded):
+                with Deadline(0.2):
+                    session.cert.list(self.ca_id)
+            self.assertLess(time.time() - started, 1.0)
+
+
+class _StallingTransport(Transport):
+    """Fails its first failures calls with a connect timeout, then delegates to transport."""
+    def __init__(self, transport, failures):
+        self.transport = transport
+        self.failures = failures
+        self.timeouts = []
+
+    def post(self, url, data, stream=False, timeout=None):
+        self.timeouts.append(timeout)
+        if self.failures:
+            self.failures -= 1
+            raise requests.ConnectTimeout('stalled')
+        return self.transport.post(url, data, stream, timeout)
+
+
+class RetryTimeoutTest(unittest.TestCase):
+    """Connect timeouts, retries and deadlines, with the AdaptiveScheduler."""
+    def setUp(self):
+        self.server = FakeTinyCertServer()
+        self.server.add_account(ACCOUNT, PASSPHRASE, API_KEY)
+        self.ca_id = self.server.add_ca()
+        self.sleeps = []
+
+    def _session(self, failures, **scheduler_options):
+        self.transport = _StallingTransport(InProcessTransport(self.server), failures)
+        scheduler = AdaptiveScheduler(sleep=self.sleeps.append, jitter=lambda: 1.0, **scheduler_options)
+        session = Session(API_KEY, base_url=self.server.base_url, transport=self.transport, scheduler=scheduler,
+                          timeout=(3, 30))
+        session.connect(ACCOUNT, PASSPHRASE)
+        return session
+
+    def testConnectTimeoutsAreRetried(self):
+        session = self._session(0)
+        self.transport.failures = 2
+        self.assertEqual(len(session.ca.list()), 1)
+        self.assertEqual(self.transport.timeouts[-3:], [(3, 30)] * 3)
+
+        self.transport.failures = 1
+        with self.assertRaises(ConnectTimeout) as raised:
+            session.cert.create(self.ca_id, {'CN': 'a.example.com'})
+        self.assertIsInstance(raised.exception, TimeoutException)
+
+    def testRetriesStopAtTheDeadline(self):
+        session = self._session(0, base_delay=1.0)
+        self.transport.failures = 5
+        with Deadline(1.5):
+            with self.assertRaises(ConnectTimeout):
+                session.ca.list()
+        self.assertEqual(self.sleeps, [1.0])
+
+
+class BulkDeadlineTest(unittest.TestCase):
+    """Unit tests for run_bulk deadlines and cancellation."""
+    def testCancelAbandonsOutstandingWork(self):
+        pulled = []
+
+        def items():
+            for item in range(1000):
+                pulled.append(item)
+                yield item
+
+        deadline = Deadline()
+
+        def work(item):
+            if item == 0:
+                while len(pulled) < 2:  # wait until the next item is queued behind this one
+                    time.sleep(0.001)
+                deadline.cancel()  # as another thread might
+            return item
+
+        results = list(run_bulk(work, items(), max_workers=1, ordered=True, deadline=deadline))
+        self.assertEqual(pulled, [0, 1])
+        self.assertEqual(len(results), 2)
+        self.assertTrue(results[0].ok)
+        self.assertIsInstance(results[1].error, DeadlineExceeded)
+
+    def testWorkersInheritTheCallersDeadline(self):
+        with Deadline(30) as deadline:
+            results = list(run_bulk(lambda item: Deadline.active(), range(4), max_workers=2))
+        self.assertTrue(all(result.result == (deadline,) for result in results))
+
+
+class CoalescerDeadlineTest(unittest.TestCase):
+    """Waiting on a coalesced call is bounded by the waiting thread's own deadline."""
+    def testFollowersKeepTheirOwnDeadlines(self):
+        coalescer = Coalescer()
+        release = threading.Event()
+        started = threading.Event()
+        calls = []
+
+        def leader_fetch():
+            calls.append('leader')
+            started.set()
+            release.wait()
+            raise DeadlineExceeded('ca/list', 'deadline exceeded')
+
+        def leader():
+            try:
+                coalescer.call('ca/list', {}, leader_fetch)
+            except DeadlineExceeded:
+                pass
+
+        thread = threading.Thread(target=leader)
+        thread.start()
+        started.wait()
+        with self.assertRaises(DeadlineExceeded):
+            with Deadline(0.05):
+                coalescer.call('ca/list', {}, lambda: 'unused')
+
+        result = []
+        follower = threading.Thread(target=lambda: result.append(coalescer.call('ca/list', {}, lambda: 'own')))
+        follower.start()
+        time.sleep(0.05)
+        release.set()
+        thread.join()
+        follower.join()
+        self.assertEqual(result, ['own'])
+        self.assertEqual(calls, ['leader'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Unit tests for the export module."""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests_mock
+
+from tinycert.export import export, export_items, export_path
+from tinycert.session import Session
+
+
+class ExportTest(unittest.TestCase):
+    """Unit tests for the export function."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.session = Session('somekey', 'sometoken')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _register(self, mock_requests):
+        def pem_response(request, context):
+            params = dict(pair.split('=') for pair in request.body.split('&'))
+            if params['cert_id'] == '666':
+                context.status_code = 500
+                return {}
+            return {'pem': '-----BEGIN %s-----\n%s\n' % (params['what'], params['cert_id'])}
+
+        mock_requests.register_uri('POST', 'https://www.tinycert.org/api/v1/cert/get', json=pem_response)
+
+    @requests_mock.Mocker()
+    def testExportToDirectory(self, mock_requests):
+        self._register(mock_requests)
+        results = list(export(self.session, export_items([1, 2], ('cert', 'key.enc')), self.directory,
+                              max_workers=3, ordered=True))
+
+        self.assertEqual([(r.cert_id, r.data_type) for r in results],
+                         [(1, 'cert'), (1, 'key.enc'), (2, 'cert'), (2, 'key.enc')])
+        self.assertTrue(all(r.ok and not r.skipped and r.bytes > 0 for r in results))
+        with io.open(export_path(self.directory, 2, 'key.enc'), 'rb') as pem:
+            self.assertEqual(pem.read(), b'-----BEGIN key.enc-----\n2\n')
+        self.assertEqual(results[3].bytes, len(b'-----BEGIN key.enc-----\n2\n'))
+        self.assertFalse([name for name in os.listdir(self.directory) if name.endswith('.part')])
+
+    @requests_mock.Mocker()
+    def testResumeSkipsExistingFiles(self, mock_requests):
+        self._register(mock_requests)
+        list(export(self.session, [(1, 'cert')], self.directory))
+        self.assertEqual(mock_requests.call_count, 1)
+
+        results = list(export(self.session, [(1, 'cert'), (2, 'cert')], self.directory, ordered=True))
+        self.assertEqual([r.skipped for r in results], [True, False])
+        self.assertEqual(mock_requests.call_count, 2)
+
+    @requests_mock.Mocker()
+    def testErrorsArePerItem(self, mock_requests):
+        self._register(mock_requests)
+        results = list(export(self.session, [(666, 'cert'), (1, 'cert')], self.directory, ordered=True))
+        self.assertFalse(results[0].ok)
+        self.assertTrue(results[1].ok)
+        self.assertFalse(os.path.exists(export_path(self.directory, 666, 'cert')))
+
+    @requests_mock.Mocker()
+    def testExportToSink(self, mock_requests):
+        self._register(mock_requests)
+        written = {}
+
+        class Sink(io.BytesIO):
+            def __init__(self, key):
+                super(Sink, self).__init__()
+                self.key = key
+
+            def close(self):
+                written[self.key] = self.getvalue()
+                super(Sink, self).close()
+
+        results = list(export(self.session, [(7, 'chain')], sink=lambda cert_id, data_type: Sink((cert_id, data_type))))
+        self.assertIsNone(results[0].path)
+        self.assertEqual(written, {(7, 'chain'): b'-----BEGIN chain-----\n7\n'})
+
+    def testRequiresOneDestination(self):
+        with self.assertRaises(ValueError):
+            list(export(self.session, [], None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Unit tests for the fakeserver module."""
+
+import time
+import unittest
+
+import requests
+
+from tinycert.cert import State
+from tinycert.fakeserver import FakeTinyCertServer
+from tinycert.session import Session, auto_session
+
+
+class FakeTinyCertServerTest(unittest.TestCase):
+    """Unit tests for the FakeTinyCertServer class, driven through a real Session."""
+    API_KEY = 'somekey'
+    ACCOUNT = 'me@foo.com'
+    PASSPHRASE = 'my passphrase'
+
+    def setUp(self):
+        self.server = FakeTinyCertServer().start()
+        self.server.add_account(self.ACCOUNT, self.PASSPHRASE, self.API_KEY)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _session(self):
+        return auto_session(self.API_KEY, self.ACCOUNT, self.PASSPHRASE, base_url=self.server.base_url)
+
+    def testCertificateLifecycle(self):
+        with self._session() as session:
+            ca_id = session.ca.create({'C': 'US', 'O': 'Acme, Inc.', 'hash_method': 'sha256'})['ca_id']
+            self.assertEqual(session.ca.details(ca_id)['O'], 'Acme, Inc.')
+
+            cert_id = session.cert.create(ca_id, {'C': 'US', 'O': 'Acme, Inc.', 'CN': 'www.example.com',
+                                                  'SANs': [{'DNS': 'www.example.com'}, {'IP': '10.0.0.1'}]})['cert_id']
+            details = session.cert.details(cert_id)
+            self.assertEqual(details['CN'], 'www.example.com')
+            self.assertEqual(details['Alt'], [{'DNS': 'www.example.com'}, {'IP': '10.0.0.1'}])
+            self.assertIn('BEGIN CERTIFICATE', session.cert.get(cert_id, 'cert')['pem'])
+
+            session.cert.set_status(cert_id, 'hold')
+            self.assertEqual(session.cert.list(ca_id, State.good.value), [])
+            self.assertEqual([c['id'] for c in session.cert.list(ca_id, State.hold.value)], [cert_id])
+
+            new_id = session.cert.reissue(cert_id)['cert_id']
+            self.assertNotEqual(new_id, cert_id)
+            session.ca.delete(ca_id)
+            self.assertEqual(session.ca.list(), [])
+
+        self.assertEqual(self.server.calls['connect'], 1)
+        self.assertEqual(self.server.calls['disconnect'], 1)
+
+    def testRejectsBadCredentialsAndDigests(self):
+        with self.assertRaises(requests.HTTPError):
+            Session(self.API_KEY, base_url=self.server.base_url).connect(self.ACCOUNT, 'wrong')
+        with self.assertRaises(requests.HTTPError) as raised:
+            Session('wrong key', base_url=self.server.base_url).connect(self.ACCOUNT, self.PASSPHRASE)
+        self.assertEqual(raised.exception.response.json()['message'], 'invalid digest')
+        with self.assertRaises(requests.HTTPError) as raised:
+            Session(self.API_KEY, 'stale token', base_url=self.server.base_url).ca.list()
+        self.assertEqual(raised.exception.response.status_code, 401)
+
+    def testSeedingHelpers(self):
+        ca_id = self.server.add_ca('Seeded CA')
+        self.server.add_cert(ca_id, 'old.example.com', expires=time.time() - 60)
+        self.server.add_cert(ca_id, 'new.example.com', sans=[{'DNS': 'new.example.com'}])
+        with self._session() as session:
+            listed = dict((c['name'], c['status']) for c in session.cert.list(ca_id))
+        self.assertEqual(listed, {'old.example.com': 'expired', 'new.example.com': 'good'})
+
+    def testRateLimit(self):
+        self.server.stop()
+        self.server = FakeTinyCertServer(rate_limit=1, burst=2).start()
+        self.server.add_account(self.ACCOUNT, self.PASSPHRASE, self.API_KEY)
+        session = Session(self.API_KEY, base_url=self.server.base_url)
+        session.connect(self.ACCOUNT, self.PASSPHRASE)
+        session.ca.list()
+        with self.assertRaises(requests.HTTPError) as raised:
+            session.ca.list()
+        self.assertEqual(raised.exception.response.status_code, 429)
+        self.assertEqual(raised.exception.response.headers['Retry-After'], '1')
+        session.close()
+
+    def testInjectedErrorsAndLatency(self):
+        self.server.error_rate = 1.0
+        with self.assertRaises(requests.HTTPError) as raised:
+            Session(self.API_KEY, base_url=self.server.base_url).connect(self.ACCOUNT, self.PASSPHRASE)
+        self.assertEqual(raised.exception.response.status_code, 500)
+
+        self.server.error_rate = 0.0
+        self.server.latency = 0.05
+        started = time.time()
+        Session(self.API_KEY, base_url=self.server.base_url).connect(self.ACCOUNT, self.PASSPHRASE)
+        self.assertGreaterEqual(time.time() - started, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
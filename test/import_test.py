@@ -0,0 +1,48 @@
+"""Unit tests for the tinycert package's lazy imports."""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import tinycert
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+class LazyImportTest(unittest.TestCase):
+    """Unit tests for the lazy public names of the tinycert package."""
+    def testPublicNames(self):
+        from tinycert.cert import CertificateApi, State
+        from tinycert.session import Session, auto_session
+        self.assertIs(tinycert.Session, Session)
+        self.assertIs(tinycert.auto_session, auto_session)
+        self.assertIs(tinycert.CertificateApi, CertificateApi)
+        self.assertIs(tinycert.State, State)
+        self.assertIn('Session', dir(tinycert))
+        with self.assertRaises(AttributeError):
+            tinycert.NoSuchName  # pylint: disable=pointless-statement
+
+    def testHttpStackIsDeferred(self):
+        probe = ('import json, sys\n'
+                 'import tinycert\n'
+                 'loaded = {"import": [m for m in ("requests", "tinycert.session") if m in sys.modules]}\n'
+                 'session = tinycert.Session("key")\n'
+                 'loaded["session"] = [m for m in ("requests",) if m in sys.modules]\n'
+                 'session.transport.http_session()\n'
+                 'loaded["request"] = [m for m in ("requests",) if m in sys.modules]\n'
+                 'print(json.dumps(loaded))\n')
+        output = subprocess.check_output([sys.executable, '-c', probe], cwd=ROOT)
+        self.assertEqual(json.loads(output.decode('utf-8')), {'import': [], 'session': [], 'request': ['requests']})
+
+    def testFakeServerDoesNotLoadHttpStack(self):
+        probe = ('import json, sys\n'
+                 'import tinycert.fakeserver\n'
+                 'print(json.dumps([m for m in ("requests", "tinycert.renewal") if m in sys.modules]))\n')
+        output = subprocess.check_output([sys.executable, '-c', probe], cwd=ROOT)
+        self.assertEqual(json.loads(output.decode('utf-8')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Unit tests for the inventory module."""
+
+import unittest
+
+import mock
+
+from tinycert.cert import State
+from tinycert.inventory import Inventory
+from tinycert.models import parse_result
+
+
+class InventoryTest(unittest.TestCase):
+    """Unit tests for the Inventory class."""
+    def setUp(self):
+        self.listing = {
+            1: [
+                {'id': 10, 'name': 'www', 'status': 'good', 'expires': 2000},
+                {'id': 11, 'name': 'mail', 'status': 'revoked', 'expires': 1000},
+            ],
+            2: [
+                {'id': 20, 'name': 'api', 'status': 'good', 'expires': 1500},
+            ],
+        }
+        self.details = {
+            10: {'id': 10, 'CN': 'www.example.com', 'Alt': [{'DNS': 'www.example.com'}, {'DNS': 'example.com'}]},
+            11: {'id': 11, 'CN': 'mail.example.com', 'Alt': [{'email': 'postmaster@example.com'}]},
+            20: {'id': 20, 'CN': 'api.example.com'},
+        }
+        self.session = mock.MagicMock()
+        self.session.ca.list.return_value = [{'id': 1, 'name': 'one'}, {'id': 2, 'name': 'two'}]
+        self.session.cert.list.side_effect = lambda ca_id, states: [
+            entry for entry in self.listing[ca_id] if State[entry['status']].value & states]
+        self.session.cert.details.side_effect = lambda cert_id: self.details[cert_id]
+        self.inventory = Inventory()
+
+    def tearDown(self):
+        self.inventory.close()
+
+    def testInitialSyncFetchesEverything(self):
+        result = self.inventory.sync(self.session)
+        self.assertEqual((result.cas, result.listed, result.fetched, result.removed), (2, 3, 3, 0))
+        self.assertEqual([ca['name'] for ca in self.inventory.cas()], ['one', 'two'])
+        self.assertEqual(self.inventory.details(20), self.details[20])
+
+    def testIncrementalSyncFetchesOnlyChanges(self):
+        self.inventory.sync(self.session)
+        self.session.cert.details.reset_mock()
+
+        self.listing[1][0]['status'] = 'hold'
+        del self.listing[2][0]
+        self.listing[2].append({'id': 21, 'name': 'new', 'status': 'good', 'expires': 3000})
+        self.details[21] = {'id': 21, 'CN': 'new.example.com'}
+
+        result = self.inventory.sync(self.session)
+        self.assertEqual((result.fetched, result.removed), (2, 1))
+        self.assertEqual(sorted(call[0][0] for call in self.session.cert.details.call_args_list), [10, 21])
+        self.assertEqual(self.inventory.certificates(states=State.hold.value)[0]['id'], 10)
+        self.assertIsNone(self.inventory.details(20))
+
+    def testStateFilteredSyncKeepsOtherStates(self):
+        self.inventory.sync(self.session)
+        result = self.inventory.sync(self.session, states=State.good.value)
+        self.assertEqual((result.listed, result.fetched, result.removed), (2, 0, 0))
+        self.assertEqual(len(self.inventory.certificates()), 3)
+
+    def testQueries(self):
+        self.inventory.sync(self.session)
+        self.assertEqual([c['id'] for c in self.inventory.certificates(ca_id=1)], [11, 10])
+        self.assertEqual([c['id'] for c in self.inventory.certificates(states=State.good.value)], [20, 10])
+        self.assertEqual([c['id'] for c in self.inventory.certificates(cn='api.example.com')], [20])
+        self.assertEqual([c['id'] for c in self.inventory.certificates(san='example.com')], [10])
+        self.assertEqual([c['id'] for c in self.inventory.certificates(expires_before=1600)], [11, 20])
+        self.assertEqual([c['id'] for c in self.inventory.certificates(ca_id=1, expires_after=1500)], [10])
+
+    def testSyncWithResultModels(self):
+        self.session.ca.list.return_value = parse_result('ca/list', self.session.ca.list.return_value)
+        listed = self.session.cert.list.side_effect
+        self.session.cert.list.side_effect = lambda ca_id, states: parse_result('cert/list', listed(ca_id, states))
+        self.session.cert.details.side_effect = lambda cert_id: parse_result('cert/details', self.details[cert_id])
+        result = self.inventory.sync(self.session)
+        self.assertEqual((result.cas, result.listed, result.fetched), (2, 3, 3))
+        self.assertEqual(self.inventory.details(10), self.details[10])
+        self.assertEqual([c['id'] for c in self.inventory.certificates(san='example.com')], [10])
+        self.assertEqual(self.inventory.sync(self.session).fetched, 0)
+
+    def testDetailErrorsAreReported(self):
+        del self.details[20]
+        result = self.inventory.sync(self.session)
+        self.assertEqual([cert_id for cert_id, _ in result.errors], [20])
+        self.assertEqual(len(self.inventory.certificates()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""Unit tests for the metrics module."""
+
+import unittest
+
+import requests
+
+from tinycert.fakeserver import FakeTinyCertServer
+from tinycert.metrics import Histogram, Metrics, RequestEvent
+from tinycert.session import auto_session
+
+
+class MetricsTest(unittest.TestCase):
+    """Unit tests for the Metrics aggregator."""
+    def testHistogram(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), ('+Inf', 4)])
+        self.assertAlmostEqual(histogram.sum, 3.65)
+
+    def testObserveAndRender(self):
+        metrics = Metrics(buckets=(0.1,))
+        metrics.observe(RequestEvent('ca/list', 200, 0.05, 0.001, 0.002, 100, 200, None))
+        metrics.observe(RequestEvent('ca/list', 500, 0.5, 0.001, 0.0, 100, 50, ValueError()))
+
+        snapshot = metrics.snapshot()['ca/list']
+        self.assertEqual((snapshot['calls'], snapshot['errors']), (2, 1))
+        self.assertEqual((snapshot['request_bytes'], snapshot['response_bytes']), (200, 250))
+        self.assertEqual(snapshot['latency_seconds']['buckets'], [(0.1, 1), ('+Inf', 2)])
+
+        text = metrics.render()
+        self.assertIn('tinycert_requests_total{endpoint="ca/list"} 2', text)
+        self.assertIn('tinycert_request_errors_total{endpoint="ca/list"} 1', text)
+        self.assertIn('tinycert_request_duration_seconds_bucket{endpoint="ca/list",le="0.1"} 1', text)
+        self.assertIn('tinycert_request_duration_seconds_count{endpoint="ca/list"} 2', text)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {})
+
+
+class SessionInstrumentationTest(unittest.TestCase):
+    """Drives an instrumented Session against a FakeTinyCertServer."""
+    def testSessionReportsEveryCall(self):
+        metrics = Metrics()
+        events = []
+
+        class Recorder(object):
+            def observe(self, event):
+                events.append(event)
+                metrics.observe(event)
+
+        with FakeTinyCertServer() as server:
+            server.add_account('me@foo.com', 'secret', 'somekey')
+            ca_id = server.add_ca()
+            with auto_session('somekey', 'me@foo.com', 'secret', base_url=server.base_url,
+                              instrumentation=Recorder()) as session:
+                session.cert.create(ca_id, {'CN': 'www.example.com', 'SANs': [{'DNS': 'example.com'}]})
+                with self.assertRaises(requests.HTTPError):
+                    session.cert.details(99999)
+
+        self.assertEqual([event.path for event in events], ['connect', 'cert/new', 'cert/details', 'disconnect'])
+        created = events[1]
+        self.assertEqual(created.status, 200)
+        self.assertGreater(created.sign_seconds, 0)
+        self.assertGreater(created.request_bytes, 0)
+        self.assertGreater(created.response_bytes, 0)
+        self.assertGreaterEqual(created.latency, created.sign_seconds + created.decode_seconds)
+        failed = events[2]
+        self.assertEqual(failed.status, 400)
+        self.assertIsInstance(failed.error, requests.HTTPError)
+        self.assertEqual(metrics.snapshot()['cert/details']['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
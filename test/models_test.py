@@ -0,0 +1,128 @@
+"""Unit tests for the models module."""
+
+from datetime import datetime, timezone
+import json
+import pickle
+import sys
+import unittest
+
+import requests_mock
+
+from tinycert.cert import State
+from tinycert.models import (CertificateAuthority, CertificateAuthorityDetails, CertificateDetails,
+                             CertificateRecord, as_dict, field, iter_certificate_records, parse_result,
+                             parse_timestamp)
+from tinycert.session import Session
+
+
+class CertificateRecordTest(unittest.TestCase):
+    """Unit tests for the CertificateRecord class."""
+    def testTypedFields(self):
+        record = CertificateRecord.from_json({'id': 123, 'name': 'test cert', 'status': 'revoked',
+                                              'expires': 987654321})
+        self.assertEqual(record.state, State.revoked)
+        self.assertEqual(record.expires_at, datetime(2001, 4, 19, 4, 25, 21, tzinfo=timezone.utc))
+        self.assertEqual(record.extra, {})
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def testExtraFieldsDecodeOnAccess(self):
+        entry = {'id': 1, 'name': 'x', 'status': 'bogus', 'expires': 1, 'serial': 'ab:cd'}
+        record = CertificateRecord.from_json(entry, json.dumps(entry))
+        self.assertIsInstance(record._extra, str)
+        self.assertIsNone(record.state)
+        self.assertEqual(record.extra, {'serial': 'ab:cd'})
+        self.assertEqual(record, CertificateRecord.from_json(entry))
+
+    def testSmallerThanDict(self):
+        entry = {'id': 123, 'name': 'test cert', 'status': 'good', 'expires': 987654321}
+        self.assertLess(sys.getsizeof(CertificateRecord.from_json(entry)), sys.getsizeof(entry))
+
+    def testImmutableHashableAndPicklable(self):
+        entry = {'id': 1, 'name': 'x', 'status': 'good', 'expires': 1, 'serial': 'ab'}
+        record = CertificateRecord.from_json(entry, json.dumps(entry))
+        with self.assertRaises(AttributeError):
+            record.status = 'revoked'
+        with self.assertRaises(AttributeError):
+            del record.name
+        self.assertEqual(len(set([record, CertificateRecord.from_json(entry)])), 1)
+        restored = pickle.loads(pickle.dumps(record))
+        self.assertEqual(restored, record)
+        self.assertEqual(restored.extra, {'serial': 'ab'})
+
+
+class ModelsTest(unittest.TestCase):
+    """Unit tests for the CA and certificate details models."""
+    def testCertificateAuthority(self):
+        ca_list = parse_result('ca/list', [{'id': 123, 'name': 'test ca'}])
+        self.assertEqual(ca_list, [CertificateAuthority(id=123, name='test ca')])
+
+        details = CertificateAuthorityDetails.from_json({
+            'id': 123, 'C': 'US', 'ST': 'Washington', 'L': 'Seattle', 'O': 'Acme, Inc.',
+            'OU': 'Secure Digital Certificate Signing', 'CN': 'Acme, Inc. CA', 'E': 'admin@acme.com',
+            'hash_alg': 'SHA256'})
+        self.assertEqual((details.CN, details.hash_alg), ('Acme, Inc. CA', 'SHA256'))
+        self.assertEqual(details.extra, {})
+
+    def testCertificateDetails(self):
+        details = parse_result('cert/details', {
+            'id': 123, 'status': 'hold', 'C': 'US', 'CN': 'www.example.com', 'expires': '987654321',
+            'Alt': [{'DNS': 'www.example.com'}, {'IP': '10.0.0.1'}], 'hash_alg': 'SHA256', 'serial': '01'})
+        self.assertIsInstance(details, CertificateDetails)
+        self.assertEqual(details.state, State.hold)
+        self.assertEqual(details.sans, (('DNS', 'www.example.com'), ('IP', '10.0.0.1')))
+        self.assertEqual(details.expires_at.year, 2001)
+        self.assertEqual(details.extra, {'serial': '01'})
+        self.assertIsNone(details.OU)
+
+    def testDictAccess(self):
+        raw = {'id': 123, 'status': 'good', 'CN': 'www.example.com', 'Alt': [{'DNS': 'www.example.com'}],
+               'serial': '01'}
+        details = parse_result('cert/details', raw)
+        self.assertEqual(as_dict(details), raw)
+        self.assertEqual(as_dict(parse_result('ca/list', [{'id': 1, 'name': 'a'}])), [{'id': 1, 'name': 'a'}])
+        self.assertEqual(as_dict({'pem': 'x'}), {'pem': 'x'})
+        for result in (raw, details):
+            self.assertEqual(field(result, 'CN'), 'www.example.com')
+            self.assertEqual(field(result, 'Alt'), [{'DNS': 'www.example.com'}])
+            self.assertEqual(field(result, 'serial'), '01')
+            self.assertEqual(field(result, 'OU', 'none'), 'none')
+
+    def testUnmodelledPathsPassThrough(self):
+        self.assertEqual(parse_result('cert/get', {'pem': 'x'}), {'pem': 'x'})
+
+    def testParseTimestamp(self):
+        self.assertEqual(parse_timestamp('2017-05-01T10:00:00Z'), datetime(2017, 5, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(parse_timestamp(0), datetime(1970, 1, 1, tzinfo=timezone.utc))
+        self.assertIsNone(parse_timestamp('soon'))
+        self.assertIsNone(parse_timestamp(None))
+
+    @requests_mock.Mocker()
+    def testSessionResultModels(self, mock_requests):
+        mock_requests.register_uri('POST', 'https://www.tinycert.org/api/v1/ca/list', json=[{'id': 1, 'name': 'a'}])
+        mock_requests.register_uri('POST', 'https://www.tinycert.org/api/v1/cert/get', json={'pem': 'x'})
+        session = Session('somekey', 'sometoken', result_models=True)
+        self.assertEqual(session.ca.list(), [CertificateAuthority(id=1, name='a')])
+        self.assertEqual(session.cert.get(1, 'cert'), {'pem': 'x'})
+
+
+class IterListTest(unittest.TestCase):
+    """Unit tests for CertificateApi.iter_list."""
+    @requests_mock.Mocker()
+    def testIterList(self, mock_requests):
+        entries = [{'id': i, 'name': 'host%d' % i, 'status': 'good', 'expires': 1000 + i} for i in range(500)]
+        mock_requests.register_uri('POST', 'https://www.tinycert.org/api/v1/cert/list', json=entries)
+
+        session = Session('somekey', 'sometoken')
+        records = session.cert.iter_list(555, State.good.value, chunk_size=100)
+        self.assertEqual(next(records), CertificateRecord(0, 'host0', 'good', 1000))
+        self.assertEqual(len(list(records)), 499)
+        self.assertIn('ca_id=555&token=sometoken&what=2', mock_requests.last_request.body)
+
+    def testIterCertificateRecords(self):
+        data = json.dumps([{'id': 1, 'name': 'a', 'status': 'hold', 'expires': 5}]).encode('utf-8')
+        records = list(iter_certificate_records([data[:7], data[7:]], fast_json=True))
+        self.assertEqual([record.state for record in records], [State.hold])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+"""Unit tests for the ratelimit module."""
+import unittest
+
+from tinycert.ratelimit import TokenBucket
+
+
+class TokenBucketTest(unittest.TestCase):
+    """Unit tests for the TokenBucket class."""
+    def testSmoothsBursts(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        bucket = TokenBucket(2.0, burst=3, clock=lambda: now[0], sleep=sleep)
+        for _ in range(7):
+            bucket.acquire()
+        self.assertAlmostEqual(now[0], 2.0)
+
+    def testTakeDoesNotWait(self):
+        now = [0.0]
+        bucket = TokenBucket(4.0, burst=2, clock=lambda: now[0], sleep=self.fail)
+        self.assertEqual([bucket.take(), bucket.take()], [0, 0])
+        self.assertAlmostEqual(bucket.take(), 0.25)
+        now[0] += 0.25
+        self.assertEqual(bucket.take(), 0)
+
+    def testRejectsNonPositiveRate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
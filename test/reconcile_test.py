@@ -0,0 +1,155 @@
+"""Unit tests for the reconcile module."""
+
+import time
+import unittest
+
+from tinycert.fakeserver import FakeTinyCertServer
+from tinycert.inventory import Inventory
+from tinycert.reconcile import CREATE, REISSUE, REPLACE, REVOKE, drift, plan, reconcile
+from tinycert.session import auto_session
+
+DAY = 86400
+
+
+class DriftTest(unittest.TestCase):
+    """Unit tests for the drift function."""
+    def testComparesOnlyNamedFields(self):
+        details = {'CN': 'a', 'O': 'Acme', 'OU': 'IT', 'Alt': [{'DNS': 'a'}, {'IP': '10.0.0.1'}]}
+        self.assertIsNone(drift({'CN': 'a'}, details))
+        self.assertIsNone(drift({'CN': 'a', 'O': 'Acme', 'SANs': [{'IP': '10.0.0.1'}, {'DNS': 'a'}]}, details))
+        self.assertEqual(drift({'CN': 'a', 'OU': 'Ops', 'SANs': [{'DNS': 'a'}]}, details), 'changed OU, SANs')
+
+
+class ReconcileTest(unittest.TestCase):
+    """Unit tests for plan and reconcile, run against FakeTinyCertServer."""
+    API_KEY = 'somekey'
+    ACCOUNT = 'me@foo.com'
+    PASSPHRASE = 'my passphrase'
+
+    def setUp(self):
+        self.server = FakeTinyCertServer().start()
+        self.server.add_account(self.ACCOUNT, self.PASSPHRASE, self.API_KEY)
+        now = time.time()
+        self.ca_one = self.server.add_ca('One')
+        self.ca_two = self.server.add_ca('Two')
+        self.web = self.server.add_cert(self.ca_one, 'web.example.com', O='Acme', sans=[{'DNS': 'web.example.com'}])
+        self.old_api = self.server.add_cert(self.ca_one, 'api.example.com', O='Acme', expires=now + DAY)
+        self.api = self.server.add_cert(self.ca_one, 'api.example.com', O='Acme', expires=now + 300 * DAY)
+        self.stale = self.server.add_cert(self.ca_one, 'stale.example.com', O='Acme', expires=now - DAY)
+        self.legacy = self.server.add_cert(self.ca_one, 'legacy.example.com', O='Acme')
+        self.revoked = self.server.add_cert(self.ca_one, 'gone.example.com', status='revoked')
+        self.mail = self.server.add_cert(self.ca_two, 'mail.example.com', O='Acme', expires=now + 20 * DAY)
+        self.desired = {
+            self.ca_one: [
+                {'CN': 'web.example.com', 'O': 'Acme', 'SANs': [{'DNS': 'web.example.com'}]},
+                {'CN': 'api.example.com', 'O': 'Acme'},
+                {'CN': 'stale.example.com', 'O': 'Acme'},
+                {'CN': 'gone.example.com', 'O': 'Acme'},
+                {'CN': 'new.example.com', 'O': 'Acme', 'C': 'US'},
+            ],
+            self.ca_two: [
+                {'CN': 'mail.example.com', 'O': 'Acme'},
+            ],
+        }
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _session(self):
+        return auto_session(self.API_KEY, self.ACCOUNT, self.PASSPHRASE, base_url=self.server.base_url)
+
+    def _writes(self):
+        return sum(self.server.calls[path] for path in ('cert/new', 'cert/reissue', 'cert/status'))
+
+    def testDryRunPlansWithOneListPerCa(self):
+        with self._session() as session:
+            changes = reconcile(session, self.desired, dry_run=True, prune=True, renew_within=30 * DAY)
+
+        self.assertEqual(sorted((action.kind, action.cn, action.cert_id, action.reason) for action in changes), [
+            (CREATE, 'gone.example.com', None, 'missing'),
+            (CREATE, 'new.example.com', None, 'missing'),
+            (REISSUE, 'mail.example.com', self.mail, 'expiring'),
+            (REISSUE, 'stale.example.com', self.stale, 'expired'),
+            (REVOKE, 'api.example.com', self.old_api, 'superseded'),
+            (REVOKE, 'legacy.example.com', self.legacy, 'not desired'),
+        ])
+        self.assertEqual(changes.summary(), {CREATE: 2, REISSUE: 2, REVOKE: 2})
+        self.assertEqual(changes.estimated_calls, 6)
+        self.assertEqual(changes.planning_calls, 2)
+        self.assertIsNone(changes.results)
+        self.assertEqual(self.server.calls['cert/list'], 2)
+        self.assertEqual(self.server.calls['cert/details'], 0)
+        self.assertEqual(self._writes(), 0)
+
+    def testApplyConverges(self):
+        with self._session() as session:
+            changes = reconcile(session, self.desired, prune=True, max_workers=4)
+            self.assertEqual(len(changes.results), len(changes))
+            self.assertTrue(all(result.ok for result in changes.results))
+            self.assertEqual(self._writes(), changes.estimated_calls)
+            self.assertEqual(self.server.certs[self.legacy]['status'], 'revoked')
+            self.assertEqual(self.server.certs[self.old_api]['status'], 'revoked')
+
+            list_calls = self.server.calls['cert/list']
+            again = plan(session, self.desired, prune=True)
+        self.assertEqual(len(again), 0)
+        self.assertEqual(again.estimated_calls, 0)
+        self.assertEqual(self.server.calls['cert/list'] - list_calls, 2)
+
+    def testDriftFromInventoryAvoidsDetailsCalls(self):
+        self.desired[self.ca_one][0] = {'CN': 'web.example.com', 'O': 'Acme',
+                                        'SANs': [{'DNS': 'web.example.com'}, {'DNS': 'www.example.com'}]}
+        inventory = Inventory()
+        with self._session() as session:
+            inventory.sync(session, ca_ids=[self.ca_one, self.ca_two])
+            details_calls = self.server.calls['cert/details']
+            changes = plan(session, self.desired, inventory=inventory)
+            self.assertEqual(self.server.calls['cert/details'], details_calls)
+            replaces = [action for action in changes if action.kind == REPLACE]
+            self.assertEqual([(action.cert_id, action.reason) for action in replaces], [(self.web, 'changed SANs')])
+
+            changes.apply(session)
+            self.assertEqual(self.server.certs[self.web]['status'], 'revoked')
+            new_id = changes.results[changes.actions.index(replaces[0])].result
+            self.assertEqual(self.server.certs[new_id]['Alt'],
+                             [{'DNS': 'web.example.com'}, {'DNS': 'www.example.com'}])
+        inventory.close()
+
+    def testFetchDetailsWithoutInventory(self):
+        self.desired[self.ca_two][0] = {'CN': 'mail.example.com', 'O': 'Other'}
+        with self._session() as session:
+            self.assertEqual(plan(session, {self.ca_two: self.desired[self.ca_two]}).summary(), {})
+            changes = plan(session, {self.ca_two: self.desired[self.ca_two]}, fetch_details=True)
+        self.assertEqual(changes.summary(), {REPLACE: 1})
+        self.assertEqual(changes.estimated_calls, 2)
+        self.assertEqual(changes.planning_calls, 2)
+
+    def testHeldCertificateIsReissued(self):
+        held = self.server.add_cert(self.ca_two, 'held.example.com', status='hold', O='Acme')
+        desired = {self.ca_two: self.desired[self.ca_two] + [{'CN': 'held.example.com', 'O': 'Acme'}]}
+        with self._session() as session:
+            changes = reconcile(session, desired)
+            self.assertEqual([(action.kind, action.cert_id, action.reason) for action in changes],
+                             [(REISSUE, held, 'on hold')])
+            self.assertTrue(changes.results[0].ok)
+            again = plan(session, desired, prune=True)
+        self.assertEqual([(action.kind, action.cert_id, action.reason) for action in again],
+                         [(REVOKE, held, 'superseded')])
+
+    def testDuplicateSpecsAreRejected(self):
+        self.desired[self.ca_one].append({'CN': 'web.example.com', 'O': 'Other'})
+        with self._session() as session:
+            with self.assertRaises(ValueError):
+                reconcile(session, self.desired)
+        self.assertEqual(self.server.calls['cert/list'], 0)
+
+
+class ResultModelsReconcileTest(ReconcileTest):
+    """The same tests with a session returning result models."""
+    def _session(self):
+        return auto_session(self.API_KEY, self.ACCOUNT, self.PASSPHRASE, base_url=self.server.base_url,
+                            result_models=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
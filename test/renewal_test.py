@@ -0,0 +1,135 @@
+"""Unit tests for the renewal module."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+import requests
+
+from tinycert.fakeserver import FakeTinyCertServer
+from tinycert.renewal import RenewalJournal, RenewalScheduler
+from tinycert.session import auto_session
+
+DAY = 86400
+
+
+class RenewalSchedulerTest(unittest.TestCase):
+    """Unit tests for the RenewalScheduler class, driven through FakeTinyCertServer."""
+    API_KEY = 'somekey'
+    ACCOUNT = 'me@foo.com'
+    PASSPHRASE = 'my passphrase'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal_path = os.path.join(self.directory, 'renewals.journal')
+        self.server = FakeTinyCertServer().start()
+        self.server.add_account(self.ACCOUNT, self.PASSPHRASE, self.API_KEY)
+        self.ca_id = self.server.add_ca()
+        now = time.time()
+        self.soon = [self.server.add_cert(self.ca_id, 'soon%d.example.com' % i, expires=now + (i + 1) * DAY)
+                     for i in range(3)]
+        self.expired = self.server.add_cert(self.ca_id, 'old.example.com', expires=now - DAY)
+        self.later = self.server.add_cert(self.ca_id, 'later.example.com', expires=now + 90 * DAY)
+        self.revoked = self.server.add_cert(self.ca_id, 'revoked.example.com', status='revoked', expires=now + DAY)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def _session(self):
+        return auto_session(self.API_KEY, self.ACCOUNT, self.PASSPHRASE, base_url=self.server.base_url)
+
+    def testRenewsDueCertificatesInExpiryOrder(self):
+        with self._session() as session:
+            scheduler = RenewalScheduler(session, self.journal_path, window=30 * DAY, rate=1000, max_workers=1,
+                                         fetch=('cert',))
+            self.assertEqual(scheduler.load(), 5)
+            results = list(scheduler.run_once())
+            scheduler.close()
+
+        self.assertEqual([result.cert_id for result in results], [self.expired] + self.soon)
+        self.assertTrue(all(result.ok for result in results))
+        for result in results:
+            self.assertIn(result.new_cert_id, self.server.certs)
+            self.assertIn('BEGIN CERTIFICATE', result.material['cert'])
+        self.assertEqual(self.server.calls['cert/reissue'], 4)
+        self.assertEqual(len(scheduler), 1)
+        self.assertEqual(scheduler.next_due(), self.server.certs[self.later]['expires'] - 30 * DAY)
+
+    def testRestartDoesNotRenewAgain(self):
+        with self._session() as session:
+            scheduler = RenewalScheduler(session, self.journal_path, window=30 * DAY, rate=1000)
+            scheduler.load()
+            self.assertEqual(len(list(scheduler.run_once())), 4)
+            scheduler.close()
+
+            # The renewed certificates are still listed with their old expiry, as are the new ones.
+            scheduler = RenewalScheduler(session, self.journal_path, window=30 * DAY, rate=1000)
+            self.assertEqual(scheduler.load(), 5)
+            self.assertEqual(list(scheduler.run_once()), [])
+            scheduler.close()
+        self.assertEqual(self.server.calls['cert/reissue'], 4)
+
+    def testPendingRenewalsAreHeldBack(self):
+        with io.open(self.journal_path, 'w', encoding='utf-8') as journal:
+            journal.write(json.dumps({'cert_id': self.expired, 'state': 'pending', 'expires': 0}) + '\n')
+            journal.write('{"cert_id": ')  # torn by a crash
+
+        with self._session() as session:
+            scheduler = RenewalScheduler(session, self.journal_path, window=30 * DAY, rate=1000)
+            scheduler.load()
+            self.assertEqual(sorted(result.cert_id for result in scheduler.run_once()), self.soon)
+            self.assertEqual([entry['cert_id'] for entry in scheduler.pending()], [self.expired])
+
+            scheduler.release(self.expired)
+            self.assertEqual(scheduler.pending(), [])
+            scheduler.load()
+            self.assertEqual([result.cert_id for result in scheduler.run_once()], [self.expired])
+            scheduler.close()
+
+    def testRejectedReissueIsRetried(self):
+        with self._session() as session:
+            scheduler = RenewalScheduler(session, self.journal_path, window=DAY / 2, rate=1000)
+            scheduler.add(999, time.time())
+            results = list(scheduler.run_once())
+            self.assertEqual(results[0].error.response.status_code, 400)
+            self.assertEqual(scheduler.journal.get(999)['state'], RenewalJournal.FAILED)
+            self.assertTrue(scheduler.add(999, time.time()))
+            scheduler.close()
+
+    def testUnknownOutcomeStaysPending(self):
+        session = mock.Mock()
+        session.cert.reissue.side_effect = requests.ConnectionError('reset')
+        scheduler = RenewalScheduler(session, self.journal_path, window=DAY, rate=1000)
+        scheduler.add(7, time.time())
+        results = list(scheduler.run_once())
+        self.assertIsInstance(results[0].error, requests.ConnectionError)
+        self.assertEqual([entry['cert_id'] for entry in scheduler.pending()], [7])
+        self.assertFalse(scheduler.add(7, time.time()))
+        scheduler.close()
+
+        scheduler = RenewalScheduler(session, RenewalJournal(self.journal_path), window=DAY, rate=1000)
+        self.assertFalse(scheduler.add(7, time.time()))
+        scheduler.close()
+
+    def testRunStopsWhenAsked(self):
+        stop = threading.Event()
+        with self._session() as session:
+            scheduler = RenewalScheduler(session, self.journal_path, window=30 * DAY, rate=1000, max_workers=4)
+            renewed = []
+            for result in scheduler.run(refresh_interval=3600, stop=stop):
+                renewed.append(result.cert_id)
+                if len(renewed) == 4:
+                    stop.set()
+            scheduler.close()
+        self.assertEqual(sorted(renewed), sorted([self.expired] + self.soon))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""Unit tests for the scanner module."""
+
+from datetime import datetime, timedelta, timezone
+import io
+import ipaddress
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+    from cryptography.x509.oid import NameOID
+    from tinycert.scanner import expiring, parse_certificate, scan_directory, scan_pems, scan_session
+except ImportError:  # optional dependency
+    x509 = None
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_pem(cn, days_left, key=None, sans=()):
+    """Return a self-signed PEM certificate for cn expiring days_left days after NOW."""
+    key = key or ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, cn)])
+    builder = (x509.CertificateBuilder()
+               .subject_name(name)
+               .issuer_name(name)
+               .public_key(key.public_key())
+               .serial_number(x509.random_serial_number())
+               .not_valid_before(NOW - timedelta(days=365))
+               .not_valid_after(NOW + timedelta(days=days_left, hours=1)))
+    if sans:
+        builder = builder.add_extension(x509.SubjectAlternativeName(list(sans)), critical=False)
+    return builder.sign(key, hashes.SHA256()).public_bytes(serialization.Encoding.PEM)
+
+
+@unittest.skipIf(x509 is None, 'cryptography is not installed')
+class ScannerTest(unittest.TestCase):
+    """Unit tests for the scanner functions."""
+    @classmethod
+    def setUpClass(cls):
+        cls.rsa_key = rsa.generate_private_key(65537, 2048)
+        cls.pems = {
+            1: make_pem('one.example.com', 90, sans=[x509.DNSName('one.example.com'),
+                                                     x509.IPAddress(ipaddress.ip_address('10.0.0.1'))]),
+            2: make_pem('two.example.com', -3, key=cls.rsa_key),
+            3: make_pem('three.example.com', 10),
+        }
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testParseCertificate(self):
+        report = parse_certificate(self.pems[1].decode('ascii'), 'a.pem', 1, now=NOW)
+        self.assertTrue(report.ok)
+        self.assertEqual(report.subject, 'CN=one.example.com')
+        self.assertEqual(report.not_after, NOW + timedelta(days=90, hours=1))
+        self.assertEqual(report.days_left, 90)
+        self.assertEqual((report.key_type, report.key_size), ('EC', 256))
+        self.assertEqual(report.signature_algorithm, 'ecdsa-with-SHA256')
+        self.assertEqual(report.sans, (('DNS', 'one.example.com'), ('IP', '10.0.0.1')))
+
+        report = parse_certificate(self.pems[2], now=NOW)
+        self.assertEqual((report.key_type, report.key_size), ('RSA', 2048))
+        self.assertEqual(report.signature_algorithm, 'sha256WithRSAEncryption')
+        self.assertEqual(report.sans, ())
+        self.assertTrue(report.expired)
+
+    def testParseCertificateError(self):
+        report = parse_certificate(b'-----BEGIN CERTIFICATE-----\nnope\n', 'bad.pem', 7)
+        self.assertFalse(report.ok)
+        self.assertEqual((report.source, report.cert_id, report.not_after), ('bad.pem', 7, None))
+        self.assertIn('ValueError', report.error)
+
+    def testScanDirectory(self):
+        for cert_id, pem in self.pems.items():
+            with io.open(os.path.join(self.directory, '%d.cert.pem' % cert_id), 'wb') as out:
+                out.write(pem)
+        with io.open(os.path.join(self.directory, '4.cert.pem'), 'wb') as out:
+            out.write(b'garbage')
+        with io.open(os.path.join(self.directory, '1.chain.pem'), 'wb') as out:
+            out.write(self.pems[1])
+
+        reports = scan_directory(self.directory, processes=2, chunksize=1, now=NOW)
+        self.assertEqual([report.cert_id for report in reports], [2, 3, 1, 4])
+        self.assertEqual([report.days_left for report in reports], [-3, 10, 90, None])
+        self.assertFalse(reports[-1].ok)
+        self.assertEqual([report.cert_id for report in expiring(reports, 30)], [2, 3])
+
+    def testScanDirectoryKeepsNonNumericNames(self):
+        with io.open(os.path.join(self.directory, 'web.cert.pem'), 'wb') as out:
+            out.write(self.pems[1])
+        reports = scan_directory(self.directory, processes=1, now=NOW)
+        self.assertEqual([(report.cert_id, report.days_left) for report in reports], [('web', 90)])
+
+    def testScanPemsInProcess(self):
+        reports = scan_pems([('s%d' % cert_id, cert_id, pem) for cert_id, pem in self.pems.items()],
+                            processes=0, now=NOW)
+        self.assertEqual([report.source for report in reports], ['s2', 's3', 's1'])
+
+    def testScanSession(self):
+        def get(cert_id, what):
+            self.assertEqual(what, 'cert')
+            if cert_id == 5:
+                raise ValueError('boom')
+            return {'pem': self.pems[cert_id].decode('ascii')}
+
+        session = mock.Mock()
+        session.cert.get.side_effect = get
+        reports = scan_session(session, [1, 2, 3, 5], max_workers=2, processes=0, now=NOW)
+        self.assertEqual([report.cert_id for report in reports], [2, 3, 1, 5])
+        self.assertEqual(reports[0].source, 'cert/get:2')
+        self.assertEqual(reports[-1].error, 'ValueError: boom')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""Unit tests for the scheduler module."""
+
+import threading
+import time
+import unittest
+
+import mock
+import requests
+
+from tinycert.bulk import run_bulk
+from tinycert.fakeserver import FakeTinyCertServer
+from tinycert.scheduler import AdaptiveScheduler, retry_after_seconds
+from tinycert.session import Session
+
+
+def fake_response(status_code, headers=None):
+    response = mock.MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+
+class AdaptiveSchedulerTest(unittest.TestCase):
+    """Unit tests for the AdaptiveScheduler class."""
+    def setUp(self):
+        self.sleeps = []
+        self.scheduler = AdaptiveScheduler(initial_limit=4, max_limit=6, base_delay=1.0, sleep=self.sleeps.append,
+                                           jitter=lambda: 0.5)
+
+    def testAdditiveIncrease(self):
+        for _ in range(20):
+            self.scheduler.call('ca/list', lambda: fake_response(200))
+        self.assertEqual(self.scheduler.limit, 6)
+
+    def testMultiplicativeDecreaseOncePerWindow(self):
+        self.scheduler.call('cert/new', lambda: fake_response(503))
+        self.assertEqual(self.scheduler.limit, 2)
+        self.scheduler.call('cert/new', lambda: fake_response(503))
+        self.assertEqual(self.scheduler.limit, 1)
+        self.assertEqual(self.scheduler.throttled, 2)
+
+    def testTargetLatencyShrinksLimit(self):
+        clock = iter([0.0, 0.0, 5.0, 5.0])
+        scheduler = AdaptiveScheduler(initial_limit=8, target_latency=1.0, clock=lambda: next(clock))
+        scheduler.call('ca/list', lambda: fake_response(200))
+        self.assertEqual(scheduler.limit, 4)
+
+    def testRetriesReadsWithBackoffAndRetryAfter(self):
+        responses = [fake_response(500), fake_response(429, {'Retry-After': '7'}), fake_response(200)]
+        result = self.scheduler.call('cert/details', lambda: responses.pop(0))
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(self.sleeps, [0.5, 7.0])
+        self.assertEqual(self.scheduler.retries, 2)
+
+    def testGivesUpAfterMaxRetries(self):
+        result = self.scheduler.call('cert/details', lambda: fake_response(502))
+        self.assertEqual(result.status_code, 502)
+        self.assertEqual(len(self.sleeps), 3)
+
+    def testWritesAreNotRetried(self):
+        send = mock.MagicMock(return_value=fake_response(500))
+        self.assertEqual(self.scheduler.call('cert/new', send).status_code, 500)
+        self.assertEqual(send.call_count, 1)
+
+        send = mock.MagicMock(side_effect=requests.ConnectionError)
+        with self.assertRaises(requests.ConnectionError):
+            self.scheduler.call('cert/new', send)
+        self.assertEqual(send.call_count, 1)
+
+    def testConnectionErrorsOnReadsAreRetried(self):
+        send = mock.MagicMock(side_effect=[requests.ConnectionError, fake_response(200)])
+        self.assertEqual(self.scheduler.call('ca/list', send).status_code, 200)
+
+    def testLimitBoundsConcurrency(self):
+        scheduler = AdaptiveScheduler(initial_limit=2, max_limit=2)
+        lock = threading.Lock()
+        state = {'in_flight': 0, 'peak': 0}
+        release = threading.Event()
+
+        def send():
+            with lock:
+                state['in_flight'] += 1
+                state['peak'] = max(state['peak'], state['in_flight'])
+            release.wait(10)
+            with lock:
+                state['in_flight'] -= 1
+            return fake_response(200)
+
+        threads = [threading.Thread(target=scheduler.call, args=('ca/list', send)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        try:
+            deadline = time.monotonic() + 5
+            while scheduler.queue_depth < 4 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            self.assertEqual(scheduler.queue_depth, 4)
+            self.assertEqual(scheduler.in_flight, 2)
+        finally:
+            release.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(state['peak'], 2)
+
+    def testRetryAfterHttpDate(self):
+        response = fake_response(429, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        self.assertEqual(retry_after_seconds(response), 0.0)
+        self.assertIsNone(retry_after_seconds(fake_response(429)))
+
+
+class SessionSchedulerTest(unittest.TestCase):
+    """Drives a scheduled Session against a failing FakeTinyCertServer."""
+    def testBulkReadsSucceedDespiteServerErrors(self):
+        with FakeTinyCertServer(seed=1) as server:
+            server.add_account('me@foo.com', 'secret', 'somekey')
+            ca_id = server.add_ca()
+            cert_ids = [server.add_cert(ca_id, 'host%d.example.com' % i) for i in range(40)]
+
+            scheduler = AdaptiveScheduler(initial_limit=8, max_retries=10, base_delay=0.01, max_delay=0.05)
+            session = Session('somekey', base_url=server.base_url, scheduler=scheduler, pool_maxsize=16)
+            session.connect('me@foo.com', 'secret')
+            server.error_rate = 0.2
+            results = list(run_bulk(session.cert.details, cert_ids, max_workers=16))
+            session.close()
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertGreater(scheduler.throttled, 0)
+        self.assertLess(scheduler.limit, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
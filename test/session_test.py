@@ -1,12 +1,18 @@
 """Unit tests for the tiny_cert module."""
 from __future__ import unicode_literals
 
+import copy
 import unittest
 
+import mock
+import requests
 import requests_mock
 
+from tinycert.bulk import run_bulk
+from tinycert.fakeserver import FakeTinyCertServer
 from tinycert.session import Session
 from tinycert.session import auto_session
+from tinycert.tokenstore import MemoryTokenStore
 
 
 class SessionTest(unittest.TestCase):
@@ -108,6 +114,100 @@ class SessionTest(unittest.TestCase):
 
         self.assertIsNone(session._session_token)
 
+    @requests_mock.Mocker()
+    def testConnectionPoolReused(self, mock_requests):
+        self._setup_mock_requests(mock_requests)
+        mock_requests.register_uri('POST', 'https://www.tinycert.org/api/v1/ca/list', json=[])
+        session = Session(SessionTest.FAKE_API_KEY, pool_maxsize=4)
+        session.connect(SessionTest.FAKE_ACCOUNT, SessionTest.FAKE_PASSPHRASE)
+        http_session = session.transport.http_session()
+        session.ca.list()
+        session.ca.list()
+        self.assertIs(session.transport.http_session(), http_session)
+        adapter = http_session.get_adapter('https://www.tinycert.org/api/v1/ca/list')
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(http_session.headers['connection'], 'keep-alive')
+
+    @requests_mock.Mocker()
+    def testKeepAliveDisabled(self, mock_requests):
+        self._setup_mock_requests(mock_requests)
+        session = Session(SessionTest.FAKE_API_KEY, keep_alive=False)
+        session.connect(SessionTest.FAKE_ACCOUNT, SessionTest.FAKE_PASSPHRASE)
+        self.assertEqual(mock_requests.last_request.headers['connection'], 'close')
+
+    @requests_mock.Mocker()
+    def testDisconnectClosesPool(self, mock_requests):
+        self._setup_mock_requests(mock_requests)
+        session = Session(SessionTest.FAKE_API_KEY, SessionTest.FAKE_SESSION_TOKEN)
+        http_session = session.transport.http_session()
+        with mock.patch.object(http_session, 'close') as close:
+            session.disconnect()
+            close.assert_called_once_with()
+        self.assertIsNone(session.transport.http_session(create=False))
+
+    @requests_mock.Mocker()
+    def testContextManagerClosesPoolOnConnectFailure(self, mock_requests):
+        self._setup_mock_requests(mock_requests)
+        with self.assertRaises(requests.HTTPError):
+            with auto_session(SessionTest.FAKE_API_KEY, SessionTest.FAKE_ACCOUNT, 'wrong passphrase'):
+                pass
+        self.assertEqual(mock_requests.call_count, 1)
+
+    @requests_mock.Mocker()
+    def testRequestDoesNotModifyParams(self, mock_requests):
+        mock_requests.register_uri('POST', 'https://www.tinycert.org/api/v1/ca/details', json={'id': 1})
+        mock_requests.register_uri('POST', 'https://www.tinycert.org/api/v1/ca/list', json=[])
+        session = Session(SessionTest.FAKE_API_KEY, SessionTest.FAKE_SESSION_TOKEN)
+        params = {'ca_id': 1}
+        self.assertEqual(session.request('ca/details', params), {'id': 1})
+        self.assertEqual(params, {'ca_id': 1})
+        self.assertIn('token=sometoken', mock_requests.last_request.body)
+        session.request('ca/list')
+        self.assertIsNone(Session.request.__defaults__[0])
+
+
+class SessionConcurrencyTest(unittest.TestCase):
+    """Stress tests of one Session shared by many threads, against FakeTinyCertServer."""
+    API_KEY = 'somekey'
+    ACCOUNT = 'me@foo.com'
+    PASSPHRASE = 'my passphrase'
+    CALLS = 2000
+
+    def setUp(self):
+        self.server = FakeTinyCertServer().start()
+        self.server.add_account(self.ACCOUNT, self.PASSPHRASE, self.API_KEY)
+        self.ca_id = self.server.add_ca()
+        self.cert_ids = [self.server.add_cert(self.ca_id, 'host%d.example.com' % i) for i in range(20)]
+
+    def tearDown(self):
+        self.server.stop()
+
+    def testSharedSessionUnderLoad(self):
+        store = MemoryTokenStore()
+        store.replace = mock.Mock(wraps=store.replace)
+        session = Session(self.API_KEY, base_url=self.server.base_url, token_store=store, pool_maxsize=32)
+        session.connect(self.ACCOUNT, self.PASSPHRASE)
+        params = [{'cert_id': cert_id} for cert_id in self.cert_ids] + [{'ca_id': self.ca_id}]
+        original = copy.deepcopy(params)
+
+        def call(index):
+            if index == self.CALLS // 2:
+                self.server.revoke_tokens()
+            call_params = params[index % len(params)]
+            if 'ca_id' in call_params:
+                return len(session.request('cert/list', call_params)) == len(self.cert_ids)
+            return session.request('cert/details', call_params)['id'] == call_params['cert_id']
+
+        results = list(run_bulk(call, range(self.CALLS), max_workers=32))
+        session.disconnect()
+
+        self.assertEqual([result.error for result in results if not result.ok], [])
+        self.assertTrue(all(result.result for result in results))
+        self.assertEqual(params, original)
+        self.assertEqual(self.server.calls['connect'], 2)
+        self.assertEqual(store.replace.call_count, 1)
+        self.assertGreaterEqual(self.server.calls['cert/details'] + self.server.calls['cert/list'], self.CALLS)
+
 
 if __name__ == '__main__':
     unittest.main()
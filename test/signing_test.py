@@ -0,0 +1,79 @@
+"""Unit tests for the signing module."""
+
+import collections
+import hashlib
+import hmac
+import random
+import unittest
+import urllib.parse
+
+from tinycert.session import Session
+from tinycert.signing import RequestSigner
+
+
+def reference_sign(api_key, params):
+    """The original Session._sign_request_payload algorithm, kept as the reference for RequestSigner."""
+    flattened_params = Session._flatten_array_elements(params)
+    ordered_params = collections.OrderedDict(sorted(flattened_params.items()))
+    query_string = urllib.parse.urlencode(ordered_params, True)
+    hasher = hmac.new(api_key.encode('utf-8'), digestmod=hashlib.sha256)
+    hasher.update(query_string.encode('utf-8'))
+    return query_string + '&digest=%s' % hasher.hexdigest()
+
+
+class RequestSignerTest(unittest.TestCase):
+    """Unit tests for the RequestSigner class."""
+    API_KEY = 'ThisIsMySuperSecretAPIKey'
+
+    def testMatchesReferenceForSanHeavyPayload(self):
+        params = {
+            'token': 'd7dd6880c206216a9ed74f92ca8edaef88728bbb2c8b23020c624de9a7d08d6f',
+            'ca_id': 123,
+            'CN': '*.example.com',
+            'O': 'ACME, Inc.',
+            'SANs': [{'DNS': 'host%d.example.com' % i} for i in range(50)] + [{'IP': '::1'}, {'email': 'a+b@c.d'}],
+        }
+        self.assertEqual(RequestSigner(self.API_KEY).sign(params), reference_sign(self.API_KEY, params))
+
+    def testMatchesReferenceForMixedValueTypes(self):
+        params = {
+            'what': 6,
+            'ratio': 0.5,
+            'flag': True,
+            'none': None,
+            'unicode': 'café & bär=1',
+            'raw': b'bytes value',
+            'names': ['one', 'two words', 'three/3'],
+            'nested': ({'DNS': 'a.example.com', 'IP': '10.0.0.1'},),
+            'a key with spaces': 'x',
+        }
+        self.assertEqual(RequestSigner(self.API_KEY).sign(params), reference_sign(self.API_KEY, params))
+
+    def testMatchesReferenceForRandomPayloads(self):
+        rng = random.Random(7)
+        alphabet = 'abcXYZ019 &=+%/?[]é'
+        signer = RequestSigner(self.API_KEY)
+        for _ in range(200):
+            params = {}
+            for _ in range(rng.randint(0, 8)):
+                key = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 6)))
+                kind = rng.randint(0, 3)
+                if kind == 0:
+                    params[key] = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 10)))
+                elif kind == 1:
+                    params[key] = rng.randint(-1000, 1000)
+                elif kind == 2:
+                    params[key] = [''.join(rng.choice(alphabet) for _ in range(3)) for _ in range(rng.randint(0, 3))]
+                else:
+                    params[key] = [{rng.choice('ABC'): rng.choice(alphabet)} for _ in range(rng.randint(0, 12))]
+            self.assertEqual(signer.sign(params), reference_sign(self.API_KEY, params))
+
+    def testSignerIsReusable(self):
+        signer = RequestSigner(self.API_KEY)
+        first = signer.sign({'a': 1})
+        signer.sign({'b': 2})
+        self.assertEqual(signer.sign({'a': 1}), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Unit tests for the streaming module."""
+
+import json
+import random
+import unittest
+
+from tinycert.streaming import iter_json_array
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    """Unit tests for the iter_json_array function."""
+    DOCUMENT = [
+        {'id': 1, 'name': 'a "quoted" [name]', 'status': 'good', 'expires': 1},
+        {'id': 2, 'name': 'back\\slash\\', 'nested': {'list': [1, [2, {'x': '}'}]]}},
+        {'id': 3, 'name': 'caf\u00e9 \u2603', 'escapes': '\n\t\u0001\\"'},
+        ['an', 'array'],
+        'a string ] element',
+        {},
+    ]
+
+    def testEveryChunkSize(self):
+        data = json.dumps(self.DOCUMENT, ensure_ascii=False).encode('utf-8')
+        for size in range(1, 40):
+            elements = [value for _, value in iter_json_array(chunked(data, size))]
+            self.assertEqual(elements, self.DOCUMENT, 'chunk size %d' % size)
+
+    def testWhitespaceAndEmptyArray(self):
+        self.assertEqual(list(iter_json_array([b' \n[ ', b' ]  '])), [])
+        self.assertEqual(list(iter_json_array([b'[ {"a": 1} ,\n {"b": 2} ]'])), [('{"a": 1}', {'a': 1}),
+                                                                             ('{"b": 2}', {'b': 2})])
+
+    def testRandomDocuments(self):
+        rng = random.Random(3)
+        for _ in range(50):
+            document = [{'id': rng.randint(0, 10 ** 6),
+                         'name': ''.join(rng.choice('ab"\\{}[]\u00e9 ') for _ in range(10))}
+                        for _ in range(rng.randint(0, 20))]
+            data = json.dumps(document).encode('utf-8')
+            elements = [json.loads(raw) for raw, _ in iter_json_array(chunked(data, rng.randint(1, 64)))]
+            self.assertEqual(elements, document)
+
+    def testMalformedInput(self):
+        for data in (b'{"a": 1}', b'[{"a": 1}', b'[{"a": 1}]]', b'x[]', b'"text"', b'[{"a": 1},]', b'[{"a" 1}]',
+                     b'[{"a": 1} {"b": 2}]', b'[1, 2]'):
+            with self.assertRaises(ValueError):
+                list(iter_json_array([data]))
+
+    def testMalformedElementRaisesBeforeEndOfStream(self):
+        def chunks():
+            yield b'[{"a": 1}, {"b" 2}, {"c'
+            self.fail('read past the malformed element')
+
+        elements = iter_json_array(chunks())
+        self.assertEqual(next(elements), ('{"a": 1}', {'a': 1}))
+        with self.assertRaises(ValueError):
+            next(elements)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+"""Unit tests for the tokenstore module."""
+
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from tinycert.fakeserver import FakeTinyCertServer
+from tinycert.session import Session, auto_session
+from tinycert.tokenstore import FileTokenStore, MemoryTokenStore
+
+
+def _checkout_in_child(path, queue):
+    store = FileTokenStore(path)
+    queue.put(store.checkout('key', lambda: 'child-token'))
+
+
+class TokenStoreTest(unittest.TestCase):
+    """Unit tests for the TokenStore implementations."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'tokens.json')
+        self.now = [1000.0]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _stores(self):
+        clock = lambda: self.now[0]
+        return [MemoryTokenStore(ttl=60, clock=clock), FileTokenStore(self.path, ttl=60, clock=clock)]
+
+    def testCheckoutSharesLiveToken(self):
+        for store in self._stores():
+            connect = mock.MagicMock(side_effect=['first', 'second'])
+            self.assertEqual(store.checkout('key', connect), 'first')
+            self.assertEqual(store.checkout('key', connect), 'first')
+            self.assertEqual(connect.call_count, 1)
+
+            self.now[0] += 61
+            self.assertEqual(store.checkout('key', connect), 'second')
+            self.now[0] -= 61
+
+    def testLastCheckinDisconnects(self):
+        for store in self._stores():
+            store.checkout('key', lambda: 'token')
+            store.checkout('key', lambda: 'token')
+            disconnect = mock.MagicMock()
+            store.checkin('key', 'token', disconnect)
+            disconnect.assert_not_called()
+            store.checkin('key', 'token', disconnect)
+            disconnect.assert_called_once_with('token')
+            self.assertEqual(store.checkout('key', lambda: 'fresh'), 'fresh')
+
+    def testReplaceReusesAnotherUsersReplacement(self):
+        for store in self._stores():
+            store.checkout('key', lambda: 'stale')
+            self.assertEqual(store.replace('key', 'stale', lambda: 'fresh'), 'fresh')
+            connect = mock.MagicMock()
+            self.assertEqual(store.replace('key', 'stale', connect), 'fresh')
+            connect.assert_not_called()
+
+    def testStaleCheckinReleasesTheReplacement(self):
+        for store in self._stores():
+            store.checkout('key', lambda: 'stale')
+            store.checkout('key', lambda: 'stale')
+            self.assertEqual(store.replace('key', 'stale', lambda: 'fresh'), 'fresh')
+            disconnect = mock.MagicMock()
+            store.checkin('key', 'fresh', disconnect)
+            disconnect.assert_not_called()
+            store.checkin('key', 'stale', disconnect)
+            disconnect.assert_called_once_with('fresh')
+
+    def testUserCountResetsAfterExpiry(self):
+        for store in self._stores():
+            store.checkout('key', lambda: 'old')
+            store.checkout('key', lambda: 'old')  # a worker that crashes without checking in
+            self.now[0] += 61
+            self.assertEqual(store.replace('key', 'old', lambda: 'new'), 'new')
+            disconnect = mock.MagicMock()
+            store.checkin('key', 'old', disconnect)  # not counted against the new token
+            disconnect.assert_not_called()
+            store.checkin('key', 'new', disconnect)
+            disconnect.assert_called_once_with('new')
+            self.assertEqual(store.checkout('key', lambda: 'fresh'), 'fresh')
+            self.now[0] -= 61
+
+    def testHoldersOfAnExpiredTokenJoinItsReplacement(self):
+        for store in self._stores():
+            store.checkout('key', lambda: 'old')
+            store.checkout('key', lambda: 'old')
+            self.now[0] += 61
+            self.assertEqual(store.replace('key', 'old', lambda: 'new'), 'new')
+            self.assertEqual(store.replace('key', 'old', mock.MagicMock()), 'new')
+            disconnect = mock.MagicMock()
+            store.checkin('key', 'new', disconnect)
+            disconnect.assert_not_called()
+            store.checkin('key', 'new', disconnect)
+            disconnect.assert_called_once_with('new')
+            self.now[0] -= 61
+
+    def testFileStoreIsPrivateAndSharedAcrossProcesses(self):
+        store = FileTokenStore(self.path)
+        store.checkout('key', lambda: 'parent-token')
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+        queue = multiprocessing.Queue()
+        child = multiprocessing.Process(target=_checkout_in_child, args=(self.path, queue))
+        child.start()
+        child.join()
+        self.assertEqual(queue.get(timeout=5), 'parent-token')
+        with open(self.path) as tokens:
+            self.assertEqual(json.load(tokens)['key']['users'], 2)
+
+
+class SessionTokenStoreTest(unittest.TestCase):
+    """Drives Sessions sharing a token store against a FakeTinyCertServer."""
+    def setUp(self):
+        self.server = FakeTinyCertServer().start()
+        self.server.add_account('me@foo.com', 'secret', 'somekey')
+        self.store = MemoryTokenStore()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _session(self):
+        return auto_session('somekey', 'me@foo.com', 'secret', base_url=self.server.base_url,
+                            token_store=self.store)
+
+    def testSessionsShareOneConnect(self):
+        with self._session() as first:
+            first.ca.list()
+            with self._session() as second:
+                second.ca.list()
+            self.assertEqual(self.server.calls['disconnect'], 0)
+            first.ca.list()
+        self.assertEqual(self.server.calls['connect'], 1)
+        self.assertEqual(self.server.calls['disconnect'], 1)
+
+    def testRejectedTokenReconnectsOnce(self):
+        with self._session() as first:
+            with self._session() as second:
+                self.server._tokens.clear()
+                first.ca.list()
+                second.ca.list()
+                self.assertEqual(first._session_token, second._session_token)
+        self.assertEqual(self.server.calls['connect'], 2)
+        self.assertEqual(self.server.calls['ca/list'], 4)
+
+    def testReplacedTokenIsRetiredByTheLastSession(self):
+        first_context, second_context = self._session(), self._session()
+        first, second = first_context.__enter__(), second_context.__enter__()
+        self.server._tokens.clear()
+        first.ca.list()
+        fresh = first._session_token
+        first_context.__exit__(None, None, None)
+        self.assertEqual(self.server.calls['disconnect'], 0)
+        second_context.__exit__(None, None, None)  # still holding the rejected token
+        self.assertEqual(self.server.calls['disconnect'], 1)
+        self.assertNotIn(fresh, self.server._tokens)
+
+    def testWithoutStoreRejectionStillRaises(self):
+        session = Session('somekey', base_url=self.server.base_url)
+        session.connect('me@foo.com', 'secret')
+        self.server._tokens.clear()
+        with self.assertRaises(Exception):
+            session.ca.list()
+        session.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+"""Unit tests for the transport module."""
+
+import socket
+import unittest
+
+import requests
+
+from tinycert.bulk import run_bulk
+from tinycert.fakeserver import FakeTinyCertServer
+from tinycert.scheduler import AdaptiveScheduler
+from tinycert.session import Session, auto_session
+from tinycert.transport import InProcessTransport, RequestsTransport
+
+try:
+    import h2  # noqa: F401 pylint: disable=unused-import
+    from tinycert.transport import Http2Transport
+except ImportError:  # optional dependency
+    Http2Transport = None
+
+API_KEY = 'somekey'
+ACCOUNT = 'me@foo.com'
+PASSPHRASE = 'my passphrase'
+
+
+class TransportTestMixin(object):
+    """Behaviour every transport must share, exercised through a Session."""
+    def setUp(self):
+        self.server = FakeTinyCertServer()
+        self.server.add_account(ACCOUNT, PASSPHRASE, API_KEY)
+        self.ca_id = self.server.add_ca()
+        self.cert_ids = [self.server.add_cert(self.ca_id, 'host%d.example.com' % i) for i in range(30)]
+
+    def _session(self, **options):
+        return auto_session(API_KEY, ACCOUNT, PASSPHRASE, base_url=self.server.base_url,
+                            transport=self.make_transport(), **options)
+
+    def testRequests(self):
+        with self._session() as session:
+            self.assertEqual(len(session.cert.list(self.ca_id)), 30)
+            self.assertEqual([record.id for record in session.cert.iter_list(self.ca_id, chunk_size=64)],
+                             self.cert_ids)
+            self.assertIn('BEGIN CERTIFICATE', session.cert.get(self.cert_ids[0], 'cert')['pem'])
+            with self.assertRaises(requests.HTTPError) as raised:
+                session.cert.details(999)
+            self.assertEqual(raised.exception.response.status_code, 400)
+            self.assertIn('999', raised.exception.response.json()['message'])
+        self.assertEqual(self.server.calls['disconnect'], 1)
+
+    def testConcurrentRequests(self):
+        with self._session() as session:
+            results = list(run_bulk(session.cert.details, self.cert_ids * 5, max_workers=16))
+        self.assertTrue(all(result.ok and result.result['id'] == result.item for result in results))
+
+    def testRetryAfterIsHonoured(self):
+        self.server.error_rate = 0.0
+        scheduler = AdaptiveScheduler(max_retries=5, base_delay=0.0, sleep=lambda seconds: None)
+        self.server._limiter = None
+        with self._session(scheduler=scheduler) as session:
+            self.server.error_rate = 0.5
+            self.server._random.seed(3)
+            for cert_id in self.cert_ids[:10]:
+                self.assertEqual(session.cert.details(cert_id)['id'], cert_id)
+        self.assertGreater(scheduler.stats()['retries'], 0)
+
+
+class InProcessTransportTest(TransportTestMixin, unittest.TestCase):
+    """Unit tests for the InProcessTransport class; the server is never started."""
+    def make_transport(self):
+        return InProcessTransport(self.server)
+
+    def testHeadersAreCaseInsensitive(self):
+        server = FakeTinyCertServer(rate_limit=1, burst=1)
+        transport = InProcessTransport(server)
+        transport.post(server.base_url + 'connect', 'digest=x')
+        response = transport.post(server.base_url + 'connect', 'digest=x')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['retry-after'], response.headers['Retry-After'])
+
+
+class SocketTransportTestMixin(TransportTestMixin):
+    def setUp(self):
+        super(SocketTransportTestMixin, self).setUp()
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def testConnectionErrors(self):
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        listener.close()
+        session = Session(API_KEY, 'token', base_url='http://127.0.0.1:%d/api/v1/' % port,
+                          transport=self.make_transport())
+        with self.assertRaises(requests.ConnectionError):
+            session.ca.list()
+
+
+class RequestsTransportTest(SocketTransportTestMixin, unittest.TestCase):
+    """Unit tests for the RequestsTransport class."""
+    def make_transport(self):
+        return RequestsTransport(pool_maxsize=16)
+
+    def testSessionDefaultsToRequestsTransport(self):
+        session = Session(API_KEY, pool_maxsize=3)
+        self.assertIsInstance(session.transport, RequestsTransport)
+        adapter = session.transport.http_session().get_adapter('https://www.tinycert.org/api/v1/ca/list')
+        self.assertEqual(adapter._pool_maxsize, 3)
+
+
+@unittest.skipIf(Http2Transport is None, 'httpx[http2] is not installed')
+class Http2TransportTest(SocketTransportTestMixin, unittest.TestCase):
+    """Unit tests for the Http2Transport class. The fake server speaks HTTP/1.1, which the client falls back to."""
+    def make_transport(self):
+        return Http2Transport()
+
+    def testNegotiatesVersion(self):
+        transport = self.make_transport()
+        self.assertIsNone(transport.http_version)
+        with auto_session(API_KEY, ACCOUNT, PASSPHRASE, base_url=self.server.base_url, transport=transport):
+            pass
+        self.assertEqual(transport.http_version, 'HTTP/1.1')
+
+    def testWaitsForAFreeConnectionWithoutTimeout(self):
+        self.server.latency = 0.05
+        with auto_session(API_KEY, ACCOUNT, PASSPHRASE, base_url=self.server.base_url, timeout=None,
+                          transport=Http2Transport(max_connections=2)) as session:
+            results = list(run_bulk(session.cert.details, self.cert_ids[:6], max_workers=6))
+        self.assertTrue(all(result.ok for result in results), [result.error for result in results])
+        self.assertLessEqual(self.server.max_in_flight, 2)
+
+    def testCloseRestoresConnectionLimit(self):
+        import httpx
+        transport = Http2Transport(max_connections=2)
+        transport._client = httpx.Client(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={}, extensions={'http_version': b'HTTP/2'})))
+        transport.post('https://example.com/api/v1/ca/list', '').close()
+        self.assertEqual(transport.http_version, 'HTTP/2')
+        self.assertIsNone(transport._slots)
+
+        transport.close()
+        self.assertTrue(transport._slots.acquire(blocking=False))
+        self.assertTrue(transport._slots.acquire(blocking=False))
+        self.assertFalse(transport._slots.acquire(blocking=False))
+
+
+if __name__ == '__main__':
+    unittest.main()
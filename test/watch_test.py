@@ -0,0 +1,114 @@
+"""Unit tests for the watch module."""
+
+import threading
+import time
+import unittest
+
+from tinycert.cert import State
+from tinycert.fakeserver import FakeTinyCertServer
+from tinycert.session import auto_session
+from tinycert.watch import ADDED, REMOVED, STATE_CHANGED, UPDATED, CertificateWatcher
+
+
+class CertificateWatcherTest(unittest.TestCase):
+    """Unit tests for the CertificateWatcher class, run against FakeTinyCertServer."""
+    API_KEY = 'somekey'
+    ACCOUNT = 'me@foo.com'
+    PASSPHRASE = 'my passphrase'
+
+    def setUp(self):
+        self.server = FakeTinyCertServer().start()
+        self.server.add_account(self.ACCOUNT, self.PASSPHRASE, self.API_KEY)
+        self.ca_id = self.server.add_ca()
+        self.cert_ids = [self.server.add_cert(self.ca_id, 'host%d.example.com' % number) for number in range(6)]
+        self.session_context = auto_session(self.API_KEY, self.ACCOUNT, self.PASSPHRASE,
+                                            base_url=self.server.base_url)
+        self.session = self.session_context.__enter__()
+
+    def tearDown(self):
+        self.session_context.__exit__(None, None, None)
+        self.server.stop()
+
+    def testReportsOnlyChanges(self):
+        watcher = CertificateWatcher(self.session, ca_ids=[self.ca_id])
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.tracked, 6)
+        self.assertEqual(self.server.calls['cert/details'], 0)
+
+        revoked, held, reissued, deleted = self.cert_ids[:4]
+        new_id = self.server.add_cert(self.ca_id, 'new.example.com')
+        self.server.certs[revoked]['status'] = 'revoked'
+        self.server.certs[held]['status'] = 'hold'
+        self.server.certs[reissued]['expires'] += 86400
+        del self.server.certs[deleted]
+
+        events = sorted(watcher.poll(), key=lambda event: event.cert_id)
+        self.assertEqual([(event.kind, event.cert_id, event.old_state, event.new_state) for event in events], [
+            (STATE_CHANGED, revoked, State.good, State.revoked),
+            (STATE_CHANGED, held, State.good, State.hold),
+            (UPDATED, reissued, State.good, State.good),
+            (REMOVED, deleted, State.good, None),
+            (ADDED, new_id, None, State.good),
+        ])
+        self.assertEqual(events[0].details['status'], 'revoked')
+        self.assertEqual(events[4].details['CN'], 'new.example.com')
+        self.assertEqual(events[4].record.name, 'new.example.com')
+        self.assertIsNone(events[3].details)
+        self.assertEqual(self.server.calls['cert/details'], 4)
+
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(self.server.calls['cert/details'], 4)
+        self.assertEqual(watcher.tracked, 6)
+
+    def testStateFilterAndInitialEvents(self):
+        watcher = CertificateWatcher(self.session, ca_ids=[self.ca_id], states=State.good.value, emit_initial=True,
+                                     fetch_details=False)
+        self.assertEqual([event.kind for event in watcher.poll()], [ADDED] * 6)
+        self.server.certs[self.cert_ids[0]]['status'] = 'revoked'
+        events = watcher.poll()
+        self.assertEqual([(event.kind, event.cert_id) for event in events], [(REMOVED, self.cert_ids[0])])
+        self.assertEqual(self.server.calls['cert/details'], 0)
+
+    def testWatchesEveryCa(self):
+        watcher = CertificateWatcher(self.session)
+        watcher.poll()
+        other_ca = self.server.add_ca('Other')
+        other_cert = self.server.add_cert(other_ca, 'other.example.com')
+        self.assertEqual([(event.kind, event.ca_id, event.cert_id) for event in watcher.poll()],
+                         [(ADDED, other_ca, other_cert)])
+
+        del self.server.cas[other_ca]
+        del self.server.certs[other_cert]
+        self.assertEqual([(event.kind, event.cert_id) for event in watcher.poll()], [(REMOVED, other_cert)])
+
+    def testResultModels(self):
+        with auto_session(self.API_KEY, self.ACCOUNT, self.PASSPHRASE, base_url=self.server.base_url,
+                          result_models=True) as session:
+            watcher = CertificateWatcher(session)
+            watcher.poll()
+            self.server.certs[self.cert_ids[1]]['status'] = 'revoked'
+            events = watcher.poll()
+        self.assertEqual([(event.kind, event.cert_id) for event in events], [(STATE_CHANGED, self.cert_ids[1])])
+        self.assertEqual(events[0].details.state, State.revoked)
+
+    def testWatchUntilStopped(self):
+        watcher = CertificateWatcher(self.session, ca_ids=[self.ca_id])
+        stop = threading.Event()
+        seen = []
+
+        def change_later():
+            time.sleep(0.05)
+            self.server.certs[self.cert_ids[5]]['status'] = 'hold'
+
+        changer = threading.Thread(target=change_later)
+        changer.start()
+        for event in watcher.watch(interval=0.01, stop=stop):
+            seen.append(event)
+            stop.set()
+        changer.join()
+        self.assertEqual([(event.kind, event.cert_id) for event in seen], [(STATE_CHANGED, self.cert_ids[5])])
+        self.assertGreater(watcher.polls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
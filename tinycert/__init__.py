@@ -1,6 +1,31 @@
-"""TinyCert v1 API wrapper"""
+"""TinyCert v1 API wrapper
+
+The public names below are imported on first use, so `import tinycert` itself loads nothing else.
+"""
 from __future__ import unicode_literals
 
-from .session import Session, NoSessionException, auto_session
-from .cert import CertificateApi, State
-from .ca import CertificateAuthorityApi
+import importlib
+
+_LAZY_NAMES = {
+    'Session': '.session',
+    'NoSessionException': '.session',
+    'auto_session': '.session',
+    'CertificateApi': '.cert',
+    'State': '.cert',
+    'CertificateAuthorityApi': '.ca',
+}
+
+__all__ = sorted(_LAZY_NAMES)
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
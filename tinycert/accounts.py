@@ -0,0 +1,280 @@
+"""TinyCert multi-account manager
+
+This module provides AccountManager, which works on many TinyCert accounts at once. Accounts are spread over a
+pool of worker processes (shards); each shard keeps one connected Session per account it owns for as long as the
+manager is open, and runs that account's calls on its own threads, so request signing and JSON decoding use
+every core. Results from all accounts are merged into one stream as they complete.
+
+Work is handed out round-robin across accounts, and no account has more than its concurrency limit of calls in
+flight, so a large account cannot starve the others:
+
+    accounts = [Account(api_key, 'ops@example.com', passphrase), Account(other_key, 'web@example.com', other)]
+    with AccountManager(accounts, max_concurrency=4) as manager:
+        work = {'ops@example.com': ops_cert_ids, 'web@example.com': web_cert_ids}
+        for result in manager.run('cert.details', work):
+            print(result.account, result.item, result.result if result.ok else result.error)
+
+Calls, their items, results and errors travel between processes, so they must be picklable: name a session
+method such as 'cert.details', or pass a function defined at module level.
+"""
+
+from collections import deque, namedtuple
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import traceback
+
+from .session import Session
+
+
+class Account(namedtuple('Account', ['api_key', 'email', 'passphrase'])):
+    """Credentials of one TinyCert account. The email identifies the account within an AccountManager."""
+    __slots__ = ()
+
+
+class AccountResult(namedtuple('AccountResult', ['account', 'index', 'item', 'result', 'error'])):
+    """Outcome of one call made by AccountManager.run.
+
+    - account: email of the account the call was made for
+    - index: position of the item in that account's work
+    - item: the submitted item
+    - result: the call's return value, or None if it failed
+    - error: the exception raised by the call, or None if it succeeded
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """True if the call for this item succeeded."""
+        return self.error is None
+
+
+class WorkerError(Exception):
+    """Raised in place of an error that could not be sent back from a worker process, or if the worker died."""
+
+
+def _resolve(session, func):
+    if callable(func):
+        return func
+    target = session
+    for name in func.split('.'):
+        target = getattr(target, name)
+    return lambda session, item: target(*item) if isinstance(item, (tuple, list)) else target(item)
+
+
+def _serve(accounts, session_options, threads, inbox, outbox, check_pickle):
+    """Shard main loop: perform (job_id, email, func, item) jobs from inbox, putting (job_id, result, error) on outbox.
+
+    Runs until it receives None, then disconnects its sessions.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    credentials = dict((account.email, account) for account in accounts)
+    sessions = {}
+    locks = dict((email, threading.Lock()) for email in credentials)
+
+    def session_for(email):
+        with locks[email]:
+            session = sessions.get(email)
+            if session is None:
+                account = credentials[email]
+                session = Session(account.api_key, **session_options)
+                session.connect(account.email, account.passphrase)
+                sessions[email] = session
+            return session
+
+    def perform(job_id, email, func, item):
+        result = error = None
+        try:
+            session = session_for(email)
+            result = _resolve(session, func)(session, item)
+        except Exception as exc:  # pylint: disable=broad-except
+            error = exc
+        if check_pickle:
+            try:
+                pickle.dumps((result, error))
+            except Exception:  # pylint: disable=broad-except
+                text = ''.join(traceback.format_exception_only(type(error), error)) if error else repr(result)
+                result, error = None, WorkerError('could not return %s' % text.strip())
+        outbox.put((job_id, result, error))
+
+    executor = ThreadPoolExecutor(max_workers=threads)
+    try:
+        while True:
+            job = inbox.get()
+            if job is None:
+                break
+            executor.submit(perform, *job)
+    finally:
+        executor.shutdown(wait=True)
+        for session in sessions.values():
+            try:
+                session.disconnect()
+            except Exception:  # pylint: disable=broad-except
+                pass
+
+
+class _Shard(object):
+    """A worker process, or with processes=0 a thread, serving some of the accounts."""
+    def __init__(self, accounts, session_options, threads, outbox, context):
+        self.accounts = accounts
+        self._session_options = session_options
+        self._threads = threads
+        self._outbox = outbox
+        self._context = context
+        self.inbox = None
+        self.worker = None
+        self.start()
+
+    def start(self):
+        if self._context is None:
+            self.inbox = queue.Queue()
+            self.worker = threading.Thread(target=_serve, name='AccountManager shard', args=(
+                self.accounts, self._session_options, self._threads, self.inbox, self._outbox, False))
+        else:
+            self.inbox = self._context.Queue()
+            self.worker = self._context.Process(target=_serve, name='AccountManager shard', args=(
+                self.accounts, self._session_options, self._threads, self.inbox, self._outbox, True))
+        self.worker.daemon = True
+        self.worker.start()
+
+    def stop(self):
+        if self.worker.is_alive():
+            self.inbox.put(None)
+        self.worker.join()
+
+
+class AccountManager(object):
+    """Keeps a connected Session per account in a pool of worker processes and runs calls across all accounts.
+
+    Accounts connect on their first call and stay connected until close(). run() may be called any number of
+    times, but by one thread at a time.
+
+    :param accounts: iterable of Account credentials
+    :param processes: number of worker processes (default: one per core, at most one per account); 0 runs the
+        shards as threads of this process
+    :param max_concurrency: default limit on the calls in flight for each account
+    :param limits: optional dict of account email to a concurrency limit overriding max_concurrency
+    :param session_options: keyword arguments for each Session, e.g. base_url or timeout; must be picklable
+    """
+    def __init__(self, accounts, processes=None, max_concurrency=4, limits=None, **session_options):
+        self._accounts = list(accounts)
+        emails = [account.email for account in self._accounts]
+        if len(set(emails)) != len(emails):
+            raise ValueError('accounts must have distinct emails')
+        self._limits = dict((email, max_concurrency) for email in emails)
+        for email, limit in (limits or {}).items():
+            if email not in self._limits:
+                raise ValueError('limit given for unknown account %r' % email)
+            self._limits[email] = limit
+        if processes is None:
+            processes = os.cpu_count() or 1
+        shard_count = max(1, min(processes, len(self._accounts)))
+        context = multiprocessing.get_context() if processes else None
+        self._outbox = context.Queue() if context is not None else queue.Queue()
+
+        assignments = [self._accounts[index::shard_count] for index in range(shard_count)]
+        self._shards = [_Shard(owned, session_options, max(1, sum(self._limits[a.email] for a in owned)),
+                               self._outbox, context)
+                        for owned in assignments if owned]
+        self._shard_of = dict((account.email, shard) for shard in self._shards for account in shard.accounts)
+        self._job_ids = itertools.count()
+        self._closed = False
+
+    @property
+    def accounts(self):
+        """Emails of the managed accounts, in the order given."""
+        return [account.email for account in self._accounts]
+
+    def limit(self, email):
+        """Return the concurrency limit of the account."""
+        return self._limits[email]
+
+    def run(self, func, work, poll_interval=1.0):
+        """Call func for every item of every account's work, yielding an AccountResult per call as each finishes.
+
+        :param func: name of a Session method, e.g. 'cert.details', called with the item (unpacked if it is a tuple
+            or list); or a picklable callable(session, item)
+        :param work: dict of account email to an iterable of items; the iterables are consumed lazily
+        :param poll_interval: how often, in seconds, to check that worker processes are still alive while waiting
+        """
+        if self._closed:
+            raise ValueError('AccountManager is closed')
+        unknown = set(work) - set(self._limits)
+        if unknown:
+            raise ValueError('unknown accounts: %s' % ', '.join(sorted(unknown)))
+
+        sources = dict((email, enumerate(items)) for email, items in work.items())
+        rotation = deque(email for email in self.accounts if email in sources)
+        in_flight = dict((email, 0) for email in rotation)
+        outstanding = {}
+
+        def dispatch():
+            # One item per account per pass, so every account with spare capacity is served in turn.
+            progress = True
+            while progress:
+                progress = False
+                for _ in range(len(rotation)):
+                    email = rotation[0]
+                    rotation.rotate(-1)
+                    if in_flight[email] >= self._limits[email]:
+                        continue
+                    try:
+                        index, item = next(sources[email])
+                    except StopIteration:
+                        rotation.remove(email)
+                        continue
+                    job_id = next(self._job_ids)
+                    outstanding[job_id] = (email, index, item)
+                    in_flight[email] += 1
+                    self._shard_of[email].inbox.put((job_id, email, func, item))
+                    progress = True
+
+        dispatch()
+        while outstanding:
+            try:
+                job_id, result, error = self._outbox.get(timeout=poll_interval)
+            except queue.Empty:
+                for failed in self._reap(outstanding):
+                    in_flight[failed.account] -= 1
+                    yield failed
+                dispatch()
+                continue
+            job = outstanding.pop(job_id, None)
+            if job is None:
+                continue  # left over from an earlier run that was abandoned
+            email, index, item = job
+            in_flight[email] -= 1
+            yield AccountResult(email, index, item, result, error)
+            dispatch()
+
+    def _reap(self, outstanding):
+        """Fail the jobs of shards whose worker died, and restart those shards."""
+        failed = []
+        for shard in self._shards:
+            if shard.worker.is_alive():
+                continue
+            emails = set(account.email for account in shard.accounts)
+            for job_id, (email, index, item) in list(outstanding.items()):
+                if email in emails:
+                    del outstanding[job_id]
+                    failed.append(AccountResult(email, index, item, None, WorkerError('worker process exited')))
+            shard.start()
+        return failed
+
+    def close(self):
+        """Disconnect every session and stop the worker processes."""
+        if self._closed:
+            return
+        self._closed = True
+        for shard in self._shards:
+            shard.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
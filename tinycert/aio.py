@@ -0,0 +1,125 @@
+"""TinyCert asyncio Session
+
+This module provides AsyncSession, a non-blocking counterpart to Session for use on an asyncio event loop.
+It requires the optional httpx dependency (pip install tinycert[async]).
+
+The CertificateApi and CertificateAuthorityApi wrappers returned by AsyncSession.ca and AsyncSession.cert are
+the same classes used by Session; on an AsyncSession each of their single-call methods returns an awaitable. The
+thread-based helpers iter_list, export_many and create_many raise TypeError; gather list, get and create calls
+instead.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import httpx
+
+from .deadline import ConnectTimeout, ReadTimeout, split_timeout
+from .session import DEFAULT_BASE_URL, DEFAULT_TIMEOUT, _BaseSession
+
+
+@asynccontextmanager
+async def async_auto_session(api_key, account, passphrase, **session_options):
+    """Connect an AsyncSession for the duration of the block, then disconnect and close it.
+
+    Extra keyword arguments are passed through to the AsyncSession constructor (e.g. max_concurrency).
+    """
+    session = AsyncSession(api_key, **session_options)
+    try:
+        await session.connect(account, passphrase)
+        yield session
+    finally:
+        try:
+            if session._session_token is not None:
+                await session.disconnect()
+        finally:
+            await session.close()
+
+
+class AsyncSession(_BaseSession):
+    """Holds a session token and wraps the TinyCert API on an asyncio event loop.
+
+    Preferred usage is:
+    async with async_auto_session(api_key, account, passphrase) as session:
+          ca_list = await session.ca.list()
+
+    Requests are signed exactly as Session signs them. At most max_concurrency requests are in flight at once;
+    further calls wait their turn, so it is safe to gather hundreds of calls on one loop.
+
+    :param base_url: root of the v1 API
+    :param max_concurrency: maximum number of requests in flight at once
+    :param pool_maxsize: maximum number of pooled connections
+    :param keep_alive: if False, ask the server to close the connection after every request
+    :param transport: optional httpx transport, e.g. httpx.MockTransport for tests
+    :param timeout: connect and read timeout for every request, in seconds or as a (connect, read) tuple; None
+        waits forever. Exceeding them raises tinycert.deadline.ConnectTimeout or ReadTimeout. Deadlines from
+        tinycert.deadline are thread-local and do not apply; use asyncio.wait_for instead.
+    """
+    asynchronous = True
+
+    def __init__(self, api_key, session_token=None, base_url=DEFAULT_BASE_URL, max_concurrency=100, pool_maxsize=100,
+                 keep_alive=True, transport=None, timeout=DEFAULT_TIMEOUT):
+        super(AsyncSession, self).__init__(api_key, session_token, base_url)
+        self._max_concurrency = max_concurrency
+        self._pool_maxsize = pool_maxsize
+        self._keep_alive = keep_alive
+        self._transport = transport
+        self._timeout = split_timeout(timeout)
+        self._client = None
+        self._semaphore = None
+
+    def _http(self):
+        """Return the pooled HTTP client, creating it on first use."""
+        if self._client is None:
+            headers = {'content-type': 'application/x-www-form-urlencoded'}
+            if not self._keep_alive:
+                headers['connection'] = 'close'
+            limits = httpx.Limits(max_connections=self._pool_maxsize,
+                                  max_keepalive_connections=self._pool_maxsize if self._keep_alive else 0)
+            self._client = httpx.AsyncClient(headers=headers, limits=limits, transport=self._transport)
+        return self._client
+
+    def _limit(self):
+        """Return the semaphore bounding in-flight requests, created on first use so it binds to the running loop."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._semaphore
+
+    async def close(self):
+        """Close all pooled connections. The session may still be used afterwards."""
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    async def request(self, path, params=None):
+        params = dict(params or {})
+        if self._session_token:
+            params['token'] = self._session_token
+
+        signed_request_payload = self._sign_request_payload(params)
+
+        connect, read = self._timeout
+        async with self._limit():
+            try:
+                response = await self._http().post(self._base_url + path, content=signed_request_payload,
+                                                   timeout=httpx.Timeout(read, connect=connect, pool=connect))
+            except httpx.ConnectTimeout:
+                raise ConnectTimeout(path, 'no connection within %ss' % connect)
+            except httpx.TimeoutException:
+                raise ReadTimeout(path, 'no response within %ss' % read)
+        response.raise_for_status()
+        return response.json()
+
+    async def connect(self, account, passphrase):
+        """Connect this session to TinyCert, enabling API calls"""
+        params = {'email': account, 'passphrase': passphrase}
+        response = await self.request('connect', params)
+        self._session_token = response['token']
+
+    async def disconnect(self):
+        """Disconnect this session from TinyCert by retiring the session token and closing the connection pool."""
+        try:
+            await self.request('disconnect')
+            self._session_token = None
+        finally:
+            await self.close()
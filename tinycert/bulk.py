@@ -0,0 +1,96 @@
+"""TinyCert bulk operations
+
+This module fans a single-item API call out over a pool of worker threads and streams back one BulkResult per
+item as each call finishes. A failure affects only its own item; the rest of the batch carries on.
+"""
+
+from collections import namedtuple
+from functools import partial
+
+from .deadline import Deadline, within
+
+
+class BulkResult(namedtuple('BulkResult', ['index', 'item', 'result', 'error'])):
+    """Outcome of one item of a bulk operation.
+
+    - index: position of the item in the submitted iterable
+    - item: the submitted item
+    - result: the call's return value, or None if it failed
+    - error: the exception raised by the call, or None if it succeeded
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """True if the call for this item succeeded."""
+        return self.error is None
+
+
+def run_bulk(func, items, max_workers=8, ordered=False, deadline=None):
+    """Call func(item) for every item using up to max_workers threads, yielding a BulkResult per item.
+
+    Items are pulled from the iterable lazily, so arbitrarily long iterables (including generators) are never
+    materialised; only about 2 * max_workers items are outstanding at any time. Closing the generator early
+    cancels the items that have not started yet.
+
+    Calls run within the deadlines active on the calling thread, and within deadline if given. Once any of them
+    expires or is cancelled, no further items are pulled from the iterable, and outstanding items that have not
+    started fail with tinycert.deadline.DeadlineExceeded; calls already running are bounded by their timeouts.
+
+    :param func: callable taking a single item
+    :param items: iterable of items
+    :param max_workers: number of worker threads
+    :param ordered: if True, yield results in submission order; otherwise yield them as they complete
+    :param deadline: optional Deadline for the whole batch; cancel() it to abandon the outstanding work
+    """
+    # Imported here as concurrent.futures is comparatively slow to import and only needed once a batch runs.
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    window = max(1, max_workers * 2)
+    source = enumerate(items)
+    pending = {}
+    completed = {}
+    next_index = 0
+
+    deadlines = Deadline.active() + ((deadline,) if deadline is not None else ())
+    call = partial(_call_within, deadlines, func) if deadlines else func
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        def fill():
+            while len(pending) + len(completed) < window:
+                if any(active.expired for active in deadlines):
+                    return
+                try:
+                    index, item = next(source)
+                except StopIteration:
+                    return
+                pending[executor.submit(call, item)] = (index, item)
+
+        fill()
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                index, item = pending.pop(future)
+                error = future.exception()
+                result = BulkResult(index, item, None if error else future.result(), error)
+                if ordered:
+                    completed[index] = result
+                else:
+                    yield result
+            if ordered:
+                while next_index in completed:
+                    yield completed.pop(next_index)
+                    next_index += 1
+            fill()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def _call_within(deadlines, func, item):
+    with within(deadlines):
+        for deadline in deadlines:
+            deadline.check()
+        return func(item)
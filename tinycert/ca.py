@@ -1,8 +1,6 @@
 """TinyCert Certificate Authority APIs"""
 from __future__ import unicode_literals
 
-from builtins import object
-
 
 class CertificateAuthorityApi(object):
     """TinyCert Certificate Authority management."""
@@ -0,0 +1,114 @@
+"""TinyCert read cache
+
+This module provides ReadCache, an optional in-memory cache for the read-only API endpoints. Entries expire after
+a per-endpoint TTL and the least recently used entries are evicted once the cache is full. Writes made through
+the same session invalidate the entries they affect, so e.g. a cached cert/details never outlives a cert/status
+change made through that session.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+from .endpoints import INVALIDATIONS
+
+# Seconds each read endpoint's results are kept by default. Paths not listed are never cached.
+DEFAULT_TTLS = {
+    'ca/list': 300,
+    'ca/details': 300,
+    'cert/list': 60,
+    'cert/details': 60,
+}
+
+
+class ReadCache(object):
+    """Thread-safe TTL + LRU cache of API results, keyed by path and parameters.
+
+    Cached results are shared between callers and must be treated as read-only.
+
+    :param ttls: dict of path to TTL in seconds; only these paths are cached. Defaults to DEFAULT_TTLS.
+    :param maxsize: maximum number of entries kept
+    :param clock: callable returning the current time in seconds
+    """
+    def __init__(self, ttls=None, maxsize=1024, clock=time.monotonic):
+        self._ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self._maxsize = maxsize
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, path, params):
+        """Return the cache key for a request, or None if its results are not cacheable."""
+        if path not in self._ttls:
+            return None
+        try:
+            items = tuple(sorted((k, v) for k, v in params.items() if k != 'token'))
+            hash(items)
+        except TypeError:
+            return None
+        return path, items
+
+    def get(self, key):
+        """Return (True, value) for a live entry, or (False, None) on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    @property
+    def generation(self):
+        """Counter bumped by every invalidation; read it before fetching a result to pass to put()."""
+        return self._generation
+
+    def put(self, key, value, generation):
+        """Store a result, unless an invalidation happened since generation was read."""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (self._clock() + self._ttls[key[0]], value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, path, params):
+        """Drop the entries affected by a write to path with the given parameters."""
+        rules = INVALIDATIONS.get(path)
+        if not rules:
+            return
+        with self._lock:
+            self._generation += 1
+            for key in list(self._entries):
+                read_path, items = key
+                for rule_path, param in rules:
+                    if read_path != rule_path:
+                        continue
+                    if param is None or (param, params.get(param)) in items:
+                        del self._entries[key]
+                        break
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """Return a dict of the hit, miss and eviction counters and the current size."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._entries)}
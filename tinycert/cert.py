@@ -1,9 +1,11 @@
 """TinyCert Certificate APIs"""
 from __future__ import unicode_literals
 
-from builtins import object
 from enum import Enum
 
+from .bulk import run_bulk
+from .export import export
+
 
 class State(Enum):
     """Certificate state enum used for list filtering."""
@@ -18,6 +20,10 @@ class CertificateApi(object):
     def __init__(self, session):
         self._session = session
 
+    def _require_blocking(self, method, alternative):
+        if self._session.asynchronous:
+            raise TypeError('%s is not available on an AsyncSession; gather %s calls instead' % (method, alternative))
+
     def list(self, ca_id, states=(State.expired.value | State.good.value | State.revoked.value | State.hold.value)):
         """List all certificates under the given CA in the given states.
 
@@ -27,6 +33,24 @@ class CertificateApi(object):
         """
         return self._session.request('cert/list', {'ca_id': ca_id, 'what': states})
 
+    def iter_list(self, ca_id, states=(State.expired.value | State.good.value | State.revoked.value | State.hold.value),
+                  fast_json=False, chunk_size=65536):
+        """Iterate over the certificates under the given CA in the given states, as CertificateRecords.
+
+        The response is parsed incrementally as it arrives and each entry becomes a compact slot-based record, so
+        memory stays flat however many certificates the CA holds.
+
+        :param ca_id: the certificate authority id
+        :param states: bitwise OR of the states to return certificates for
+        :type states: int
+        :param fast_json: decode the whole response at once with orjson, when installed, trading flat memory for speed
+        :param chunk_size: size of the chunks read from the connection
+        """
+        self._require_blocking('iter_list', 'list')
+        from .models import iter_certificate_records
+        chunks = self._session.stream('cert/list', {'ca_id': ca_id, 'what': states}, chunk_size)
+        return iter_certificate_records(chunks, fast_json)
+
     def details(self, cert_id):
         """Retrieve details for the given certificate.
 
@@ -48,6 +72,22 @@ class CertificateApi(object):
         params = {'cert_id': cert_id, 'what': data_type}
         return self._session.request('cert/get', params)
 
+    def export_many(self, items, directory=None, sink=None, max_workers=8, ordered=False, overwrite=False):
+        """Download certificate data for many (cert_id, data_type) pairs in parallel, writing each as it arrives.
+
+        Returns a generator of ExportResult. See tinycert.export.export for details.
+
+        :param items: iterable of (cert_id, data_type) pairs, e.g. from tinycert.export.export_items(cert_ids)
+        :param directory: directory to write <cert_id>.<data_type>.pem files into
+        :param sink: callable(cert_id, data_type) returning a writable binary file object
+        :param max_workers: number of downloads to run at once
+        :param ordered: if True, yield results in the order of items; otherwise as they complete
+        :param overwrite: if False, resume by skipping files that already exist in directory
+        """
+        self._require_blocking('export_many', 'get')
+        return export(self._session, items, directory=directory, sink=sink, max_workers=max_workers,
+                      ordered=ordered, overwrite=overwrite)
+
     def reissue(self, cert_id):
         """Reissue the given certificate.
 
@@ -111,3 +151,18 @@ class CertificateApi(object):
         params = dict(cert_detail)
         params['ca_id'] = ca_id
         return self._session.request('cert/new', params)
+
+    def create_many(self, ca_id, cert_details, max_workers=8, ordered=False):
+        """Create many certificates signed by the given CA, in parallel.
+
+        Returns a generator of BulkResult, one per entry of cert_details, carrying either the create() response
+        or the exception raised for that entry. A failed entry does not stop the rest of the batch.
+        The session's pool_maxsize should be at least max_workers for every worker to keep a connection alive.
+
+        :param ca_id: id of the CA which will sign the certificates
+        :param cert_details: iterable of cert_detail dicts, as accepted by create()
+        :param max_workers: number of requests to run at once
+        :param ordered: if True, yield results in the order of cert_details; otherwise as they complete
+        """
+        self._require_blocking('create_many', 'create')
+        return run_bulk(lambda cert_detail: self.create(ca_id, cert_detail), cert_details, max_workers, ordered)
@@ -0,0 +1,269 @@
+"""TinyCert command-line tool
+
+Installed as the `tinycert` console script. Each subcommand performs one API call and prints its result as JSON
+(or, for get, the PEM itself):
+
+    tinycert list                      # CAs
+    tinycert list CA_ID --state good   # certificates under a CA
+    tinycert details CERT_ID           # or: details --ca CA_ID
+    tinycert get CERT_ID --what chain  # or: get --ca CA_ID
+    tinycert create CA_ID '{"CN": "www.example.com", "C": "US", "O": "Acme"}'
+    tinycert reissue CERT_ID
+    tinycert status CERT_ID revoked
+
+`tinycert batch [MANIFEST]` reads a JSONL manifest (or stdin), one operation per line, e.g.
+
+    {"op": "details", "cert_id": 12}
+    {"op": "create", "ca_id": 3, "detail": {"CN": "www.example.com", "C": "US", "O": "Acme"}}
+    {"op": "status", "cert_id": 12, "status": "revoked", "id": "my-correlation-id"}
+
+runs the operations concurrently and writes one JSON result per line to stdout as each finishes. The manifest is
+read lazily, so its size does not affect memory use.
+
+Credentials come from --api-key, --account and --passphrase or the TINYCERT_API_KEY, TINYCERT_ACCOUNT and
+TINYCERT_PASSPHRASE environment variables. --timeout bounds each request and --deadline the whole command; a
+batch stops reading its manifest once the deadline passes and exits with status 1.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+
+from .bulk import run_bulk
+from .cert import State
+from .deadline import Deadline
+from .models import as_dict
+from .session import DEFAULT_BASE_URL, DEFAULT_TIMEOUT, auto_session
+
+OPERATIONS = ('list', 'details', 'get', 'create', 'reissue', 'status')
+
+
+class OperationError(ValueError):
+    """Raised for a malformed operation."""
+
+
+def _require(operation, name):
+    value = operation.get(name)
+    if value is None:
+        raise OperationError('%s requires %s' % (operation.get('op'), name))
+    return value
+
+
+def parse_states(names):
+    """Return the State bitmask for a list of state names, or every state if names is empty."""
+    if not names:
+        return sum(state.value for state in State)
+    try:
+        return sum(State[name].value for name in set(names))
+    except KeyError as error:
+        raise OperationError('unknown state %s' % error)
+
+
+def run_operation(session, operation):
+    """Perform one operation, a dict such as {'op': 'details', 'cert_id': 12}, and return the API result.
+
+    Operations on a CA name ca_id and no cert_id; see the module documentation for the full list.
+
+    :raises OperationError: if the operation is malformed
+    """
+    op = operation.get('op')
+    cert_id = operation.get('cert_id')
+    ca_id = operation.get('ca_id')
+    if op == 'list':
+        if ca_id is None:
+            return session.ca.list()
+        return session.cert.list(ca_id, parse_states(operation.get('states')))
+    if op == 'details':
+        if cert_id is None:
+            return session.ca.details(_require(operation, 'ca_id'))
+        return session.cert.details(cert_id)
+    if op == 'get':
+        if cert_id is None:
+            return session.ca.get(_require(operation, 'ca_id'))
+        return session.cert.get(cert_id, operation.get('what', 'cert'))
+    if op == 'create':
+        detail = _require(operation, 'detail')
+        if ca_id is None:
+            return session.ca.create(detail)
+        return session.cert.create(ca_id, detail)
+    if op == 'reissue':
+        return session.cert.reissue(_require(operation, 'cert_id'))
+    if op == 'status':
+        return session.cert.set_status(_require(operation, 'cert_id'), _require(operation, 'status'))
+    raise OperationError('unknown op %r; expected one of %s' % (op, ', '.join(OPERATIONS)))
+
+
+def read_manifest(lines):
+    """Yield (line number, operation) for each non-blank line of a JSONL manifest.
+
+    A line that is not a JSON object yields its OperationError in place of the operation.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            operation = json.loads(line)
+            if not isinstance(operation, dict):
+                raise ValueError('not a JSON object')
+        except ValueError as error:
+            operation = OperationError('invalid manifest line: %s' % error)
+        yield number, operation
+
+
+def run_batch(session, lines, out, max_workers=8, ordered=False):
+    """Run every operation of a JSONL manifest, writing a JSON result line to out as each finishes.
+
+    Each result holds the manifest line number, the operation's op and id (if given), ok, and either result or
+    error. Returns the number of failed operations.
+    """
+    def perform(item):
+        _, operation = item
+        if isinstance(operation, Exception):
+            raise operation
+        return run_operation(session, operation)
+
+    failures = 0
+    for outcome in run_bulk(perform, read_manifest(lines), max_workers, ordered):
+        number, operation = outcome.item
+        record = {'line': number, 'ok': outcome.ok}
+        if isinstance(operation, dict):
+            record['op'] = operation.get('op')
+            if 'id' in operation:
+                record['id'] = operation['id']
+        if outcome.ok:
+            record['result'] = as_dict(outcome.result)
+        else:
+            failures += 1
+            record['error'] = '%s: %s' % (type(outcome.error).__name__, outcome.error)
+        out.write(json.dumps(record, sort_keys=True) + '\n')
+        out.flush()
+    return failures
+
+
+def _detail(value):
+    if value.startswith('@'):
+        try:
+            with io.open(value[1:], encoding='utf-8') as detail_file:
+                value = detail_file.read()
+        except (IOError, OSError) as error:
+            raise argparse.ArgumentTypeError(str(error))
+    try:
+        detail = json.loads(value)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError('invalid JSON: %s' % error)
+    if not isinstance(detail, dict):
+        raise argparse.ArgumentTypeError('expected a JSON object')
+    return detail
+
+
+def build_parser():
+    env = os.environ.get
+    parser = argparse.ArgumentParser(prog='tinycert', description='TinyCert v1 API command-line client.')
+    parser.add_argument('--api-key', default=env('TINYCERT_API_KEY'), help='API key [TINYCERT_API_KEY]')
+    parser.add_argument('--account', default=env('TINYCERT_ACCOUNT'), help='account email [TINYCERT_ACCOUNT]')
+    parser.add_argument('--passphrase', default=env('TINYCERT_PASSPHRASE'),
+                        help='account passphrase [TINYCERT_PASSPHRASE]')
+    parser.add_argument('--base-url', default=env('TINYCERT_BASE_URL', DEFAULT_BASE_URL),
+                        help='API root [TINYCERT_BASE_URL]')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='connect and read timeout per request (default: %s and %s)' % DEFAULT_TIMEOUT)
+    parser.add_argument('--deadline', type=float, metavar='SECONDS', help='time allowed for the whole command')
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    commands.required = True
+
+    command = commands.add_parser('list', help='list CAs, or the certificates under a CA')
+    command.add_argument('ca_id', nargs='?', help='list the certificates under this CA')
+    command.add_argument('--state', action='append', choices=[state.name for state in State], dest='states',
+                         help='only list certificates in this state (repeatable)')
+
+    for name, help_text in (('details', 'show certificate or CA details'), ('get', 'print a certificate or CA PEM')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('id', help='certificate id (CA id with --ca)')
+        command.add_argument('--ca', action='store_true', help='operate on a CA')
+        if name == 'get':
+            command.add_argument('--what', default='cert', choices=('cert', 'chain', 'csr', 'key.dec', 'key.enc'),
+                                 help='data to download (default: cert)')
+
+    command = commands.add_parser('create', help='create a certificate, or a CA with --ca')
+    command.add_argument('ca_id', nargs='?', help='id of the signing CA (omit with --ca)')
+    command.add_argument('detail', type=_detail, help='JSON object of certificate or CA details, or @file')
+    command.add_argument('--ca', action='store_true', help='create a CA')
+
+    command = commands.add_parser('reissue', help='reissue a certificate')
+    command.add_argument('cert_id')
+
+    command = commands.add_parser('status', help='set the status of a certificate')
+    command.add_argument('cert_id')
+    command.add_argument('status', choices=('good', 'hold', 'revoked'))
+
+    command = commands.add_parser('batch', help='run a JSONL manifest of operations concurrently')
+    command.add_argument('manifest', nargs='?', default='-', help='manifest file (default: stdin)')
+    command.add_argument('-j', '--workers', type=int, default=8, help='operations run at once (default: 8)')
+    command.add_argument('--ordered', action='store_true', help='write results in manifest order')
+    return parser
+
+
+def _operation(args):
+    if args.command == 'list':
+        return {'op': 'list', 'ca_id': args.ca_id, 'states': args.states}
+    if args.command in ('details', 'get'):
+        operation = {'op': args.command, 'ca_id' if args.ca else 'cert_id': args.id}
+        if args.command == 'get':
+            operation['what'] = args.what
+        return operation
+    if args.command == 'create':
+        return {'op': 'create', 'ca_id': None if args.ca else args.ca_id, 'detail': args.detail}
+    if args.command == 'reissue':
+        return {'op': 'reissue', 'cert_id': args.cert_id}
+    return {'op': 'status', 'cert_id': args.cert_id, 'status': args.status}
+
+
+def main(argv=None, stdin=None, stdout=None):
+    """Entry point of the tinycert console script. Returns the process exit status."""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    for name in ('api_key', 'account', 'passphrase'):
+        if not getattr(args, name):
+            parser.error('--%s or TINYCERT_%s is required' % (name.replace('_', '-'), name.upper()))
+    if args.command == 'create' and not args.ca and args.ca_id is None:
+        parser.error('create requires a CA id, or --ca to create a CA')
+    if args.command == 'batch' and args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    workers = args.workers if args.command == 'batch' else 1
+    timeout = DEFAULT_TIMEOUT if args.timeout is None else args.timeout
+    deadline = Deadline(args.deadline)
+    try:
+        with deadline, auto_session(args.api_key, args.account, args.passphrase, base_url=args.base_url,
+                                    pool_maxsize=workers, timeout=timeout) as session:
+            if args.command == 'batch':
+                if args.manifest == '-':
+                    failures = run_batch(session, stdin, stdout, workers, args.ordered)
+                else:
+                    with io.open(args.manifest, encoding='utf-8') as manifest:
+                        failures = run_batch(session, manifest, stdout, workers, args.ordered)
+                if deadline.expired:
+                    # The rest of the manifest was never read.
+                    print('tinycert: error: deadline exceeded', file=sys.stderr)
+                    return 1
+                return 1 if failures else 0
+
+            result = run_operation(session, _operation(args))
+    except Exception as error:  # pylint: disable=broad-except
+        print('tinycert: error: %s' % error, file=sys.stderr)
+        return 1
+
+    if args.command == 'get':
+        stdout.write(result['pem'])
+    else:
+        stdout.write(json.dumps(result, indent=2, sort_keys=True) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
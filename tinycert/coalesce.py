@@ -0,0 +1,120 @@
+"""TinyCert request coalescing
+
+This module provides Coalescer, an optional single-flight guard for the read-only API endpoints. While a read is in
+flight, identical calls (same path and parameters) made by other threads wait for it and share its result, or the
+Exception it raised, instead of sending a duplicate request. A call interrupted by any other BaseException (e.g.
+KeyboardInterrupt) re-raises it in its own thread only, and the waiting threads try again. Unlike ReadCache nothing
+is kept once the call returns, so results are never stale; the two can be combined.
+
+Writes made through the same session detach the in-flight reads they affect, so a read started after a write
+never shares a result fetched before it.
+"""
+
+import threading
+
+from .deadline import DeadlineExceeded, time_left
+from .endpoints import INVALIDATIONS, READ_ENDPOINTS
+
+
+class _Flight(object):
+    __slots__ = ('done', 'result', 'error', 'abandoned')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.abandoned = False
+
+
+class Coalescer(object):
+    """Thread-safe single-flight deduplication of concurrent identical reads.
+
+    Shared results must be treated as read-only. Only share a Coalescer between sessions of the same account.
+
+    :param endpoints: paths whose calls may be coalesced. Defaults to READ_ENDPOINTS.
+    """
+    def __init__(self, endpoints=READ_ENDPOINTS):
+        self._endpoints = frozenset(endpoints)
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def key(self, path, params):
+        """Return the key identical calls share, or None if the call may not be coalesced."""
+        if path not in self._endpoints:
+            return None
+        try:
+            items = tuple(sorted((k, v) for k, v in params.items() if k != 'token'))
+            hash(items)
+        except TypeError:
+            return None
+        return path, items
+
+    def call(self, path, params, fetch):
+        """Return fetch(), or the result of an identical call already in flight.
+
+        Waiting for another thread's call is bounded by the current Deadline, if any.
+
+        :param fetch: callable performing the request
+        """
+        key = self.key(path, params)
+        if key is None:
+            return fetch()
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # Wait no longer than this thread's own deadline, and do not inherit the leader's.
+            while not flight.done.wait(time_left(path)):
+                pass  # time_left raises once the deadline has passed
+            if flight.abandoned or isinstance(flight.error, DeadlineExceeded):
+                return self.call(path, params, fetch)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+            return flight.result
+        except Exception as error:
+            flight.error = error
+            raise
+        except BaseException:
+            flight.abandoned = True
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def invalidate(self, path, params):
+        """Detach the in-flight reads affected by a write to path, so later identical calls start afresh."""
+        rules = INVALIDATIONS.get(path)
+        if not rules:
+            return
+        with self._lock:
+            for key in list(self._flights):
+                read_path, items = key
+                for rule_path, param in rules:
+                    if read_path == rule_path and (param is None or (param, params.get(param)) in items):
+                        del self._flights[key]
+                        break
+
+    @property
+    def in_flight(self):
+        """Number of distinct calls currently in flight."""
+        return len(self._flights)
+
+    def stats(self):
+        """Return a dict of the executed and coalesced call counters and the number of calls in flight."""
+        with self._lock:
+            return {'executed': self.executed, 'coalesced': self.coalesced, 'in_flight': len(self._flights)}
@@ -0,0 +1,191 @@
+"""TinyCert timeouts and deadlines
+
+Every Session request is bounded by a connect timeout (for establishing the connection) and a read timeout (for
+each wait on the server's response); both are set per session with Session(timeout=...), and may be overridden
+for the requests made within a block with call_timeout() or for a single raw call with Session.request(timeout=).
+
+A Deadline bounds the total time of everything done on the current thread within its block, across any number
+of calls and retries, e.g. connect() followed by many reads:
+
+    with Deadline(30):
+        with auto_session(api_key, account, passphrase) as session:
+            for ca in session.ca.list():
+                session.cert.list(ca['id'])
+
+Each request's timeouts are shortened to the time left, and once it has run out, or the deadline was cancelled
+from another thread with cancel(), requests raise DeadlineExceeded instead of being sent. Deadlines nest: an inner
+deadline can shorten, but never extend, the one around it. run_bulk(deadline=...) applies a deadline to its
+worker threads.
+
+Timeouts raise the TimeoutException subclasses below rather than requests' exceptions, so they can be told apart
+from HTTP errors (requests.HTTPError) and from connections refused outright (requests.ConnectionError).
+"""
+
+from contextlib import contextmanager
+import threading
+import time
+
+_local = threading.local()
+
+
+class TimeoutException(Exception):
+    """Raised when a request was abandoned because it took too long."""
+    def __init__(self, path, message):
+        super(TimeoutException, self).__init__(message if path is None else '%s: %s' % (path, message))
+        self.path = path
+
+
+class ConnectTimeout(TimeoutException):
+    """Raised when no connection to the server could be established within the connect timeout.
+
+    The request was not sent, so it is always safe to retry.
+    """
+
+
+class ReadTimeout(TimeoutException):
+    """Raised when the server did not respond within the read timeout.
+
+    The server may still have carried out the request.
+    """
+
+
+class DeadlineExceeded(TimeoutException):
+    """Raised when a request could not complete before the current Deadline passed or was cancelled."""
+
+
+class Deadline(object):
+    """A time budget for the calls made on the current thread while it is entered as a context manager.
+
+    :param seconds: time allowed from creation, or None for no time limit (the deadline can still be cancelled)
+    :param clock: monotonic clock returning seconds
+    """
+    def __init__(self, seconds=None, clock=time.monotonic):
+        self._clock = clock
+        self._expires = None if seconds is None else clock() + seconds
+        self._cancelled = threading.Event()
+
+    def remaining(self):
+        """Seconds left, 0.0 once expired or cancelled, or None if there is no time limit."""
+        if self._cancelled.is_set():
+            return 0.0
+        if self._expires is None:
+            return None
+        return max(0.0, self._expires - self._clock())
+
+    @property
+    def expired(self):
+        """True once the deadline has passed or was cancelled."""
+        return self.remaining() == 0.0
+
+    @property
+    def cancelled(self):
+        """True if cancel() was called."""
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Expire the deadline now. Safe to call from any thread."""
+        self._cancelled.set()
+
+    def check(self, path=None):
+        """Raise DeadlineExceeded for path if the deadline has expired."""
+        if self.expired:
+            raise DeadlineExceeded(path, 'deadline cancelled' if self.cancelled else 'deadline exceeded')
+
+    def __enter__(self):
+        _stack().append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _stack().remove(self)
+
+    @staticmethod
+    def active():
+        """Return the deadlines entered on the current thread, outermost first."""
+        return tuple(_stack())
+
+
+@contextmanager
+def within(deadlines):
+    """Make deadlines, e.g. the Deadline.active() of another thread, active on this thread within the block."""
+    stack = _stack()
+    depth = len(stack)
+    stack.extend(deadlines)
+    try:
+        yield
+    finally:
+        del stack[depth:]
+
+
+@contextmanager
+def suspended():
+    """Lift the deadlines active on this thread within the block, e.g. for cleanup that must run regardless.
+
+    Requests remain bounded by their timeouts.
+    """
+    stack = _stack()
+    saved = stack[:]
+    del stack[:]
+    try:
+        yield
+    finally:
+        stack[:] = saved
+
+
+def _stack():
+    stack = getattr(_local, 'deadlines', None)
+    if stack is None:
+        stack = _local.deadlines = []
+    return stack
+
+
+@contextmanager
+def call_timeout(timeout):
+    """Use timeout, in seconds or as a (connect, read) tuple, for requests made on this thread within the block."""
+    outer = getattr(_local, 'timeout', _local)
+    _local.timeout = timeout
+    try:
+        yield
+    finally:
+        if outer is _local:
+            del _local.timeout
+        else:
+            _local.timeout = outer
+
+
+def split_timeout(timeout):
+    """Return timeout, given in seconds, as a (connect, read) tuple, or a (connect, read) tuple unchanged."""
+    if isinstance(timeout, tuple):
+        return timeout
+    return timeout, timeout
+
+
+def time_left(path):
+    """Return the seconds left before the earliest deadline active on this thread, or None if there is none.
+
+    :raises DeadlineExceeded: for path if an active deadline has expired
+    """
+    left = None
+    for deadline in _stack():
+        remaining = deadline.remaining()
+        if remaining is None:
+            continue
+        if remaining == 0.0:
+            deadline.check(path)  # expiry is permanent, so this raises
+        if left is None or remaining < left:
+            left = remaining
+    return left
+
+
+def request_timeout(path, default):
+    """Return the (connect, read) timeout for a request to path made now on this thread.
+
+    default applies unless a call_timeout() block overrides it; either part may be None for no limit. Both parts
+    are shortened to the time left before the earliest active deadline.
+
+    :raises DeadlineExceeded: for path if an active deadline has expired
+    """
+    connect, read = split_timeout(getattr(_local, 'timeout', default))
+    left = time_left(path)
+    if left is None:
+        return connect, read
+    return (left if connect is None else min(connect, left)), (left if read is None else min(read, left))
@@ -0,0 +1,26 @@
+"""TinyCert v1 endpoint metadata
+
+Classifies the API paths used by this package, so that session features such as caching can tell reads from
+writes without hard-coding paths in several places.
+"""
+
+# Endpoints that only read state and may safely be repeated.
+READ_ENDPOINTS = frozenset([
+    'ca/list',
+    'ca/details',
+    'ca/get',
+    'cert/list',
+    'cert/details',
+    'cert/get',
+])
+
+# For each mutating endpoint, the reads whose results it may change. Each entry is (read_path, param): results of
+# read_path called with the same value of param as the write are affected, or every result if param is None.
+INVALIDATIONS = {
+    'ca/new': [('ca/list', None)],
+    'ca/delete': [('ca/list', None), ('ca/details', 'ca_id'), ('ca/get', 'ca_id'), ('cert/list', 'ca_id'),
+                  ('cert/details', None), ('cert/get', None)],
+    'cert/new': [('cert/list', 'ca_id')],
+    'cert/reissue': [('cert/list', None), ('cert/details', 'cert_id'), ('cert/get', 'cert_id')],
+    'cert/status': [('cert/list', None), ('cert/details', 'cert_id')],
+}
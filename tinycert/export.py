@@ -0,0 +1,99 @@
+"""TinyCert bulk export
+
+This module downloads certificate material for many (cert_id, data_type) pairs concurrently and writes each one
+out as soon as it arrives, either to a directory (one PEM file per pair) or to caller-provided writable sinks.
+
+Each response carries a single PEM, which is decoded once received and written out straight away; only the
+responses currently in flight (at most one per worker) are held in memory, never the whole export. Files are
+written under a temporary name and renamed into place once complete, so re-running an interrupted export
+into the same directory skips everything already finished.
+"""
+
+from collections import namedtuple
+import io
+import itertools
+import os
+import time
+
+from .bulk import run_bulk
+
+DATA_TYPES = ('cert', 'chain', 'csr', 'key.enc')
+
+
+class ExportResult(namedtuple('ExportResult', ['cert_id', 'data_type', 'path', 'bytes', 'elapsed', 'skipped',
+                                               'error'])):
+    """Outcome of exporting one (cert_id, data_type) pair.
+
+    - path: file written, or None when exporting to a sink
+    - bytes: size of the PEM written (0 if skipped)
+    - elapsed: seconds spent downloading and writing
+    - skipped: True if the file already existed and was not fetched again
+    - error: the exception raised for this pair, or None
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """True if this pair was exported (or already present)."""
+        return self.error is None
+
+
+def export_items(cert_ids, data_types=DATA_TYPES):
+    """Yield every (cert_id, data_type) pair for the given certificates."""
+    return itertools.product(cert_ids, data_types)
+
+
+def export_path(directory, cert_id, data_type):
+    """Return the file a (cert_id, data_type) pair is exported to within directory."""
+    return os.path.join(directory, '%s.%s.pem' % (cert_id, data_type))
+
+
+def export(session, items, directory=None, sink=None, max_workers=8, ordered=False, overwrite=False):
+    """Download many (cert_id, data_type) pairs concurrently, yielding an ExportResult for each as it finishes.
+
+    Exactly one of directory or sink must be given.
+
+    :param session: a connected Session
+    :param items: iterable of (cert_id, data_type) pairs; see export_items()
+    :param directory: directory to write <cert_id>.<data_type>.pem files into; created if missing
+    :param sink: callable(cert_id, data_type) returning a writable binary file object, closed after writing
+    :param max_workers: number of downloads to run at once
+    :param ordered: if True, yield results in the order of items; otherwise as they complete
+    :param overwrite: if False, pairs whose file already exists in directory are skipped
+    """
+    if (directory is None) == (sink is None):
+        raise ValueError('exactly one of directory or sink is required')
+    if directory is not None and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    def export_one(item):
+        cert_id, data_type = item
+        started = time.time()
+        path = None
+        if directory is not None:
+            path = export_path(directory, cert_id, data_type)
+            if not overwrite and os.path.exists(path):
+                return ExportResult(cert_id, data_type, path, 0, 0.0, True, None)
+
+        pem = session.request('cert/get', {'cert_id': cert_id, 'what': data_type})['pem'].encode('utf-8')
+
+        if path is not None:
+            partial_path = path + '.part'
+            with io.open(partial_path, 'wb') as out:
+                out.write(pem)
+            os.replace(partial_path, path)
+        else:
+            out = sink(cert_id, data_type)
+            try:
+                out.write(pem)
+            finally:
+                out.close()
+        return ExportResult(cert_id, data_type, path, len(pem), time.time() - started, False, None)
+
+    for result in run_bulk(export_one, items, max_workers, ordered):
+        if result.ok:
+            yield result.result
+        else:
+            cert_id, data_type = result.item
+            path = export_path(directory, cert_id, data_type) if directory is not None else None
+            yield ExportResult(cert_id, data_type, path, 0, 0.0, False, result.error)
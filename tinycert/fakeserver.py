@@ -0,0 +1,353 @@
+"""TinyCert stand-in server
+
+This module provides FakeTinyCertServer, a local HTTP server implementing the v1 endpoints used by this package,
+for load and throughput testing without touching www.tinycert.org. Requests are authenticated exactly like the
+real API: every payload's digest is checked against the account's API key, and every call but connect must carry
+a live session token.
+
+Latency, injected errors and a rate limit can be configured to exercise clients under realistic conditions.
+
+Usage:
+with FakeTinyCertServer() as server:
+    server.add_account('me@example.com', 'passphrase', 'api key')
+    with auto_session('api key', 'me@example.com', 'passphrase', base_url=server.base_url) as session:
+        session.ca.list()
+"""
+
+import base64
+import collections
+import hmac
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import urllib.parse
+
+from .ratelimit import TokenBucket
+from .signing import RequestSigner
+
+CERT_STATUSES = ('good', 'hold', 'revoked')
+_STATE_BITS = {'expired': 1, 'good': 2, 'revoked': 4, 'hold': 8}
+_DATA_TYPES = ('cert', 'chain', 'csr', 'key.dec', 'key.enc')
+
+
+class ApiError(Exception):
+    """Raised by an endpoint handler to return an HTTP error status with a JSON error body."""
+    def __init__(self, status, message, headers=None):
+        super(ApiError, self).__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def _fake_pem(label, *parts):
+    body = base64.b64encode(('%s:%s' % (label, ':'.join(str(part) for part in parts))).encode('utf-8'))
+    return '-----BEGIN %s-----\n%s\n-----END %s-----\n' % (label, body.decode('ascii'), label)
+
+
+def _unflatten(params):
+    """Collapse PHP-style key[i][name] entries back into lists of dicts."""
+    result = {}
+    arrays = collections.defaultdict(dict)
+    for key, value in params.items():
+        if '[' not in key:
+            result[key] = value
+            continue
+        name, _, rest = key.partition('[')
+        index, _, sub = rest.partition(']')
+        sub = sub.strip('[]')
+        if not index.isdigit():
+            result[key] = value
+            continue
+        entry = arrays[name].setdefault(int(index), {} if sub else value)
+        if sub:
+            entry[sub] = value
+    for name, entries in arrays.items():
+        result[name] = [entries[index] for index in sorted(entries)]
+    return result
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections when many clients connect at once.
+    request_queue_size = 128
+
+
+class FakeTinyCertServer(object):
+    """In-memory stand-in for the TinyCert v1 API, served over HTTP on a local port.
+
+    :param host: interface to listen on
+    :param port: port to listen on; 0 picks a free port
+    :param latency: seconds to delay every response, or a callable(path) returning seconds
+    :param error_rate: fraction of requests (0-1) answered with HTTP 500
+    :param rate_limit: maximum sustained requests per second, answered with HTTP 429 and Retry-After beyond it
+    :param burst: number of requests allowed at once before rate_limit applies; defaults to rate_limit
+    :param seed: seed for the error injection
+    """
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, rate_limit=None, burst=None, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self._limiter = TokenBucket(rate_limit, burst or rate_limit) if rate_limit else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._accounts = {}
+        self._tokens = {}
+        self.cas = {}
+        self.certs = {}
+        self.calls = collections.Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._httpd = _HTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """The URL to pass as base_url to a Session."""
+        host, port = self._httpd.server_address[:2]
+        return 'http://%s:%d/api/v1/' % (host, port)
+
+    def start(self):
+        """Start serving on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), name='FakeTinyCertServer')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # Seeding helpers
+
+    def add_account(self, email, passphrase, api_key):
+        """Register an account that may connect with the given passphrase and sign with api_key."""
+        self._accounts[email] = (passphrase, RequestSigner(api_key))
+
+    def add_ca(self, name='Test CA', **detail):
+        """Create a CA directly, returning its id."""
+        with self._lock:
+            return self._new_ca(dict(detail, name=name))
+
+    def add_cert(self, ca_id, cn, status='good', expires=None, sans=(), **detail):
+        """Create a certificate directly, returning its id."""
+        params = dict(detail, CN=cn, SANs=[dict(san) for san in sans])
+        with self._lock:
+            cert_id = self._new_cert(ca_id, params)
+            self.certs[cert_id]['status'] = status
+            if expires is not None:
+                self.certs[cert_id]['expires'] = int(expires)
+            return cert_id
+
+    def revoke_tokens(self):
+        """Invalidate every session token issued so far, as if they had expired."""
+        with self._lock:
+            self._tokens.clear()
+
+    # Request handling
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                length = int(self.headers.get('content-length') or 0)
+                body = self.rfile.read(length).decode('utf-8')
+                status, payload, headers = server.handle(self.path, body)
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def handle(self, url_path, body):
+        """Handle one request, returning (status, json payload, extra headers)."""
+        path = url_path.split('?')[0]
+        if path.startswith('/api/v1/'):
+            path = path[len('/api/v1/'):]
+        with self._lock:
+            self.calls[path] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            latency = self.latency(path) if callable(self.latency) else self.latency
+            if latency:
+                time.sleep(latency)
+            if self._limiter is not None:
+                wait = self._limiter.take()
+                if wait:
+                    raise ApiError(429, 'rate limit exceeded', {'Retry-After': str(int(math.ceil(wait)))})
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise ApiError(500, 'injected error')
+            return 200, self._dispatch(path, body), {}
+        except ApiError as error:
+            return error.status, {'status': 'error', 'message': error.message}, error.headers
+        except Exception as error:  # pylint: disable=broad-except
+            return 500, {'status': 'error', 'message': repr(error)}, {}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _dispatch(self, path, body):
+        query_string, sep, digest = body.rpartition('&digest=')
+        if not sep:
+            raise ApiError(400, 'missing digest')
+        params = _unflatten(dict(urllib.parse.parse_qsl(query_string, keep_blank_values=True)))
+
+        if path == 'connect':
+            account = self._accounts.get(params.get('email'))
+            if account is None:
+                raise ApiError(401, 'invalid credentials')
+            signer = account[1]
+        else:
+            account_email = self._tokens.get(params.get('token'))
+            if account_email is None:
+                raise ApiError(401, 'invalid session token')
+            signer = self._accounts[account_email][1]
+        if not hmac.compare_digest(signer.digest(query_string), digest):
+            raise ApiError(401, 'invalid digest')
+
+        handler = self._ENDPOINTS.get(path)
+        if handler is None:
+            raise ApiError(404, 'unknown endpoint %s' % path)
+        with self._lock:
+            return handler(self, params)
+
+    def _connect(self, params):
+        passphrase, _ = self._accounts[params['email']]
+        if not hmac.compare_digest(passphrase, params.get('passphrase', '')):
+            raise ApiError(401, 'invalid credentials')
+        token = uuid.uuid4().hex
+        self._tokens[token] = params['email']
+        return {'token': token}
+
+    def _disconnect(self, params):
+        self._tokens.pop(params['token'], None)
+        return {}
+
+    def _lookup(self, table, key):
+        try:
+            return table[int(key)]
+        except (KeyError, TypeError, ValueError):
+            raise ApiError(400, 'unknown id %s' % key)
+
+    def _new_ca(self, params):
+        ca_id = next(self._ids)
+        detail = dict((key, params[key]) for key in ('C', 'ST', 'L', 'O', 'name') if key in params)
+        self.cas[ca_id] = dict(detail, id=ca_id, hash_alg=params.get('hash_method', 'sha256').upper())
+        return ca_id
+
+    def _new_cert(self, ca_id, params):
+        ca = self._lookup(self.cas, ca_id)
+        if not params.get('CN'):
+            raise ApiError(400, 'CN is required')
+        cert_id = next(self._ids)
+        detail = dict((key, params[key]) for key in ('C', 'ST', 'L', 'O', 'OU', 'CN') if key in params)
+        self.certs[cert_id] = dict(detail, id=cert_id, ca_id=ca['id'], status='good', Alt=params.get('SANs', []),
+                                   hash_alg=ca['hash_alg'], expires=int(time.time()) + 365 * 86400)
+        return cert_id
+
+    def _status(self, cert):
+        if cert['status'] == 'good' and cert['expires'] < time.time():
+            return 'expired'
+        return cert['status']
+
+    def _ca_list(self, params):
+        return [{'id': ca['id'], 'name': ca.get('name') or ca.get('O')} for ca in self.cas.values()]
+
+    def _ca_details(self, params):
+        return dict(self._lookup(self.cas, params.get('ca_id')))
+
+    def _ca_get(self, params):
+        ca = self._lookup(self.cas, params.get('ca_id'))
+        return {'pem': _fake_pem('CERTIFICATE', 'ca', ca['id'])}
+
+    def _ca_new(self, params):
+        return {'ca_id': self._new_ca(params)}
+
+    def _ca_delete(self, params):
+        ca = self._lookup(self.cas, params.get('ca_id'))
+        del self.cas[ca['id']]
+        for cert_id in [cert_id for cert_id, cert in self.certs.items() if cert['ca_id'] == ca['id']]:
+            del self.certs[cert_id]
+        return {}
+
+    def _cert_list(self, params):
+        ca = self._lookup(self.cas, params.get('ca_id'))
+        what = int(params.get('what', 15))
+        result = []
+        for cert in self.certs.values():
+            status = self._status(cert)
+            if cert['ca_id'] == ca['id'] and _STATE_BITS[status] & what:
+                result.append({'id': cert['id'], 'name': cert['CN'], 'status': status, 'expires': cert['expires']})
+        return result
+
+    def _cert_details(self, params):
+        cert = self._lookup(self.certs, params.get('cert_id'))
+        details = dict(cert, status=self._status(cert))
+        del details['ca_id']
+        return details
+
+    def _cert_get(self, params):
+        cert = self._lookup(self.certs, params.get('cert_id'))
+        what = params.get('what')
+        if what not in _DATA_TYPES:
+            raise ApiError(400, 'unknown data type %s' % what)
+        label = {'csr': 'CERTIFICATE REQUEST', 'key.dec': 'RSA PRIVATE KEY',
+                 'key.enc': 'ENCRYPTED PRIVATE KEY'}.get(what, 'CERTIFICATE')
+        return {'pem': _fake_pem(label, what, cert['id'], cert['expires'])}
+
+    def _cert_new(self, params):
+        return {'cert_id': self._new_cert(params.get('ca_id'), params)}
+
+    def _cert_reissue(self, params):
+        cert = self._lookup(self.certs, params.get('cert_id'))
+        return {'cert_id': self._new_cert(cert['ca_id'], dict(cert, SANs=cert['Alt']))}
+
+    def _cert_status(self, params):
+        cert = self._lookup(self.certs, params.get('cert_id'))
+        if params.get('status') not in CERT_STATUSES:
+            raise ApiError(400, 'unknown status %s' % params.get('status'))
+        cert['status'] = params['status']
+        return {}
+
+    _ENDPOINTS = {
+        'connect': _connect,
+        'disconnect': _disconnect,
+        'ca/list': _ca_list,
+        'ca/details': _ca_details,
+        'ca/get': _ca_get,
+        'ca/new': _ca_new,
+        'ca/delete': _ca_delete,
+        'cert/list': _cert_list,
+        'cert/details': _cert_details,
+        'cert/get': _cert_get,
+        'cert/new': _cert_new,
+        'cert/reissue': _cert_reissue,
+        'cert/status': _cert_status,
+    }
@@ -0,0 +1,190 @@
+"""TinyCert local inventory
+
+This module provides Inventory, an on-disk SQLite index of the CAs and certificates in an account. sync() fills
+it from the API and, on later runs, only fetches cert/details for certificates that are new or whose status or
+expiry changed since the last sync. The index can then be queried by CA, state, CN, SAN or expiry locally.
+"""
+
+from collections import namedtuple
+import json
+import sqlite3
+import time
+
+from .bulk import run_bulk
+from .cert import State
+from .models import as_dict, field
+
+ALL_STATES = State.expired.value | State.good.value | State.revoked.value | State.hold.value
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cas (
+    id PRIMARY KEY,
+    name TEXT,
+    synced_at REAL
+);
+CREATE TABLE IF NOT EXISTS certs (
+    id PRIMARY KEY,
+    ca_id NOT NULL,
+    name TEXT,
+    status TEXT,
+    state INTEGER,
+    expires INTEGER,
+    cn TEXT,
+    details TEXT,
+    synced_at REAL
+);
+CREATE INDEX IF NOT EXISTS certs_ca_id ON certs (ca_id);
+CREATE INDEX IF NOT EXISTS certs_state ON certs (state);
+CREATE INDEX IF NOT EXISTS certs_cn ON certs (cn);
+CREATE INDEX IF NOT EXISTS certs_expires ON certs (expires);
+CREATE TABLE IF NOT EXISTS sans (
+    cert_id NOT NULL,
+    type TEXT,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS sans_cert_id ON sans (cert_id);
+CREATE INDEX IF NOT EXISTS sans_value ON sans (value);
+'''
+
+_CERT_COLUMNS = ('id', 'ca_id', 'name', 'status', 'state', 'expires', 'cn')
+
+
+class SyncResult(namedtuple('SyncResult', ['cas', 'listed', 'fetched', 'removed', 'errors'])):
+    """Counts from one Inventory.sync() run.
+
+    - cas: number of CAs synced
+    - listed: number of certificates returned by cert/list
+    - fetched: number of cert/details calls made
+    - removed: number of certificates dropped from the index
+    - errors: list of (cert_id, exception) for details that could not be fetched
+    """
+    __slots__ = ()
+
+
+def state_of(status):
+    """Map a status string returned by the API onto its State bit, or 0 if unknown."""
+    try:
+        return State[status].value
+    except KeyError:
+        return 0
+
+
+class Inventory(object):
+    """Local SQLite index of certificates, kept up to date incrementally by sync().
+
+    :param path: database file, or ':memory:' for a transient index
+    """
+    def __init__(self, path=':memory:'):
+        self._db = sqlite3.connect(path)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def sync(self, session, states=ALL_STATES, ca_ids=None, max_workers=8):
+        """Bring the index up to date with the account.
+
+        Certificates whose status and expiry match the index are not fetched again. Indexed certificates in the
+        synced states that are no longer listed are removed.
+
+        :param session: a connected Session, with or without result_models
+        :param states: bitwise OR of the State values to sync
+        :param ca_ids: CAs to sync; defaults to every CA returned by ca/list
+        :param max_workers: number of cert/details calls to run at once
+        """
+        now = time.time()
+        if ca_ids is None:
+            ca_list = session.ca.list()
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO cas (id, name, synced_at) VALUES (?, ?, ?)',
+                                     [(field(ca, 'id'), field(ca, 'name'), now) for ca in ca_list])
+            ca_ids = [field(ca, 'id') for ca in ca_list]
+
+        listed = fetched = removed = 0
+        errors = []
+        for ca_id in ca_ids:
+            entries = session.cert.list(ca_id, states)
+            listed += len(entries)
+            known = dict((row['id'], (row['status'], row['expires'])) for row in self._db.execute(
+                'SELECT id, status, expires FROM certs WHERE ca_id = ? AND state & ?', (ca_id, states)))
+
+            changed = [entry for entry in entries
+                       if known.pop(field(entry, 'id'), None) != (field(entry, 'status'), field(entry, 'expires'))]
+            with self._db:
+                for result in run_bulk(lambda entry: session.cert.details(field(entry, 'id')), changed, max_workers):
+                    fetched += 1
+                    if result.ok:
+                        self._store(ca_id, result.item, result.result, now)
+                    else:
+                        errors.append((field(result.item, 'id'), result.error))
+                for cert_id in known:
+                    self._delete(cert_id)
+                removed += len(known)
+
+        return SyncResult(len(ca_ids), listed, fetched, removed, errors)
+
+    def _store(self, ca_id, entry, details, now):
+        details = as_dict(details)
+        cert_id = field(entry, 'id')
+        status = field(entry, 'status') or details.get('status')
+        self._db.execute('INSERT OR REPLACE INTO certs (id, ca_id, name, status, state, expires, cn, details, '
+                         'synced_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (cert_id, ca_id, field(entry, 'name'), status, state_of(status), field(entry, 'expires'),
+                          details.get('CN'), json.dumps(details), now))
+        self._db.execute('DELETE FROM sans WHERE cert_id = ?', (cert_id,))
+        self._db.executemany('INSERT INTO sans (cert_id, type, value) VALUES (?, ?, ?)',
+                             [(cert_id, san_type, value)
+                              for san in details.get('Alt') or () for san_type, value in san.items()])
+
+    def _delete(self, cert_id):
+        self._db.execute('DELETE FROM certs WHERE id = ?', (cert_id,))
+        self._db.execute('DELETE FROM sans WHERE cert_id = ?', (cert_id,))
+
+    def certificates(self, ca_id=None, states=None, cn=None, san=None, expires_before=None, expires_after=None):
+        """Query the index, returning a list of dicts with id, ca_id, name, status, state, expires and cn.
+
+        All given filters must match. Results are ordered by expiry.
+
+        :param ca_id: only certificates under this CA
+        :param states: bitwise OR of the State values to include
+        :param cn: exact Common Name
+        :param san: exact Subject Alternative Name value, of any type
+        :param expires_before: only certificates expiring before this unix timestamp
+        :param expires_after: only certificates expiring at or after this unix timestamp
+        """
+        clauses = []
+        args = []
+        if ca_id is not None:
+            clauses.append('ca_id = ?')
+            args.append(ca_id)
+        if states is not None:
+            clauses.append('state & ?')
+            args.append(states)
+        if cn is not None:
+            clauses.append('cn = ?')
+            args.append(cn)
+        if san is not None:
+            clauses.append('id IN (SELECT cert_id FROM sans WHERE value = ?)')
+            args.append(san)
+        if expires_before is not None:
+            clauses.append('expires < ?')
+            args.append(expires_before)
+        if expires_after is not None:
+            clauses.append('expires >= ?')
+            args.append(expires_after)
+        query = 'SELECT %s FROM certs' % ', '.join(_CERT_COLUMNS)
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY expires'
+        return [dict(row) for row in self._db.execute(query, args)]
+
+    def details(self, cert_id):
+        """Return the cert/details response stored for a certificate, or None if it is not indexed."""
+        row = self._db.execute('SELECT details FROM certs WHERE id = ?', (cert_id,)).fetchone()
+        return json.loads(row['details']) if row else None
+
+    def cas(self):
+        """Return the indexed CAs as a list of dicts with id and name."""
+        return [dict(row) for row in self._db.execute('SELECT id, name FROM cas ORDER BY id')]
@@ -0,0 +1,153 @@
+"""TinyCert request instrumentation
+
+Session(instrumentation=...) reports a RequestEvent for every API call to the given hook, which is any object with
+an observe(event) method. Metrics is the built-in hook: a thread-safe in-process aggregator of per-endpoint call
+and error counts, latency histograms, signing and JSON decoding time and request/response sizes, which can be
+dumped with snapshot() or scraped in the Prometheus text format with render().
+
+Without a hook, Session skips all timing and bookkeeping.
+"""
+
+import bisect
+from collections import namedtuple
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestEvent(namedtuple('RequestEvent', ['path', 'status', 'latency', 'sign_seconds', 'decode_seconds',
+                                               'request_bytes', 'response_bytes', 'error'])):
+    """Measurements of one API call.
+
+    - path: API path, e.g. 'cert/details'
+    - status: HTTP status of the final response, or None if none was received
+    - latency: seconds from the start of the call until it returned or raised, including signing, retries
+      and decoding
+    - sign_seconds: seconds spent signing payloads
+    - decode_seconds: seconds spent decoding the JSON response
+    - request_bytes: size of the signed payloads sent
+    - response_bytes: size of the response body
+    - error: the exception raised by the call, or None
+    """
+    __slots__ = ()
+
+
+class RequestProbe(object):
+    """Accumulates the signing measurements of one call while it is in progress."""
+    __slots__ = ('sign_seconds', 'request_bytes')
+
+    def __init__(self):
+        self.sign_seconds = 0.0
+        self.request_bytes = 0
+
+
+class Histogram(object):
+    """Cumulative histogram with fixed upper bounds, as in Prometheus."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Return a list of (upper bound, count of observations <= bound), ending with ('+Inf', total)."""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class EndpointMetrics(object):
+    """Aggregated measurements of one endpoint."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram(buckets)
+        self.sign_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'latency_seconds': {'sum': self.latency.sum, 'count': self.latency.count,
+                                'buckets': self.latency.cumulative()},
+            'sign_seconds': self.sign_seconds,
+            'decode_seconds': self.decode_seconds,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+        }
+
+
+class Metrics(object):
+    """Thread-safe in-process aggregator of RequestEvents, keyed by endpoint.
+
+    :param buckets: latency histogram upper bounds in seconds
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, event):
+        """Record one RequestEvent."""
+        with self._lock:
+            endpoint = self._endpoints.get(event.path)
+            if endpoint is None:
+                endpoint = self._endpoints[event.path] = EndpointMetrics(self._buckets)
+            endpoint.calls += 1
+            if event.error is not None:
+                endpoint.errors += 1
+            endpoint.latency.observe(event.latency)
+            endpoint.sign_seconds += event.sign_seconds
+            endpoint.decode_seconds += event.decode_seconds
+            endpoint.request_bytes += event.request_bytes
+            endpoint.response_bytes += event.response_bytes
+
+    def reset(self):
+        """Discard everything recorded so far."""
+        with self._lock:
+            self._endpoints = {}
+
+    def snapshot(self):
+        """Return a dict of endpoint path to a dict of its measurements."""
+        with self._lock:
+            return dict((path, endpoint.as_dict()) for path, endpoint in self._endpoints.items())
+
+    def render(self, prefix='tinycert'):
+        """Return the measurements in the Prometheus text exposition format."""
+        lines = []
+        counters = [
+            ('requests_total', 'API calls made', 'calls'),
+            ('request_errors_total', 'API calls that raised', 'errors'),
+            ('sign_seconds_total', 'Seconds spent signing payloads', 'sign_seconds'),
+            ('decode_seconds_total', 'Seconds spent decoding JSON responses', 'decode_seconds'),
+            ('request_bytes_total', 'Bytes of signed payloads sent', 'request_bytes'),
+            ('response_bytes_total', 'Bytes of response bodies received', 'response_bytes'),
+        ]
+        snapshot = sorted(self.snapshot().items())
+        for name, help_text, field in counters:
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+            lines.append('# TYPE %s_%s counter' % (prefix, name))
+            for path, endpoint in snapshot:
+                lines.append('%s_%s{endpoint="%s"} %s' % (prefix, name, path, endpoint[field]))
+
+        name = '%s_request_duration_seconds' % prefix
+        lines.append('# HELP %s API call latency' % name)
+        lines.append('# TYPE %s histogram' % name)
+        for path, endpoint in snapshot:
+            latency = endpoint['latency_seconds']
+            for bound, count in latency['buckets']:
+                lines.append('%s_bucket{endpoint="%s",le="%s"} %d' % (name, path, bound, count))
+            lines.append('%s_sum{endpoint="%s"} %s' % (name, path, latency['sum']))
+            lines.append('%s_count{endpoint="%s"} %d' % (name, path, latency['count']))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,263 @@
+"""TinyCert result models
+
+Compact, immutable, slot-based records for API results. Each is parsed once from the decoded JSON: statuses are
+mapped onto State and timestamps onto timezone-aware UTC datetimes up front, while fields the model does not name
+are kept aside (as raw JSON where available) and only decoded when extra is read.
+
+Session(result_models=True) returns these in place of dicts for ca/list, ca/details, cert/list and cert/details;
+parse_result() converts a raw response explicitly. Records are safe to share, cache and pickle.
+"""
+
+from datetime import datetime, timezone
+import json
+
+from .cert import State
+from .streaming import fast_loads, iter_json_array
+
+
+def parse_state(status):
+    """Map a status string onto its State, or None if it is not a known state."""
+    return State.__members__.get(status) if status is not None else None
+
+
+def parse_timestamp(value):
+    """Parse a unix timestamp (number or numeric string) or ISO 8601 string into a UTC datetime, or None."""
+    if value is None or value == '':
+        return None
+    try:
+        return datetime.fromtimestamp(float(value), timezone.utc)
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+
+
+def _restore(cls, values, extra):
+    record = cls.__new__(cls)
+    for name, value in zip(cls._fields, values):
+        object.__setattr__(record, name, value)
+    object.__setattr__(record, '_extra', extra)
+    return record
+
+
+class _Model(object):
+    """Base for immutable slot-based records. Subclasses list their public fields in _fields and __slots__."""
+    __slots__ = ('_extra',)
+    _fields = ()
+
+    def __init__(self, extra=None, **values):
+        for name in self._fields:
+            object.__setattr__(self, name, values.get(name))
+        object.__setattr__(self, '_extra', extra)
+
+    @classmethod
+    def _split(cls, entry, raw, named):
+        """Return the extra value for entry: raw JSON if given, else a dict of the fields not in named."""
+        if all(key in named for key in entry):
+            return None
+        if raw is not None:
+            return raw
+        return dict((k, v) for k, v in entry.items() if k not in named)
+
+    @property
+    def extra(self):
+        """Dict of the response fields this model does not name, decoded on first access."""
+        extra = self._extra
+        if extra is None:
+            return {}
+        if not isinstance(extra, dict):
+            extra = dict((k, v) for k, v in json.loads(extra).items() if k not in self._json_fields)
+            object.__setattr__(self, '_extra', extra)
+        return extra
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def _as_dict(self):
+        values = dict(self.extra)
+        values.update((name, getattr(self, name)) for name in self._fields
+                      if name in self._json_fields and getattr(self, name) is not None)
+        return values
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    def __reduce__(self):
+        return _restore, (type(self), self._values(), self._extra)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values() and self.extra == other.extra
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash((type(self), self._values()))
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__,
+                           ', '.join('%s=%r' % (name, getattr(self, name)) for name in self._fields))
+
+
+class CertificateRecord(_Model):
+    """One entry of a cert/list result.
+
+    :ivar id: certificate id
+    :ivar name: certificate name (its Common Name)
+    :ivar status: status string, e.g. 'good'
+    :ivar state: status as a State, or None if unknown
+    :ivar expires: expiry as returned by the API (a unix timestamp)
+    :ivar expires_at: expiry as a UTC datetime, or None
+    """
+    __slots__ = ('id', 'name', 'status', 'state', 'expires', 'expires_at')
+    _fields = __slots__
+    _json_fields = frozenset(['id', 'name', 'status', 'expires'])
+
+    def __init__(self, id, name, status, expires, extra=None):  # pylint: disable=redefined-builtin
+        super(CertificateRecord, self).__init__(extra, id=id, name=name, status=status, state=parse_state(status),
+                                                expires=expires, expires_at=parse_timestamp(expires))
+
+    @classmethod
+    def from_json(cls, entry, raw=None):
+        """Build a record from a decoded cert/list entry.
+
+        :param raw: the entry's undecoded JSON; if given, unnamed fields are kept in this form until extra is read
+        """
+        return cls(entry.get('id'), entry.get('name'), entry.get('status'), entry.get('expires'),
+                   cls._split(entry, raw, cls._json_fields))
+
+
+class CertificateAuthority(_Model):
+    """One entry of a ca/list result.
+
+    :ivar id: CA id
+    :ivar name: CA name
+    """
+    __slots__ = ('id', 'name')
+    _fields = __slots__
+    _json_fields = frozenset(_fields)
+
+    @classmethod
+    def from_json(cls, entry, raw=None):
+        """Build a record from a decoded ca/list entry."""
+        return cls(cls._split(entry, raw, cls._json_fields), id=entry.get('id'), name=entry.get('name'))
+
+
+class CertificateAuthorityDetails(_Model):
+    """A ca/details result.
+
+    :ivar id: CA id
+    :ivar C, ST, L, O, OU, CN, E: subject fields, as named by the API
+    :ivar hash_alg: signature hash algorithm, e.g. 'SHA256'
+    """
+    __slots__ = ('id', 'C', 'ST', 'L', 'O', 'OU', 'CN', 'E', 'hash_alg')
+    _fields = __slots__
+    _json_fields = frozenset(_fields)
+
+    @classmethod
+    def from_json(cls, entry, raw=None):
+        """Build a record from a decoded ca/details result."""
+        return cls(cls._split(entry, raw, cls._json_fields), **dict((name, entry.get(name)) for name in cls._fields))
+
+
+class CertificateDetails(_Model):
+    """A cert/details result.
+
+    :ivar id: certificate id
+    :ivar status: status string, e.g. 'good'
+    :ivar state: status as a State, or None if unknown
+    :ivar C, ST, L, O, OU, CN: subject fields, as named by the API
+    :ivar sans: Subject Alternative Names as a tuple of (type, value) pairs, e.g. (('DNS', 'example.com'),)
+    :ivar hash_alg: signature hash algorithm, e.g. 'SHA256'
+    :ivar expires: expiry as returned by the API, if present
+    :ivar expires_at: expiry as a UTC datetime, or None
+    """
+    __slots__ = ('id', 'status', 'state', 'C', 'ST', 'L', 'O', 'OU', 'CN', 'sans', 'hash_alg', 'expires',
+                 'expires_at')
+    _fields = __slots__
+    _json_fields = frozenset(['id', 'status', 'C', 'ST', 'L', 'O', 'OU', 'CN', 'Alt', 'hash_alg', 'expires'])
+
+    @classmethod
+    def from_json(cls, entry, raw=None):
+        """Build a record from a decoded cert/details result."""
+        status = entry.get('status')
+        sans = tuple((san_type, value) for san in entry.get('Alt') or () for san_type, value in san.items())
+        return cls(cls._split(entry, raw, cls._json_fields), id=entry.get('id'), status=status,
+                   state=parse_state(status), C=entry.get('C'), ST=entry.get('ST'), L=entry.get('L'),
+                   O=entry.get('O'), OU=entry.get('OU'), CN=entry.get('CN'), sans=sans,
+                   hash_alg=entry.get('hash_alg'), expires=entry.get('expires'),
+                   expires_at=parse_timestamp(entry.get('expires')))
+
+    def _as_dict(self):
+        values = super(CertificateDetails, self)._as_dict()
+        if self.sans:
+            values['Alt'] = [{san_type: value} for san_type, value in self.sans]
+        return values
+
+
+def as_dict(result):
+    """Return an API result in its decoded JSON form: a model as a dict of the API's field names, a list of models
+    as a list of dicts, and anything else unchanged.
+
+    Lets code that works on dicts accept results from a Session(result_models=True) as well.
+    """
+    if isinstance(result, _Model):
+        return result._as_dict()
+    if isinstance(result, list) and result and isinstance(result[0], _Model):
+        return [entry._as_dict() for entry in result]
+    return result
+
+
+def field(result, name, default=None):
+    """Return the field of an API result by its API name (e.g. 'id', 'expires' or 'Alt'), whether result is a
+    decoded dict or a model, or default if it has no such field."""
+    if isinstance(result, dict):
+        return result.get(name, default)
+    if name in result._json_fields and name in result._fields:
+        value = getattr(result, name)
+        return default if value is None else value
+    return result._as_dict().get(name, default)
+
+
+def _parse_list(model):
+    return lambda result: [model.from_json(entry) for entry in result]
+
+
+# Converters from decoded responses to models, by API path.
+RESULT_PARSERS = {
+    'ca/list': _parse_list(CertificateAuthority),
+    'ca/details': CertificateAuthorityDetails.from_json,
+    'cert/list': _parse_list(CertificateRecord),
+    'cert/details': CertificateDetails.from_json,
+}
+
+
+def parse_result(path, result):
+    """Convert a decoded API response into models if path has a model, else return it unchanged."""
+    parser = RESULT_PARSERS.get(path)
+    return parser(result) if parser is not None else result
+
+
+def iter_certificate_records(chunks, fast_json=False):
+    """Yield a CertificateRecord for each entry of a cert/list response body read from byte chunks.
+
+    By default entries are decoded incrementally, so memory stays flat. With fast_json and orjson installed, the
+    body is instead read whole and decoded by orjson, which is faster but holds the whole decoded list at once.
+    """
+    from_json = CertificateRecord.from_json
+    loads = fast_loads() if fast_json else None
+    if loads is not None:
+        for entry in loads(b''.join(chunks)):
+            yield from_json(entry)
+        return
+    for raw, entry in iter_json_array(chunks):
+        yield from_json(entry, raw)
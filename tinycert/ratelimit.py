@@ -0,0 +1,39 @@
+"""TinyCert rate limiting
+
+This module provides TokenBucket, the rate limiter shared by the renewal scheduler and the stand-in server.
+"""
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket allowing rate acquisitions per second on average, in bursts of up to burst."""
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self._rate = float(rate)
+        self._burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(self._burst)
+        self._updated = clock()
+
+    def take(self):
+        """Take a token without waiting, returning 0 on success or the seconds until one is available."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self._rate
+
+    def acquire(self):
+        """Take one token, waiting until one is available."""
+        while True:
+            wait = self.take()
+            if not wait:
+                return
+            self._sleep(wait)
@@ -0,0 +1,229 @@
+"""TinyCert desired-state reconciliation
+
+This module compares a declarative description of the certificates wanted under each CA with what the account
+holds, and computes the smallest set of changes that brings the two in line:
+
+- create: no usable certificate has the desired CN
+- reissue: the certificate matches but has expired, is on hold, or expires within renew_within seconds
+- replace: the certificate's subject fields or SANs differ; a new one is created, then the old one revoked
+- revoke: with prune=True, an unexpired certificate whose CN is not desired, or a duplicate of one that is
+
+Desired state is a dict of CA id to a list of certificate specs, each a cert_detail dict as taken by
+CertificateApi.create (CN, SANs, C, O, OU, ...). Certificates are matched by CN, so each CN may be desired only
+once per CA. Where several certificates share a CN, a good one is preferred over one on hold or expired, and then
+the one expiring last.
+
+Planning costs one cert/list per CA. Detecting subject and SAN drift needs each certificate's details: these are
+read from an Inventory when it holds an up-to-date copy, fetched with cert/details if fetch_details is set, and
+otherwise not checked.
+"""
+
+from collections import Counter, namedtuple
+import time
+
+from .bulk import run_bulk
+from .cert import State
+from .models import field
+
+CREATE = 'create'
+REISSUE = 'reissue'
+REPLACE = 'replace'
+REVOKE = 'revoke'
+
+# API calls needed to carry out each kind of action.
+ACTION_CALLS = {CREATE: 1, REISSUE: 1, REPLACE: 2, REVOKE: 1}
+
+LISTED_STATES = State.good.value | State.hold.value | State.expired.value
+
+_SUBJECT_FIELDS = ('C', 'ST', 'L', 'O', 'OU')
+
+
+class Action(namedtuple('Action', ['kind', 'ca_id', 'cn', 'cert_id', 'detail', 'reason'])):
+    """One change in a Plan.
+
+    - kind: CREATE, REISSUE, REPLACE or REVOKE
+    - ca_id: CA the certificate belongs to
+    - cn: Common Name of the certificate
+    - cert_id: existing certificate acted on, or None for CREATE
+    - detail: cert_detail to create the certificate with, or None for REISSUE and REVOKE
+    - reason: short human-readable explanation
+    """
+    __slots__ = ()
+
+
+class Plan(object):
+    """The changes needed to reach a desired state, and what computing them cost.
+
+    :ivar actions: list of Actions
+    :ivar planning_calls: API calls made while planning
+    :ivar results: BulkResults from apply(), in the order of actions, or None if the plan was not applied
+    """
+    def __init__(self, actions, planning_calls):
+        self.actions = actions
+        self.planning_calls = planning_calls
+        self.results = None
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __iter__(self):
+        return iter(self.actions)
+
+    @property
+    def estimated_calls(self):
+        """Number of API calls apply() will make."""
+        return sum(ACTION_CALLS[action.kind] for action in self.actions)
+
+    def summary(self):
+        """Return a dict of action kind to count."""
+        return dict(Counter(action.kind for action in self.actions))
+
+    def apply(self, session, max_workers=8):
+        """Carry out the actions in parallel, returning a BulkResult per action in plan order.
+
+        A REPLACE revokes the old certificate only once its successor was created. Each result's value is the
+        id of the certificate created or reissued, or None for a revocation.
+        """
+        self.results = list(run_bulk(lambda action: _apply(session, action), self.actions, max_workers,
+                                     ordered=True))
+        return self.results
+
+
+def _apply(session, action):
+    if action.kind == CREATE:
+        return session.cert.create(action.ca_id, action.detail)['cert_id']
+    if action.kind == REISSUE:
+        return session.cert.reissue(action.cert_id)['cert_id']
+    if action.kind == REPLACE:
+        cert_id = session.cert.create(action.ca_id, action.detail)['cert_id']
+        session.cert.set_status(action.cert_id, 'revoked')
+        return cert_id
+    session.cert.set_status(action.cert_id, 'revoked')
+    return None
+
+
+def _san_set(sans):
+    return frozenset((san_type, value) for san in sans or () for san_type, value in san.items())
+
+
+def drift(spec, details):
+    """Return a description of how a certificate's details differ from spec, or None if they match.
+
+    Only the subject fields and SANs spec names are compared.
+    """
+    changed = [name for name in _SUBJECT_FIELDS if name in spec and field(details, name) != spec[name]]
+    if 'SANs' in spec and _san_set(field(details, 'Alt')) != _san_set(spec['SANs']):
+        changed.append('SANs')
+    return 'changed %s' % ', '.join(changed) if changed else None
+
+
+def plan(session, desired_state, inventory=None, fetch_details=False, prune=False, renew_within=0, max_workers=8):
+    """Compute the Plan that brings the account in line with desired_state, without changing anything.
+
+    :param session: a connected Session
+    :param desired_state: dict of CA id to a list of cert_detail dicts; CAs not listed are left alone
+    :param inventory: optional Inventory whose stored details are used for drift detection where still current
+    :param fetch_details: fetch cert/details for certificates the inventory cannot answer for
+    :param prune: revoke certificates under the listed CAs that are not desired
+    :param renew_within: reissue certificates expiring within this many seconds
+    :param max_workers: number of calls to run at once while planning
+    :raises ValueError: if a CN is desired more than once under one CA
+    """
+    ca_ids = list(desired_state)
+    for ca_id in ca_ids:
+        duplicates = [cn for cn, count in Counter(spec['CN'] for spec in desired_state[ca_id]).items() if count > 1]
+        if duplicates:
+            raise ValueError('desired more than once under CA %s: %s' % (ca_id, ', '.join(sorted(duplicates))))
+    calls = len(ca_ids)
+    listings = {}
+    for result in run_bulk(lambda ca_id: session.cert.list(ca_id, LISTED_STATES), ca_ids, max_workers):
+        if not result.ok:
+            raise result.error
+        listings[result.item] = result.result
+
+    horizon = time.time() + renew_within
+    actions = []
+    checks = []
+    for ca_id in ca_ids:
+        by_cn = {}
+        for entry in listings[ca_id]:
+            by_cn.setdefault(field(entry, 'name'), []).append(entry)
+        for entries in by_cn.values():
+            entries.sort(key=lambda entry: (field(entry, 'status') == State.good.name, field(entry, 'expires') or 0),
+                         reverse=True)
+
+        desired_cns = set()
+        for spec in desired_state[ca_id]:
+            cn = spec['CN']
+            desired_cns.add(cn)
+            entries = by_cn.get(cn)
+            if not entries:
+                actions.append(Action(CREATE, ca_id, cn, None, spec, 'missing'))
+                continue
+            current = entries[0]
+            if prune:
+                actions.extend(Action(REVOKE, ca_id, cn, field(entry, 'id'), None, 'superseded')
+                               for entry in entries[1:] if _live(entry))
+            checks.append((ca_id, spec, current))
+
+        if prune:
+            for cn, entries in sorted(by_cn.items()):
+                if cn not in desired_cns:
+                    actions.extend(Action(REVOKE, ca_id, cn, field(entry, 'id'), None, 'not desired')
+                                   for entry in entries if _live(entry))
+
+    details = {}
+    to_fetch = []
+    for ca_id, spec, current in checks:
+        stored = _stored_details(inventory, current)
+        if stored is not None:
+            details[field(current, 'id')] = stored
+        elif fetch_details:
+            to_fetch.append(field(current, 'id'))
+    for result in run_bulk(session.cert.details, to_fetch, max_workers):
+        calls += 1
+        if not result.ok:
+            raise result.error
+        details[result.item] = result.result
+
+    for ca_id, spec, current in checks:
+        cn = spec['CN']
+        cert_id = field(current, 'id')
+        reason = drift(spec, details[cert_id]) if cert_id in details else None
+        expires = field(current, 'expires')
+        if reason is not None:
+            actions.append(Action(REPLACE, ca_id, cn, cert_id, spec, reason))
+        elif field(current, 'status') == State.expired.name:
+            actions.append(Action(REISSUE, ca_id, cn, cert_id, None, 'expired'))
+        elif field(current, 'status') == State.hold.name:
+            actions.append(Action(REISSUE, ca_id, cn, cert_id, None, 'on hold'))
+        elif expires is not None and float(expires) < horizon:
+            actions.append(Action(REISSUE, ca_id, cn, cert_id, None, 'expiring'))
+    return Plan(actions, calls)
+
+
+def _live(entry):
+    return field(entry, 'status') != State.expired.name
+
+
+def _stored_details(inventory, entry):
+    if inventory is None:
+        return None
+    cert_id = field(entry, 'id')
+    for row in inventory.certificates(cn=field(entry, 'name')):
+        listed = (field(entry, 'status'), field(entry, 'expires'))
+        if row['id'] == cert_id and (row['status'], row['expires']) == listed:
+            return inventory.details(cert_id)
+    return None
+
+
+def reconcile(session, desired_state, dry_run=False, max_workers=8, **plan_options):
+    """Plan the changes needed to reach desired_state and, unless dry_run, apply them.
+
+    Returns the Plan; once applied, its results hold the outcome of each action. plan_options are passed to
+    plan() (inventory, fetch_details, prune, renew_within).
+    """
+    changes = plan(session, desired_state, max_workers=max_workers, **plan_options)
+    if not dry_run:
+        changes.apply(session, max_workers)
+    return changes
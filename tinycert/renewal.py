@@ -0,0 +1,262 @@
+"""TinyCert renewal scheduler
+
+This module reissues certificates as they approach expiry. RenewalScheduler keeps the certificates it knows of in a
+heap ordered by expiry and reissues each once it falls within the renewal window, at a smoothed rate (a token
+bucket) and with bounded concurrency, so certificates that expire together are not all reissued in one burst.
+
+Every reissue is recorded in a RenewalJournal, an append-only file written before and after each call. A reissued
+certificate is never renewed again, and one whose reissue was started but not known to have finished (because the
+process died, or the call failed in a way that leaves its outcome unknown) is held back rather than retried: after a
+crash, renewals happen at most once. Such certificates are listed by pending() until released with release().
+"""
+
+from collections import namedtuple
+import heapq
+import io
+import json
+import os
+import threading
+import time
+
+import requests
+
+from .bulk import run_bulk
+from .cert import State
+from .models import field
+from .ratelimit import TokenBucket
+
+DEFAULT_WINDOW = 30 * 24 * 3600
+
+
+class RenewalResult(namedtuple('RenewalResult', ['cert_id', 'expires', 'new_cert_id', 'material', 'error'])):
+    """Outcome of renewing one certificate.
+
+    - cert_id: id of the certificate that was due
+    - expires: its expiry (unix time)
+    - new_cert_id: id of the reissued certificate, or None if the reissue failed
+    - material: dict of data type to PEM fetched for the new certificate (empty unless requested)
+    - error: the exception raised by the reissue or the fetch, or None
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """True if the certificate was reissued and its material fetched."""
+        return self.error is None
+
+
+class RenewalJournal(object):
+    """Append-only record of renewals, one JSON object per line, compacted on open.
+
+    Each certificate's latest entry has a state of 'pending' (reissue started), 'done' (reissued), 'failed' (the
+    server rejected the reissue) or 'released' (a pending entry cleared by an operator).
+
+    :param path: journal file; created if missing
+    """
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    RELEASED = 'released'
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with io.open(path, 'r', encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line torn by a crash mid-write
+                    self._entries[self._key(entry['cert_id'])] = entry
+        except (IOError, OSError):
+            pass
+        self._compact()
+        self._file = io.open(path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def _key(cert_id):
+        return str(cert_id)
+
+    def _compact(self):
+        partial_path = self._path + '.part'
+        with io.open(partial_path, 'w', encoding='utf-8') as journal:
+            for entry in self._entries.values():
+                journal.write(json.dumps(entry) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(partial_path, self._path)
+
+    def get(self, cert_id):
+        """Return the latest entry for cert_id as a dict, or None."""
+        with self._lock:
+            return self._entries.get(self._key(cert_id))
+
+    def record(self, cert_id, state, **info):
+        """Durably append an entry for cert_id before returning."""
+        entry = dict(info, cert_id=cert_id, state=state, time=time.time())
+        with self._lock:
+            self._file.write(json.dumps(entry) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._entries[self._key(cert_id)] = entry
+
+    def pending(self):
+        """Return the entries whose reissue was started but not known to have finished."""
+        with self._lock:
+            return [entry for entry in self._entries.values() if entry['state'] == self.PENDING]
+
+    def close(self):
+        """Close the journal file. Entries recorded so far are already on disk."""
+        self._file.close()
+
+
+class RenewalScheduler(object):
+    """Reissues certificates once they are within window seconds of expiry.
+
+    Preferred usage is:
+
+    .. code:: python
+
+        scheduler = RenewalScheduler(session, 'renewals.journal', window=14 * 86400, rate=0.5, fetch=('cert',))
+        for result in scheduler.run():
+            handle(result)
+
+    :param session: a connected Session
+    :param journal: a RenewalJournal, or the path of one
+    :param window: seconds before expiry at which a certificate is renewed
+    :param rate: average reissues per second
+    :param burst: reissues allowed back to back before the rate applies
+    :param max_workers: reissues in flight at once
+    :param fetch: data types to download with cert/get for each new certificate, e.g. ('cert', 'chain')
+    :param clock: returns the current unix time
+    """
+    def __init__(self, session, journal, window=DEFAULT_WINDOW, rate=1.0, burst=1, max_workers=4, fetch=(),
+                 clock=time.time, sleep=time.sleep):
+        self._session = session
+        self._journal = journal if isinstance(journal, RenewalJournal) else RenewalJournal(journal)
+        self._window = window
+        self._bucket = TokenBucket(rate, burst, sleep=sleep)
+        self._max_workers = max_workers
+        self._fetch = tuple(fetch)
+        self._clock = clock
+        self._heap = []
+        self._expiries = {}
+
+    @property
+    def journal(self):
+        """The RenewalJournal recording this scheduler's reissues."""
+        return self._journal
+
+    def __len__(self):
+        return len(self._expiries)
+
+    def add(self, cert_id, expires):
+        """Schedule cert_id, expiring at unix time expires, unless it was already renewed or is pending."""
+        expires = float(expires)
+        entry = self._journal.get(cert_id)
+        if entry is not None and entry['state'] in (RenewalJournal.DONE, RenewalJournal.PENDING):
+            return False
+        if self._expiries.get(cert_id) == expires:
+            return True
+        self._expiries[cert_id] = expires
+        heapq.heappush(self._heap, (expires, str(cert_id), cert_id))
+        return True
+
+    def load(self, ca_ids=None, states=State.good.value | State.expired.value):
+        """Schedule every certificate in the given states under the given CAs (default: all CAs).
+
+        Returns the number of certificates scheduled.
+        """
+        if ca_ids is None:
+            ca_ids = [field(ca, 'id') for ca in self._session.ca.list()]
+        scheduled = 0
+        for ca_id in ca_ids:
+            for cert in self._session.cert.list(ca_id, states):
+                if field(cert, 'expires') is not None and self.add(field(cert, 'id'), field(cert, 'expires')):
+                    scheduled += 1
+        return scheduled
+
+    def next_due(self):
+        """Return the unix time at which the next certificate enters the window, or None if none are scheduled."""
+        self._prune()
+        return self._heap[0][0] - self._window if self._heap else None
+
+    def _prune(self):
+        while self._heap and self._expiries.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _due(self):
+        horizon = self._clock() + self._window
+        while True:
+            self._prune()
+            if not self._heap or self._heap[0][0] > horizon:
+                return
+            expires, _, cert_id = heapq.heappop(self._heap)
+            del self._expiries[cert_id]
+            yield cert_id, expires
+
+    def _renew(self, item):
+        cert_id, expires = item
+        self._bucket.acquire()
+        self._journal.record(cert_id, RenewalJournal.PENDING, expires=expires)
+        try:
+            new_cert_id = self._session.cert.reissue(cert_id)['cert_id']
+        except requests.HTTPError as error:
+            if error.response is not None and error.response.status_code < 500:
+                self._journal.record(cert_id, RenewalJournal.FAILED, expires=expires,
+                                     status=error.response.status_code)
+            raise
+        self._journal.record(cert_id, RenewalJournal.DONE, expires=expires, new_cert_id=new_cert_id)
+
+        material = {}
+        try:
+            for data_type in self._fetch:
+                material[data_type] = self._session.cert.get(new_cert_id, data_type)['pem']
+        except Exception as error:  # pylint: disable=broad-except
+            return RenewalResult(cert_id, expires, new_cert_id, material, error)
+        return RenewalResult(cert_id, expires, new_cert_id, material, None)
+
+    def run_once(self):
+        """Renew every certificate now within the window, yielding a RenewalResult for each as it finishes.
+
+        A certificate whose reissue the server rejected is scheduled again by the next load(); one whose reissue
+        failed in any other way stays pending.
+        """
+        for result in run_bulk(self._renew, self._due(), self._max_workers):
+            if result.ok:
+                yield result.result
+            else:
+                cert_id, expires = result.item
+                yield RenewalResult(cert_id, expires, None, {}, result.error)
+
+    def run(self, ca_ids=None, refresh_interval=3600, stop=None):
+        """Renew certificates until stop (a threading.Event) is set, yielding a RenewalResult for each.
+
+        The schedule is reloaded from the API every refresh_interval seconds; in between, the loop sleeps until
+        the next certificate is due.
+        """
+        stop = stop or threading.Event()
+        next_refresh = self._clock()
+        while not stop.is_set():
+            if self._clock() >= next_refresh:
+                self.load(ca_ids)
+                next_refresh = self._clock() + refresh_interval
+            for result in self.run_once():
+                yield result
+            next_due = self.next_due()
+            wake = next_refresh if next_due is None else min(next_refresh, next_due)
+            stop.wait(max(0.0, wake - self._clock()))
+
+    def pending(self):
+        """Return the journal entries of certificates whose reissue may or may not have happened."""
+        return self._journal.pending()
+
+    def release(self, cert_id):
+        """Allow a pending certificate to be scheduled again, once it is known not to have been reissued."""
+        self._journal.record(cert_id, RenewalJournal.RELEASED)
+
+    def close(self):
+        """Close the scheduler's journal."""
+        self._journal.close()
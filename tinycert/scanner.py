@@ -0,0 +1,223 @@
+"""TinyCert expiry scanner
+
+This module reports on the expiry and health of certificates from PEM material already at hand, rather than one
+cert/details call per certificate: either files written by export() (<cert_id>.cert.pem) or PEM fetched with
+cert/get. Certificates are parsed in a process pool, so scanning a large fleet is spread across all cores.
+
+It requires the optional cryptography dependency (pip install tinycert[scan]).
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import functools
+import glob
+import io
+import os
+
+from cryptography import x509
+from cryptography.hazmat.primitives.asymmetric import dsa, ec, ed448, ed25519, rsa
+from cryptography.x509.oid import SignatureAlgorithmOID
+
+from .bulk import run_bulk
+
+_SAN_TYPES = (
+    (x509.DNSName, 'DNS'),
+    (x509.IPAddress, 'IP'),
+    (x509.RFC822Name, 'email'),
+    (x509.UniformResourceIdentifier, 'URI'),
+)
+
+# Signature algorithm names by OID; others are reported by their dotted string.
+_SIGNATURE_ALGORITHMS = {
+    SignatureAlgorithmOID.RSA_WITH_MD5: 'md5WithRSAEncryption',
+    SignatureAlgorithmOID.RSA_WITH_SHA1: 'sha1WithRSAEncryption',
+    SignatureAlgorithmOID.RSA_WITH_SHA224: 'sha224WithRSAEncryption',
+    SignatureAlgorithmOID.RSA_WITH_SHA256: 'sha256WithRSAEncryption',
+    SignatureAlgorithmOID.RSA_WITH_SHA384: 'sha384WithRSAEncryption',
+    SignatureAlgorithmOID.RSA_WITH_SHA512: 'sha512WithRSAEncryption',
+    SignatureAlgorithmOID.RSASSA_PSS: 'RSASSA-PSS',
+    SignatureAlgorithmOID.ECDSA_WITH_SHA1: 'ecdsa-with-SHA1',
+    SignatureAlgorithmOID.ECDSA_WITH_SHA224: 'ecdsa-with-SHA224',
+    SignatureAlgorithmOID.ECDSA_WITH_SHA256: 'ecdsa-with-SHA256',
+    SignatureAlgorithmOID.ECDSA_WITH_SHA384: 'ecdsa-with-SHA384',
+    SignatureAlgorithmOID.ECDSA_WITH_SHA512: 'ecdsa-with-SHA512',
+    SignatureAlgorithmOID.DSA_WITH_SHA1: 'dsa-with-sha1',
+    SignatureAlgorithmOID.DSA_WITH_SHA224: 'dsa-with-sha224',
+    SignatureAlgorithmOID.DSA_WITH_SHA256: 'dsa-with-sha256',
+    SignatureAlgorithmOID.ED25519: 'ed25519',
+    SignatureAlgorithmOID.ED448: 'ed448',
+}
+
+
+class CertificateReport(namedtuple('CertificateReport', ['source', 'cert_id', 'subject', 'not_before', 'not_after',
+                                                         'days_left', 'key_type', 'key_size',
+                                                         'signature_algorithm', 'sans', 'error'])):
+    """Expiry and health of one certificate.
+
+    - source: file path or other label the PEM came from
+    - cert_id: TinyCert certificate id as an int, if known; a file name that is not a number is kept as a string
+    - subject: subject as an RFC 4514 string, e.g. 'CN=example.com,O=Example'
+    - not_before, not_after: validity period as UTC datetimes
+    - days_left: days from the scan until not_after (negative once expired)
+    - key_type: 'RSA', 'EC', 'DSA', 'Ed25519' or 'Ed448'
+    - key_size: key size in bits
+    - signature_algorithm: e.g. 'sha256WithRSAEncryption', or the dotted OID of an uncommon algorithm
+    - sans: Subject Alternative Names as a tuple of (type, value) pairs, e.g. (('DNS', 'example.com'),)
+    - error: description of why the PEM could not be parsed, or None (all other fields are then None)
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """True if the certificate was parsed."""
+        return self.error is None
+
+    @property
+    def expired(self):
+        """True if the certificate had expired at the time of the scan."""
+        return self.days_left is not None and self.days_left < 0
+
+
+def _utc(cert, name):
+    value = getattr(cert, name + '_utc', None)
+    if value is None:  # cryptography < 42
+        value = getattr(cert, name).replace(tzinfo=timezone.utc)
+    return value
+
+
+def _key_info(key):
+    if isinstance(key, rsa.RSAPublicKey):
+        return 'RSA', key.key_size
+    if isinstance(key, ec.EllipticCurvePublicKey):
+        return 'EC', key.key_size
+    if isinstance(key, dsa.DSAPublicKey):
+        return 'DSA', key.key_size
+    if isinstance(key, ed25519.Ed25519PublicKey):
+        return 'Ed25519', 256
+    if isinstance(key, ed448.Ed448PublicKey):
+        return 'Ed448', 456
+    return type(key).__name__, getattr(key, 'key_size', None)
+
+
+def _sans(cert):
+    try:
+        names = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+    except x509.ExtensionNotFound:
+        return ()
+    sans = []
+    for name in names:
+        for name_type, label in _SAN_TYPES:
+            if isinstance(name, name_type):
+                sans.append((label, str(name.value)))
+                break
+    return tuple(sans)
+
+
+def _failed(source, cert_id, error):
+    return CertificateReport(source, cert_id, None, None, None, None, None, None, None, None,
+                             '%s: %s' % (type(error).__name__, error))
+
+
+def parse_certificate(pem, source=None, cert_id=None, now=None):
+    """Return a CertificateReport for the first certificate in pem (bytes or str).
+
+    Errors are reported in the result rather than raised.
+
+    :param now: UTC datetime days_left is counted from; defaults to the current time
+    """
+    if now is None:
+        now = datetime.now(timezone.utc)
+    try:
+        if not isinstance(pem, bytes):
+            pem = pem.encode('ascii')
+        cert = x509.load_pem_x509_certificate(pem)
+        not_after = _utc(cert, 'not_valid_after')
+        key_type, key_size = _key_info(cert.public_key())
+        oid = cert.signature_algorithm_oid
+        signature_algorithm = _SIGNATURE_ALGORITHMS.get(oid, oid.dotted_string)
+        return CertificateReport(source, cert_id, cert.subject.rfc4514_string(), _utc(cert, 'not_valid_before'),
+                                 not_after, (not_after - now).days, key_type, key_size,
+                                 signature_algorithm, _sans(cert), None)
+    except Exception as error:  # pylint: disable=broad-except
+        return _failed(source, cert_id, error)
+
+
+def _scan_one(now, item):
+    source, cert_id, pem = item
+    if pem is None:
+        try:
+            with io.open(source, 'rb') as pem_file:
+                pem = pem_file.read()
+        except (IOError, OSError) as error:
+            return _failed(source, cert_id, error)
+    return parse_certificate(pem, source, cert_id, now)
+
+
+def sort_key(report):
+    """Order reports soonest expiry first, with unparsable certificates last."""
+    return (report.not_after is None, report.not_after or datetime.max.replace(tzinfo=timezone.utc),
+            report.source or '')
+
+
+def _scan(items, processes, chunksize, now):
+    if now is None:
+        now = datetime.now(timezone.utc)
+    scan_one = functools.partial(_scan_one, now)
+    if processes == 0:
+        return sorted(map(scan_one, items), key=sort_key)
+    with ProcessPoolExecutor(processes) as pool:
+        return sorted(pool.map(scan_one, items, chunksize=chunksize), key=sort_key)
+
+
+def scan_pems(pems, processes=None, chunksize=64, now=None):
+    """Parse PEM certificates in a process pool, returning CertificateReports sorted by sort_key().
+
+    :param pems: iterable of (source, cert_id, pem) tuples; cert_id may be None
+    :param processes: worker processes (default: one per core); 0 parses in this process
+    :param chunksize: certificates sent to a worker at a time
+    :param now: UTC datetime days_left is counted from; defaults to the current time
+    """
+    return _scan(pems, processes, chunksize, now)
+
+
+def scan_directory(directory, pattern='*.cert.pem', processes=None, chunksize=64, now=None):
+    """Parse every certificate file in directory matching pattern, as written by export().
+
+    Files are read by the worker processes. The certificate id is taken from the file name (<cert_id>.cert.pem)
+    and converted to an int, as scan_session() reports it, when it is a number. See scan_pems() for the other
+    parameters.
+    """
+    items = []
+    for path in glob.glob(os.path.join(directory, pattern)):
+        stem = os.path.basename(path).split('.', 1)[0]
+        items.append((path, int(stem) if stem.isdigit() else stem, None))
+    return _scan(items, processes, chunksize, now)
+
+
+def scan_session(session, cert_ids, max_workers=8, processes=None, chunksize=64, now=None):
+    """Fetch the certificates with cert/get and parse them, returning sorted CertificateReports.
+
+    Downloads run max_workers at a time; a certificate that cannot be fetched is reported with its error.
+    See scan_pems() for the other parameters.
+
+    :param session: a connected Session
+    :param cert_ids: iterable of certificate ids
+    """
+    def fetch(cert_id):
+        return session.cert.get(cert_id, 'cert')['pem']
+
+    items = []
+    failed = []
+    for result in run_bulk(fetch, cert_ids, max_workers):
+        source = 'cert/get:%s' % result.item
+        if result.ok:
+            items.append((source, result.item, result.result))
+        else:
+            failed.append(_failed(source, result.item, result.error))
+    return sorted(_scan(items, processes, chunksize, now) + failed, key=sort_key)
+
+
+def expiring(reports, days):
+    """Return the reports of certificates expiring within days (including those already expired)."""
+    return [report for report in reports if report.days_left is not None and report.days_left < days]
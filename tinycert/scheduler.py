@@ -0,0 +1,189 @@
+"""TinyCert adaptive request scheduler
+
+This module provides AdaptiveScheduler, which sits in front of Session requests and
+
+- limits the number of requests in flight, adjusting the limit with AIMD (additive increase on success,
+  multiplicative decrease on throttling, errors or latency above a target);
+- retries idempotent read endpoints on 429, 5xx and connection errors with jittered exponential backoff,
+  waiting at least as long as the server's Retry-After header asks, unless that would overrun the current
+  tinycert.deadline.Deadline.
+
+Usage:
+session = Session(api_key, scheduler=AdaptiveScheduler(max_limit=32), pool_maxsize=32)
+"""
+
+from email.utils import mktime_tz, parsedate_tz
+import random
+import threading
+import time
+
+import requests
+
+from .deadline import ConnectTimeout, time_left
+from .endpoints import READ_ENDPOINTS
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+def retry_after_seconds(response):
+    """Return the delay requested by a response's Retry-After header in seconds, or None."""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, mktime_tz(parsed) - time.time())
+
+
+class AdaptiveScheduler(object):
+    """Thread-safe AIMD concurrency limiter with retries for idempotent requests.
+
+    :param initial_limit: starting number of requests allowed in flight
+    :param min_limit: the limit never drops below this
+    :param max_limit: the limit never grows beyond this
+    :param backoff_ratio: factor applied to the limit on throttling or errors
+    :param target_latency: if set, responses slower than this many seconds also shrink the limit
+    :param max_retries: retries per request for retryable endpoints
+    :param base_delay: backoff delay before the first retry, doubled for each further retry
+    :param max_delay: cap on the backoff delay (Retry-After is honoured even when longer)
+    :param retry_endpoints: paths that are safe to retry
+    :param retry_exceptions: exception types treated as transient failures
+    """
+    def __init__(self, initial_limit=4, min_limit=1, max_limit=64, backoff_ratio=0.5, target_latency=None,
+                 max_retries=3, base_delay=0.1, max_delay=10.0, retry_endpoints=READ_ENDPOINTS,
+                 retry_exceptions=(requests.ConnectionError, ConnectTimeout), sleep=time.sleep, clock=time.monotonic,
+                 jitter=random.random):
+        self._limit = float(initial_limit)
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._backoff_ratio = backoff_ratio
+        self._target_latency = target_latency
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._retry_endpoints = frozenset(retry_endpoints)
+        self._retry_exceptions = tuple(retry_exceptions)
+        self._sleep = sleep
+        self._clock = clock
+        self._jitter = jitter
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._last_decrease = clock()
+        self.retries = 0
+        self.throttled = 0
+
+    @property
+    def limit(self):
+        """Current number of requests allowed in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        """Number of requests currently in flight."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self):
+        """Number of requests waiting for a slot."""
+        return self._waiting
+
+    def stats(self):
+        """Return a dict of the current limit, in-flight count, queue depth and retry/throttle counters."""
+        with self._condition:
+            return {'limit': self.limit, 'in_flight': self._in_flight, 'queue_depth': self._waiting,
+                    'retries': self.retries, 'throttled': self.throttled}
+
+    def _acquire(self):
+        with self._condition:
+            self._waiting += 1
+            try:
+                while self._in_flight >= int(self._limit):
+                    self._condition.wait()
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+
+    def _release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def _increase(self, started, latency):
+        with self._condition:
+            if self._target_latency is not None and latency > self._target_latency:
+                self._decrease_locked(started)
+                return
+            previous = int(self._limit)
+            self._limit = min(float(self._max_limit), self._limit + 1.0 / self._limit)
+            if int(self._limit) > previous:
+                self._condition.notify()
+
+    def _decrease(self, started):
+        with self._condition:
+            self.throttled += 1
+            self._decrease_locked(started)
+
+    def _decrease_locked(self, started):
+        # Only requests sent after the previous decrease count, so a burst of failures from one window of
+        # requests shrinks the limit once rather than once per failure.
+        if started < self._last_decrease:
+            return
+        self._limit = max(float(self._min_limit), self._limit * self._backoff_ratio)
+        self._last_decrease = self._clock()
+
+    def _delay(self, attempt, response):
+        delay = self._jitter() * min(self._max_delay, self._base_delay * (2 ** attempt))
+        retry_after = retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, path, send):
+        """Run send() under the concurrency limit, retrying it if path is retryable.
+
+        :param path: API path being requested
+        :param send: callable performing one attempt and returning a response with status_code and headers
+        :returns: the final response; error statuses are returned, not raised
+        """
+        retryable = path in self._retry_endpoints
+        attempt = 0
+        while True:
+            self._acquire()
+            started = self._clock()
+            error = None
+            try:
+                response = send()
+            except self._retry_exceptions as exc:
+                self._decrease(started)
+                if not retryable or attempt >= self._max_retries:
+                    raise
+                response, error = None, exc
+            finally:
+                self._release()
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                self._increase(started, self._clock() - started)
+                return response
+
+            if response is not None:
+                self._decrease(started)
+                if not retryable or attempt >= self._max_retries:
+                    return response
+            delay = self._delay(attempt, response)
+            left = time_left(path)
+            if left is not None and delay >= left:
+                # The retry could not start before the deadline; report this attempt's outcome instead.
+                if response is not None:
+                    return response
+                raise error
+            if response is not None:
+                response.close()
+            with self._condition:
+                self.retries += 1
+            self._sleep(delay)
+            attempt += 1
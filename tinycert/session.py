@@ -4,20 +4,25 @@ This module provides the Session class which wraps an authenticated session with
 """
 from __future__ import unicode_literals
 
-from future import standard_library
-standard_library.install_aliases()
-from past.builtins import basestring
-from builtins import object
-import collections
 from contextlib import contextmanager
-import hashlib
-import hmac
-import urllib.request, urllib.parse, urllib.error
-
-import requests
+import threading
+from time import perf_counter
 
 from .cert import CertificateApi
 from .ca import CertificateAuthorityApi
+from .deadline import (ConnectTimeout, DeadlineExceeded, ReadTimeout, call_timeout, request_timeout, suspended,
+                       time_left)
+from .endpoints import INVALIDATIONS
+from .metrics import RequestEvent, RequestProbe
+from .signing import RequestSigner
+from .tokenstore import token_key
+from .transport import RequestsTransport
+
+DEFAULT_BASE_URL = 'https://www.tinycert.org/api/v1/'
+
+# (connect, read) timeout in seconds. The read timeout bounds each wait for data from the server, not the whole
+# response, so large listings are not cut short.
+DEFAULT_TIMEOUT = (10.0, 60.0)
 
 
 class NoSessionException(Exception):
@@ -30,42 +35,49 @@ class NoSessionException(Exception):
 
 
 @contextmanager
-def auto_session(api_key, account, passphrase):
-    session = Session(api_key)
-    session.connect(account, passphrase)
+def auto_session(api_key, account, passphrase, **session_options):
+    """Connect a Session for the duration of the block, then disconnect it and close its connection pool.
+
+    Disconnecting is not subject to the current Deadline, so the session token is retired even once it has passed.
+    Extra keyword arguments are passed through to the Session constructor (e.g. pool_maxsize).
+    """
+    session = Session(api_key, **session_options)
     try:
+        session.connect(account, passphrase)
         yield session
     finally:
-        session.disconnect()
+        try:
+            if session._session_token is not None:
+                with suspended():
+                    session.disconnect()
+        finally:
+            session.close()
 
 
-class Session(object):
-    """Holds a session token and wraps the TinyCert API.
+def _timeout_error(path, error, timeout):
+    """Return the TimeoutException to raise in place of the transport's error, or None if it was not a timeout."""
+    import requests
+    if not isinstance(error, requests.Timeout):
+        return None
+    try:
+        time_left(path)
+    except DeadlineExceeded as exceeded:
+        return exceeded
+    if isinstance(error, requests.ConnectTimeout):
+        return ConnectTimeout(path, 'no connection within %ss' % timeout[0])
+    return ReadTimeout(path, 'no response within %ss' % timeout[1])
 
-    Preferred usage is:
-    with auto_session(api_key, account, passphrase) as session:
-          ca = session.ca()
-          ca.list()
 
-    Raw usage is:
-    #connect to connect a new session before calling other APIs.
-    #disconnect when complete.
-    """
-    def __init__(self, api_key, session_token=None):
+class _BaseSession(object):
+    """Signing and API accessors shared by the blocking Session and the asyncio AsyncSession."""
+    # True if request() returns an awaitable
+    asynchronous = False
+
+    def __init__(self, api_key, session_token=None, base_url=DEFAULT_BASE_URL):
         self._api_key = api_key
         self._session_token = session_token
-
-    def request(self, path, params={}):
-        if self._session_token:
-            params['token'] = self._session_token
-
-        signed_request_payload = self._sign_request_payload(params)
-
-        response = requests.post('https://www.tinycert.org/api/v1/%s' % path,
-                                 headers={'content-type': 'application/x-www-form-urlencoded'},
-                                 data=signed_request_payload)
-        response.raise_for_status()
-        return response.json()
+        self._base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self._signer = RequestSigner(api_key)
 
     @staticmethod
     def _flatten_array_elements(params):
@@ -76,7 +88,7 @@ class Session(object):
                 flattened_params[k] = v
                 continue
             for index, entry in enumerate(v):
-                if isinstance(entry, basestring):
+                if isinstance(entry, str):
                     flattened_params['%s[%i]' % (k, index)] = entry
                 else:
                     for dk, dv in entry.items():
@@ -86,40 +98,9 @@ class Session(object):
     def _sign_request_payload(self, params):
         """Digitally sign the request payload.
 
-        Follows the instructions at https://www.tinycert.org/docs/api/v1/auth
+        Follows the instructions at https://www.tinycert.org/docs/api/v1/auth; see RequestSigner.
         """
-        # 0. To get PHP-like associative arrays, expand them as separate entries in the params dict.
-        flattened_params = self._flatten_array_elements(params)
-
-        # 1. Sort params by key, alphabetically
-        ordered_params = collections.OrderedDict(sorted(flattened_params.items()))
-
-        # 2. Combine parameters into a URL-encoded query string
-        query_string = urllib.parse.urlencode(ordered_params, True)
-
-        # 3. Use SHA256 to calculacte an HMAC digest of the query string, using the API key as the secret.
-        hasher = hmac.new(
-            self._api_key.encode('utf-8'),
-            digestmod=hashlib.sha256,
-        )
-        hasher.update(query_string.encode('utf-8'))
-        hash = hasher.hexdigest()
-
-        # 4. Add the signed hash to the query string
-        query_string += '&digest=%s' % hash
-
-        return query_string
-
-    def connect(self, account, passphrase):
-        """Connect this session to TinyCert, enabling API calls"""
-        params = {'email': account, 'passphrase': passphrase}
-        response = self.request('connect', params)
-        self._session_token = response['token']
-
-    def disconnect(self):
-        """Disconnect this session from TinyCert by retiring the session token."""
-        self.request('disconnect')
-        self._session_token = None
+        return self._signer.sign(params)
 
     @property
     def ca(self):
@@ -134,3 +115,269 @@ class Session(object):
         if self._session_token is None:
             raise NoSessionException()
         return CertificateApi(self)
+
+
+class Session(_BaseSession):
+    """Holds a session token and wraps the TinyCert API.
+
+    Preferred usage is:
+    with auto_session(api_key, account, passphrase) as session:
+          ca = session.ca()
+          ca.list()
+
+    Raw usage is:
+    #connect to connect a new session before calling other APIs.
+    #disconnect when complete.
+
+    All requests made by a session share one keep-alive connection pool, so repeated calls reuse
+    the same TCP/TLS connection instead of handshaking each time. The pool is released by
+    disconnect() or close().
+
+    Once connected, a session may be shared by many threads: requests never modify the caller's params, the
+    connection pool is shared and thread-safe, and a rejected token is replaced once however many threads see
+    the rejection. connect() and disconnect() should not race with other calls.
+
+    :param base_url: root of the v1 API; override to point the session at another server, e.g. a
+        tinycert.fakeserver.FakeTinyCertServer
+    :param pool_connections: number of per-host connection pools to keep
+    :param pool_maxsize: maximum number of connections kept alive per host; size this to the
+        number of threads sharing the session
+    :param pool_block: if True, block when all pooled connections to a host are busy instead of
+        opening (and then discarding) extra connections
+    :param keep_alive: if False, ask the server to close the connection after every request
+    :param max_retries: number of times to retry failed connection attempts
+    :param cache: optional ReadCache for the read-only endpoints; writes through this session invalidate it
+    :param scheduler: optional AdaptiveScheduler limiting concurrency and retrying throttled reads
+    :param token_store: optional TokenStore through which connect() and disconnect() share one session token
+        per account with other sessions; a token rejected by the server is then replaced transparently
+    :param instrumentation: optional hook, such as a tinycert.metrics.Metrics, whose observe() receives a
+        RequestEvent for every call
+    :param result_models: if True, return immutable tinycert.models records instead of dicts for ca/list,
+        ca/details, cert/list and cert/details
+    :param coalescer: optional Coalescer letting concurrent identical reads share one request
+    :param transport: the tinycert.transport.Transport to send requests with, e.g. an Http2Transport; defaults to
+        a RequestsTransport configured by the pool_*, keep_alive and max_retries options, which are otherwise
+        ignored
+    :param timeout: connect and read timeout for every request, in seconds or as a (connect, read) tuple; None
+        waits forever. Exceeding them raises tinycert.deadline.ConnectTimeout or ReadTimeout, and requests made
+        within a tinycert.deadline.Deadline are further bounded by it (see that module).
+    """
+    TOKEN_REJECTED_STATUSES = frozenset([401, 403])
+
+    def __init__(self, api_key, session_token=None, base_url=DEFAULT_BASE_URL, pool_connections=1, pool_maxsize=10,
+                 pool_block=False, keep_alive=True, max_retries=0, cache=None, scheduler=None, token_store=None,
+                 instrumentation=None, result_models=False, coalescer=None, transport=None, timeout=DEFAULT_TIMEOUT):
+        super(Session, self).__init__(api_key, session_token, base_url)
+        self._timeout = timeout
+        self._result_models = result_models
+        self._instrumentation = instrumentation
+        self._cache = cache
+        self._coalescer = coalescer
+        self._scheduler = scheduler
+        self._token_store = token_store
+        self._token_key = None
+        self._credentials = None
+        if transport is None:
+            transport = RequestsTransport(pool_connections, pool_maxsize, pool_block, keep_alive, max_retries)
+        self._transport = transport
+        self._token_lock = threading.Lock()
+
+    @property
+    def transport(self):
+        """The Transport carrying this session's requests."""
+        return self._transport
+
+    @property
+    def cache(self):
+        """The ReadCache used by this session, or None."""
+        return self._cache
+
+    @property
+    def coalescer(self):
+        """The Coalescer used by this session, or None."""
+        return self._coalescer
+
+    @property
+    def scheduler(self):
+        """The AdaptiveScheduler used by this session, or None."""
+        return self._scheduler
+
+    def close(self):
+        """Close all pooled connections. The session may still be used afterwards; a new pool is opened on demand."""
+        self._transport.close()
+
+    def _post(self, path, params, stream=False, probe=None):
+        params = dict(params) if params else {}
+        token = self._session_token
+        if token:
+            params['token'] = token
+
+        response = self._send(path, params, stream, probe)
+        if (response.status_code in self.TOKEN_REJECTED_STATUSES and self._credentials is not None
+                and path not in ('connect', 'disconnect')):
+            response.close()
+            params['token'] = self._reconnect(token)
+            response = self._send(path, params, stream, probe)
+        response.raise_for_status()
+        return response
+
+    def _send(self, path, params, stream, probe=None):
+        if probe is None:
+            signed_request_payload = self._sign_request_payload(params)
+        else:
+            started = perf_counter()
+            signed_request_payload = self._sign_request_payload(params)
+            probe.sign_seconds += perf_counter() - started
+            probe.request_bytes += len(signed_request_payload)
+
+        url = self._base_url + path
+        if self._scheduler is None:
+            return self._send_once(path, url, signed_request_payload, stream)
+        return self._scheduler.call(path, lambda: self._send_once(path, url, signed_request_payload, stream))
+
+    def _send_once(self, path, url, signed_request_payload, stream):
+        # Recomputed per attempt, so retries are bounded by what is left of the deadline.
+        timeout = request_timeout(path, self._timeout)
+        try:
+            return self._transport.post(url, signed_request_payload, stream, timeout)
+        except Exception as error:
+            timeout_error = _timeout_error(path, error, timeout)
+            if timeout_error is None:
+                raise
+            raise timeout_error
+
+    def _decode(self, path, response):
+        result = response.json()
+        if self._result_models:
+            from .models import parse_result
+            result = parse_result(path, result)
+        return result
+
+    def _fetch(self, path, params):
+        if self._instrumentation is None:
+            return self._decode(path, self._post(path, params))
+
+        probe = RequestProbe()
+        started = perf_counter()
+        status = error = None
+        response_bytes = 0
+        decode_seconds = 0.0
+        try:
+            response = self._post(path, params, probe=probe)
+            status = response.status_code
+            response_bytes = len(response.content)
+            decode_started = perf_counter()
+            result = self._decode(path, response)
+            decode_seconds = perf_counter() - decode_started
+            return result
+        except Exception as exc:
+            error = exc
+            failed_response = getattr(exc, 'response', None)
+            if failed_response is not None:
+                status = failed_response.status_code
+                response_bytes = len(failed_response.content or b'')
+            raise
+        finally:
+            self._instrumentation.observe(RequestEvent(path, status, perf_counter() - started, probe.sign_seconds,
+                                                       decode_seconds, probe.request_bytes, response_bytes, error))
+
+    def _fetch_token(self, account, passphrase):
+        response = self._send('connect', {'email': account, 'passphrase': passphrase}, False)
+        response.raise_for_status()
+        return response.json()['token']
+
+    def _reconnect(self, rejected_token):
+        with self._token_lock:
+            if self._session_token != rejected_token:
+                return self._session_token  # another thread already replaced it
+            account, passphrase = self._credentials
+            self._session_token = self._token_store.replace(self._token_key, rejected_token,
+                                                            lambda: self._fetch_token(account, passphrase))
+            return self._session_token
+
+    def request(self, path, params=None, timeout=None):
+        """Perform a request and return the decoded response. params is not modified.
+
+        :param timeout: if given, used instead of the session's timeout for this call
+        """
+        if timeout is not None:
+            with call_timeout(timeout):
+                return self.request(path, params)
+        if params is None:
+            params = {}
+        cache = self._cache
+        coalescer = self._coalescer
+        if cache is None and coalescer is None:
+            return self._fetch(path, params)
+
+        if path in INVALIDATIONS:
+            try:
+                return self._fetch(path, params)
+            finally:
+                if cache is not None:
+                    cache.invalidate(path, params)
+                if coalescer is not None:
+                    coalescer.invalidate(path, params)
+
+        key = cache.key(path, params) if cache is not None else None
+        if key is None:
+            return self._coalesced(path, params)
+        generation = cache.generation
+        hit, value = cache.get(key)
+        if hit:
+            return value
+        result = self._coalesced(path, params)
+        cache.put(key, result, generation)
+        return result
+
+    def _coalesced(self, path, params):
+        if self._coalescer is None:
+            return self._fetch(path, params)
+        return self._coalescer.call(path, params, lambda: self._fetch(path, params))
+
+    def stream(self, path, params=None, chunk_size=8192):
+        """Perform a request and yield the raw response body in chunks as it arrives, without decoding it.
+
+        The connection is returned to the pool once the generator is exhausted or closed.
+        """
+        response = self._post(path, params, stream=True)
+        try:
+            for chunk in response.iter_content(chunk_size):
+                yield chunk
+        finally:
+            response.close()
+
+    def connect(self, account, passphrase):
+        """Connect this session to TinyCert, enabling API calls
+
+        With a token store, a live token shared by other sessions is reused without contacting the server.
+        """
+        if self._token_store is not None:
+            self._token_key = token_key(self._api_key, account)
+            self._credentials = (account, passphrase)
+            self._session_token = self._token_store.checkout(self._token_key,
+                                                             lambda: self._fetch_token(account, passphrase))
+            return
+        params = {'email': account, 'passphrase': passphrase}
+        response = self.request('connect', params)
+        self._session_token = response['token']
+
+    def _retire(self, token):
+        # token is the store's current token, which replaces this session's own if another session reconnected.
+        self._session_token = token
+        self.request('disconnect')
+
+    def disconnect(self):
+        """Disconnect this session from TinyCert by retiring the session token and closing the connection pool.
+
+        With a token store, the token is only retired if no other session is still using it.
+        """
+        try:
+            if self._credentials is not None:
+                self._token_store.checkin(self._token_key, self._session_token, self._retire)
+                self._credentials = None
+            else:
+                self.request('disconnect')
+            self._session_token = None
+        finally:
+            self.close()
@@ -0,0 +1,77 @@
+"""TinyCert request signing
+
+This module provides RequestSigner, which produces the signed payloads described at
+https://www.tinycert.org/docs/api/v1/auth. The HMAC is keyed once per signer and copied for each request, and
+parameters are flattened, sorted and URL-encoded in a single pass.
+"""
+
+import hashlib
+import hmac
+from operator import itemgetter
+from urllib.parse import quote_plus as _quote_plus
+
+_first = itemgetter(0)
+
+
+class RequestSigner(object):
+    """Signs request payloads with a given API key.
+
+    Output is byte-for-byte identical to sorting the flattened parameters, encoding them with
+    urllib.parse.urlencode(..., doseq=True) and appending the hex HMAC-SHA256 digest of that string.
+    """
+    _MAX_QUOTED_KEYS = 4096
+
+    def __init__(self, api_key):
+        self._hmac = hmac.new(api_key.encode('utf-8'), digestmod=hashlib.sha256)
+        self._quoted_keys = {}
+
+    def _quote_key(self, key):
+        quoted = self._quoted_keys.get(key)
+        if quoted is None:
+            quoted = _quote_plus(key if isinstance(key, bytes) else str(key))
+            if len(self._quoted_keys) >= self._MAX_QUOTED_KEYS:
+                self._quoted_keys.clear()
+            self._quoted_keys[key] = quoted
+        return quoted
+
+    def encode(self, params):
+        """Return the URL-encoded, sorted query string for params, without the digest.
+
+        Lists and tuples are expanded PHP-style: strings as key[i], dicts as key[i][name].
+        """
+        pairs = []
+        append = pairs.append
+        for k, v in params.items():
+            if not isinstance(v, (list, tuple)):
+                append((k, v))
+                continue
+            for index, entry in enumerate(v):
+                if isinstance(entry, str):
+                    append(('%s[%i]' % (k, index), entry))
+                else:
+                    for dk, dv in entry.items():
+                        append(('%s[%i][%s]' % (k, index, dk), dv))
+        pairs.sort(key=_first)
+
+        parts = []
+        for k, v in pairs:
+            k = self._quote_key(k)
+            if isinstance(v, (bytes, str)):
+                parts.append(k + '=' + _quote_plus(v))
+            elif hasattr(v, '__len__'):
+                for element in v:
+                    parts.append(k + '=' + _quote_plus(element if isinstance(element, bytes) else str(element)))
+            else:
+                parts.append(k + '=' + _quote_plus(str(v)))
+        return '&'.join(parts)
+
+    def digest(self, query_string):
+        """Return the hex HMAC-SHA256 digest of query_string."""
+        hasher = self._hmac.copy()
+        hasher.update(query_string.encode('utf-8'))
+        return hasher.hexdigest()
+
+    def sign(self, params):
+        """Return the signed payload for params: the encoded query string followed by &digest=<hmac>."""
+        query_string = self.encode(params)
+        return query_string + '&digest=' + self.digest(query_string)
@@ -0,0 +1,101 @@
+"""Incremental JSON parsing
+
+This module decodes a JSON array arriving as a stream of byte chunks one element at a time, without first reading
+the whole document. Each element is decoded by the C-accelerated json scanner straight out of the buffered text;
+an element split across chunks is simply retried once the next chunk has arrived. An element that fails to decode
+although it is complete (its closing bracket or quote has arrived) is reported at once rather than at the end.
+"""
+
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRUCTURE = re.compile(r'"(?:[^"\\]|\\.)*"|[][{}"]', re.S)
+_raw_decode = json.JSONDecoder().raw_decode
+
+
+def _element_complete(buf, pos):
+    """Return True if the object, array or string starting at buf[pos] ends within buf."""
+    depth = 0
+    for match in _STRUCTURE.finditer(buf, pos):
+        token = match.group()
+        if token == '"':  # a string whose closing quote has not arrived
+            return False
+        if token[0] != '"':
+            depth += 1 if token in '[{' else -1
+        if depth == 0:
+            return True
+    return False
+
+
+def fast_loads():
+    """Return orjson.loads if orjson is installed, else None."""
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson.loads
+
+
+def iter_json_array(chunks):
+    """Yield (raw, value) for each element of a top-level JSON array read from an iterable of byte chunks.
+
+    raw is the element's JSON text and value its decoded form. Elements must be objects, arrays or strings, as in
+    every list returned by the TinyCert API. Only the unread remainder of the latest chunks is held in memory.
+
+    :raises ValueError: if the stream is not a well-formed JSON array
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    started = finished = False
+    expect_element = True
+    trailing_comma = False
+    for chunk in chunks:
+        buf = buf[pos:] + decoder.decode(chunk)
+        pos = _WHITESPACE.match(buf).end()
+        if finished:
+            if pos < len(buf):
+                raise ValueError('unexpected data after JSON array')
+            continue
+        if not started:
+            if pos == len(buf):
+                continue
+            if buf[pos] != '[':
+                raise ValueError('expected a JSON array')
+            pos = _WHITESPACE.match(buf, pos + 1).end()
+            started = True
+
+        while pos < len(buf):
+            char = buf[pos]
+            if char == ']':
+                if trailing_comma:
+                    raise ValueError('trailing comma in JSON array')
+                finished = True
+                pos = _WHITESPACE.match(buf, pos + 1).end()
+                if pos < len(buf):
+                    raise ValueError('unexpected data after JSON array')
+                break
+            if not expect_element:
+                if char != ',':
+                    raise ValueError('expected , or ] at offset %d' % pos)
+                expect_element = trailing_comma = True
+                pos = _WHITESPACE.match(buf, pos + 1).end()
+                continue
+            if char not in '{["':
+                raise ValueError('unsupported JSON array element at offset %d' % pos)
+            try:
+                value, end = _raw_decode(buf, pos)
+            except ValueError as error:
+                if _element_complete(buf, pos):
+                    raise ValueError('malformed JSON array element at offset %d: %s' % (pos, error))
+                break  # incomplete element; wait for the next chunk
+            yield buf[pos:end], value
+            expect_element = trailing_comma = False
+            pos = _WHITESPACE.match(buf, end).end()
+    if not finished:
+        buf += decoder.decode(b'', True)
+        if started and pos < len(buf):
+            _raw_decode(buf, pos)
+        raise ValueError('truncated JSON array')
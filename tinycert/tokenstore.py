@@ -0,0 +1,192 @@
+"""TinyCert session token stores
+
+A token store lets many Sessions, in one process or across processes, share one live session token per account
+instead of each calling connect and disconnect. Sessions check a token out on connect() and back in on
+disconnect(); the token is only retired when its last user checks it in, or abandoned once it expires. A Session
+whose token is rejected by the server reconnects through the store, so concurrent users pick up the new token
+rather than each reconnecting.
+
+MemoryTokenStore shares tokens between threads; FileTokenStore shares them between processes on one host through
+a lock-protected JSON file. Other backends subclass TokenStore and implement lock(), _load() and _save().
+"""
+
+from contextlib import contextmanager
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def token_key(api_key, account):
+    """Return the store key for an account, without exposing the API key."""
+    return '%s:%s' % (hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16], account)
+
+
+class TokenStore(object):
+    """Base class for shared session token stores.
+
+    Records are dicts of token, expires (unix time), replaced (earlier tokens for the same key that it replaced
+    while they were live) and users (number of sessions holding the token or one of the replaced ones). Users of a
+    token that expired before it was replaced are not carried over: sessions that crashed while holding it would
+    otherwise be counted forever. Such users join the new record when they replace their token, and their checkin
+    of the expired one is ignored.
+
+    :param ttl: seconds a token is trusted for after it is issued
+    """
+    def __init__(self, ttl=3600, clock=time.time):
+        self._ttl = ttl
+        self._clock = clock
+
+    @contextmanager
+    def lock(self):
+        """Hold an exclusive lock on the store."""
+        raise NotImplementedError
+
+    def _load(self):
+        """Return the dict of key to record. Called with the lock held."""
+        raise NotImplementedError
+
+    def _save(self, records):
+        """Persist the dict of key to record. Called with the lock held."""
+        raise NotImplementedError
+
+    def _live(self, records, key):
+        record = records.get(key)
+        if record is not None and record['expires'] > self._clock():
+            return record
+        return None
+
+    def _renew(self, records, key, connect, users=0):
+        """Store a new token for key from connect(), keeping the users of the record it replaces if still live."""
+        previous = self._live(records, key)
+        replaced = []
+        if previous is not None:
+            users = previous['users']
+            replaced = previous.get('replaced', []) + [previous['token']]
+        record = {'token': connect(), 'expires': self._clock() + self._ttl, 'replaced': replaced, 'users': users}
+        records[key] = record
+        return record
+
+    @staticmethod
+    def _counts(record, token):
+        """Return True if the users of record include the holders of token."""
+        return token == record['token'] or token in record.get('replaced', ())
+
+    def checkout(self, key, connect):
+        """Return a live token for key, calling connect() to obtain one if there is none, and count a user."""
+        with self.lock():
+            records = self._load()
+            record = self._live(records, key)
+            if record is None:
+                record = self._renew(records, key, connect)
+            record['users'] += 1
+            self._save(records)
+            return record['token']
+
+    def replace(self, key, rejected_token, connect):
+        """Return a token to use instead of rejected_token.
+
+        If another user already replaced it, that token is returned; otherwise connect() is called.
+        """
+        with self.lock():
+            records = self._load()
+            record = self._live(records, key)
+            if record is not None and record['token'] != rejected_token:
+                if not self._counts(record, rejected_token):
+                    record['users'] += 1  # rejected_token had expired, so its holder was not counted here
+                    self._save(records)
+                return record['token']
+            record = self._renew(records, key, connect, users=1)
+            self._save(records)
+            return record['token']
+
+    def checkin(self, key, token, disconnect):
+        """Stop using token, calling disconnect() with the current token if this was the last user of the key.
+
+        token may be older than the current one, if another user replaced it while it was live; it still counts as a
+        use of the key. A token that expired before it was replaced no longer does.
+        """
+        with self.lock():
+            records = self._load()
+            record = records.get(key)
+            if record is None or not self._counts(record, token):
+                return
+            record['users'] -= 1
+            if record['users'] > 0:
+                self._save(records)
+                return
+            del records[key]
+            self._save(records)
+            if record['expires'] > self._clock():  # an expired token is abandoned
+                disconnect(record['token'])
+
+
+class MemoryTokenStore(TokenStore):
+    """Token store shared between the threads of one process."""
+    def __init__(self, ttl=3600, clock=time.time):
+        super(MemoryTokenStore, self).__init__(ttl, clock)
+        self._lock = threading.RLock()
+        self._records = {}
+
+    @contextmanager
+    def lock(self):
+        with self._lock:
+            yield
+
+    def _load(self):
+        return dict((key, dict(record)) for key, record in self._records.items())
+
+    def _save(self, records):
+        self._records = records
+
+
+class FileTokenStore(TokenStore):
+    """Token store shared between processes through a JSON file, guarded by an exclusive lock on path + '.lock'.
+
+    The file holds live session tokens and is created readable by its owner only.
+    """
+    def __init__(self, path, ttl=3600, clock=time.time):
+        super(FileTokenStore, self).__init__(ttl, clock)
+        self._path = path
+        self._thread_lock = threading.RLock()
+
+    @contextmanager
+    def lock(self):
+        with self._thread_lock:
+            with io.open(self._path + '.lock', 'a+b') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    else:
+                        lock_file.seek(0)
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _load(self):
+        try:
+            with io.open(self._path, 'r', encoding='utf-8') as store:
+                records = json.load(store)
+        except (IOError, OSError, ValueError):
+            return {}
+        return records
+
+    def _save(self, records):
+        partial_path = self._path + '.part'
+        fd = os.open(partial_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with io.open(fd, 'w', encoding='utf-8') as store:
+            store.write(json.dumps(records))
+        os.replace(partial_path, self._path)
@@ -0,0 +1,256 @@
+"""TinyCert transports
+
+A transport carries a signed request payload to the API and returns its response; Session chooses one per
+instance with Session(transport=...). Every transport returns responses with the part of the requests.Response
+interface the session uses (status_code, headers, content, json(), iter_content(), raise_for_status() and close()),
+raises requests.HTTPError for error statuses and requests.ConnectionError (or requests.Timeout) when the server
+cannot be reached, so retries, token refresh and error handling behave identically whichever is used.
+
+- RequestsTransport: the default, a keep-alive requests connection pool speaking HTTP/1.1, with one request in
+  flight per connection.
+- Http2Transport: an httpx client that negotiates HTTP/2 where the server supports it and then multiplexes every
+  concurrent request over a single connection. Requires the optional httpx and h2 dependencies
+  (pip install tinycert[http2]).
+- InProcessTransport: hands requests straight to a FakeTinyCertServer's handle() without sockets, for tests.
+
+Transports are thread-safe. close() releases their connections; they reconnect on demand if used again.
+"""
+
+import json
+import threading
+from urllib.parse import urlsplit
+
+
+def _http_error(response):
+    import requests
+    reason = 'Client Error' if response.status_code < 500 else 'Server Error'
+    return requests.HTTPError('%d %s for url: %s' % (response.status_code, reason, response.url), response=response)
+
+
+class Transport(object):
+    """Base class for transports."""
+    def post(self, url, data, stream=False, timeout=None):
+        """POST the form-encoded payload data to url and return the response.
+
+        :param stream: if True, the body may be read incrementally with iter_content() and the response must be
+            closed once read
+        :param timeout: (connect, read) timeout in seconds, either of which may be None for no limit; exceeding
+            them raises requests.ConnectTimeout or requests.ReadTimeout
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release any open connections."""
+
+
+class TransportResponse(object):
+    """A fully read response, with the requests.Response methods Session relies on."""
+    def __init__(self, status_code, headers, content, url):
+        from requests.structures import CaseInsensitiveDict
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.url = url
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise _http_error(self)
+
+    def close(self):
+        pass
+
+
+class RequestsTransport(Transport):
+    """Keep-alive HTTP/1.1 connection pool built on requests.
+
+    :param pool_connections: number of per-host connection pools to keep
+    :param pool_maxsize: maximum number of connections kept alive per host
+    :param pool_block: if True, block when all pooled connections to a host are busy
+    :param keep_alive: if False, ask the server to close the connection after every request
+    :param max_retries: number of times to retry failed connection attempts
+    """
+    def __init__(self, pool_connections=1, pool_maxsize=10, pool_block=False, keep_alive=True, max_retries=0):
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._keep_alive = keep_alive
+        self._max_retries = max_retries
+        self._http_session = None
+        self._lock = threading.Lock()
+
+    def http_session(self, create=True):
+        """Return the pooled requests.Session, creating it on first use unless create is False."""
+        http_session = self._http_session
+        if http_session is not None or not create:
+            return http_session
+        # The HTTP stack is imported on first use, keeping `import tinycert` cheap for short-lived processes.
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with self._lock:
+            if self._http_session is not None:
+                return self._http_session
+            http_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self._pool_connections,
+                                  pool_maxsize=self._pool_maxsize,
+                                  pool_block=self._pool_block,
+                                  max_retries=self._max_retries)
+            http_session.mount('https://', adapter)
+            http_session.mount('http://', adapter)
+            http_session.headers['content-type'] = 'application/x-www-form-urlencoded'
+            if not self._keep_alive:
+                http_session.headers['connection'] = 'close'
+            self._http_session = http_session
+            return http_session
+
+    def post(self, url, data, stream=False, timeout=None):
+        return self.http_session().post(url, data=data, stream=stream, timeout=timeout)
+
+    def close(self):
+        with self._lock:
+            http_session, self._http_session = self._http_session, None
+        if http_session is not None:
+            http_session.close()
+
+
+class _HttpxResponse(object):
+    """Adapts an httpx.Response to the requests.Response interface, calling release once it is closed."""
+    def __init__(self, response, release):
+        self._response = response
+        self._release = release
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def content(self):
+        return self._response.read()
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+    def iter_content(self, chunk_size=1):
+        try:
+            for chunk in self._response.iter_bytes(chunk_size):
+                yield chunk
+        finally:
+            self.close()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            self._response.read()
+            self.close()
+            raise _http_error(self)
+
+    def close(self):
+        self._response.close()
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+
+class Http2Transport(Transport):
+    """HTTP/2 transport multiplexing concurrent requests over one connection per host, built on httpx.
+
+    HTTP/2 is negotiated with TLS ALPN, so https servers without HTTP/2 support, and plain http servers, are
+    spoken to over HTTP/1.1 instead. Until a response arrives over HTTP/2 (after each close(), on the new
+    connection), at most max_connections requests are in flight at once and further threads wait for a free
+    connection here rather than in httpx's pool, which does not hand queued requests between threads reliably.
+
+    :param max_connections: maximum number of connections per transport; with HTTP/2 one is normally enough
+    :param keep_alive: if False, do not reuse connections between requests
+    """
+    def __init__(self, max_connections=10, keep_alive=True):
+        import httpx  # optional dependency
+        self._httpx = httpx
+        self._max_connections = max_connections
+        self._keep_alive = keep_alive
+        self._client = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._last_version = None
+
+    def _http(self):
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is None:
+                httpx = self._httpx
+                limits = httpx.Limits(max_connections=self._max_connections,
+                                      max_keepalive_connections=self._max_connections if self._keep_alive else 0)
+                self._client = httpx.Client(http2=True, limits=limits,
+                                            headers={'content-type': 'application/x-www-form-urlencoded'})
+            return self._client
+
+    def post(self, url, data, stream=False, timeout=None):
+        client = self._http()
+        slots = self._slots
+        if slots is None:
+            return _HttpxResponse(self._send(client, url, data, stream, timeout), None)
+        connect = timeout[0] if timeout else None
+        if not slots.acquire(timeout=connect):
+            import requests
+            raise requests.ConnectTimeout('no free connection to %s within %ss' % (url, connect))
+        try:
+            response = self._send(client, url, data, stream, timeout)
+        except Exception:
+            slots.release()
+            raise
+        if not stream:
+            slots.release()
+            return _HttpxResponse(response, None)
+        return _HttpxResponse(response, slots.release)
+
+    def _send(self, client, url, data, stream, timeout):
+        import requests
+        httpx = self._httpx
+        connect, read = timeout or (None, None)
+        try:
+            request = client.build_request('POST', url, content=data.encode('utf-8'),
+                                           timeout=httpx.Timeout(read, connect=connect, pool=connect))
+            response = client.send(request, stream=stream)
+        except httpx.ConnectTimeout as error:
+            raise requests.ConnectTimeout(error)
+        except httpx.TimeoutException as error:
+            raise requests.ReadTimeout(error)
+        except httpx.TransportError as error:
+            raise requests.ConnectionError(error)
+        self._last_version = response.http_version
+        if response.http_version == 'HTTP/2':
+            # Requests are multiplexed over one connection from now on, so they need not wait for a free one.
+            self._slots = None
+        return response
+
+    @property
+    def http_version(self):
+        """HTTP version of the most recent response, e.g. 'HTTP/2', or None before any request."""
+        return self._last_version
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+            # The next client may speak HTTP/1.1 again, so it starts out limited to max_connections.
+            self._slots = threading.BoundedSemaphore(self._max_connections)
+        if client is not None:
+            client.close()
+
+
+class InProcessTransport(Transport):
+    """Dispatches requests directly to server.handle(url_path, body), e.g. a FakeTinyCertServer, without sockets.
+
+    The server does not need to be started.
+    """
+    def __init__(self, server):
+        self._server = server
+
+    def post(self, url, data, stream=False, timeout=None):
+        status, payload, headers = self._server.handle(urlsplit(url).path, data)
+        return TransportResponse(status, headers, json.dumps(payload).encode('utf-8'), url)
@@ -0,0 +1,163 @@
+"""TinyCert certificate change feed
+
+This module provides CertificateWatcher, which polls cert/list for a set of CAs and reports what changed since the
+previous poll:
+
+- added: a certificate appeared in the listing
+- state_changed: a certificate's state changed, e.g. good to revoked or hold
+- updated: a certificate's listing changed without a state change, e.g. its expiry after a reissue
+- removed: a certificate is no longer listed, because it was deleted or moved to a state not being watched
+
+Between polls only a compact fingerprint of each certificate is kept (its state and a hash of its listing entry),
+and listings are parsed incrementally as they arrive, so memory stays small however many certificates the CAs
+hold. cert/details is only fetched for certificates whose fingerprint changed.
+
+The fingerprint covers only what cert/list returns (name, status and expiry): a change that shows up in the
+details alone, such as different SANs or subject fields under the same name and expiry, is not reported.
+
+Usage:
+watcher = CertificateWatcher(session, ca_ids=[ca_id], states=State.good.value | State.hold.value)
+for event in watcher.watch(interval=300):
+    print(event.kind, event.cert_id, event.new_state)
+"""
+
+from collections import namedtuple
+import threading
+
+from .bulk import run_bulk
+from .cert import State
+from .inventory import ALL_STATES
+from .models import field
+
+ADDED = 'added'
+STATE_CHANGED = 'state_changed'
+UPDATED = 'updated'
+REMOVED = 'removed'
+
+
+class ChangeEvent(namedtuple('ChangeEvent', ['kind', 'ca_id', 'cert_id', 'old_state', 'new_state', 'record',
+                                             'details'])):
+    """One change seen by a CertificateWatcher.
+
+    - kind: ADDED, STATE_CHANGED, UPDATED or REMOVED
+    - ca_id: CA the certificate belongs to
+    - cert_id: id of the certificate
+    - old_state: State before the change, or None for ADDED (or if unknown)
+    - new_state: State after the change, or None for REMOVED (or if unknown)
+    - record: the certificate's current cert/list entry as a CertificateRecord, or None for REMOVED
+    - details: the certificate's cert/details, or None for REMOVED or if details are not fetched
+    """
+    __slots__ = ()
+
+
+def fingerprint(record):
+    """Return the compact (state bit, hash) fingerprint of a CertificateRecord."""
+    state = record.state.value if record.state is not None else 0
+    return state, hash((record.name, record.status, record.expires))
+
+
+def _state(value):
+    return State(value) if value else None
+
+
+class CertificateWatcher(object):
+    """Detects certificate changes by comparing successive cert/list results.
+
+    Not thread-safe; poll from one thread at a time. Only changes visible in cert/list (name, status and expiry)
+    are detected; see the module documentation.
+
+    :param session: a connected Session
+    :param ca_ids: CAs to watch; defaults to every CA returned by ca/list at each poll
+    :param states: bitwise OR of the State values to list; certificates leaving these states are reported removed
+    :param fetch_details: fetch cert/details for changed certificates and attach it to their events
+    :param emit_initial: report every certificate as added on the first poll, instead of taking it as the baseline
+    :param max_workers: number of cert/details calls to run at once
+    """
+    def __init__(self, session, ca_ids=None, states=ALL_STATES, fetch_details=True, emit_initial=False,
+                 max_workers=8):
+        self._session = session
+        self._ca_ids = None if ca_ids is None else list(ca_ids)
+        self._states = states
+        self._fetch_details = fetch_details
+        self._emit_initial = emit_initial
+        self._max_workers = max_workers
+        self._fingerprints = {}
+        self.polls = 0
+        self.details_fetched = 0
+
+    @property
+    def tracked(self):
+        """Number of certificates currently fingerprinted."""
+        return sum(len(fingerprints) for fingerprints in self._fingerprints.values())
+
+    def poll(self):
+        """List the watched CAs once and return the ChangeEvents since the previous poll.
+
+        A change whose details cannot be fetched is not reported, and is detected again on the next poll.
+        """
+        ca_ids = self._ca_ids
+        if ca_ids is None:
+            ca_ids = [field(ca, 'id') for ca in self._session.ca.list()]
+        baseline = self.polls == 0 and not self._emit_initial
+
+        events = []
+        for ca_id in ca_ids:
+            events.extend(self._poll_ca(ca_id, baseline))
+        for ca_id in set(self._fingerprints) - set(ca_ids):
+            events.extend(self._removed(ca_id, self._fingerprints.pop(ca_id)))
+        self.polls += 1
+        return events
+
+    def _poll_ca(self, ca_id, baseline):
+        known = self._fingerprints.get(ca_id, {})
+        current = {}
+        changes = []
+        for record in self._session.cert.iter_list(ca_id, self._states):
+            new = fingerprint(record)
+            old = known.get(record.id)
+            if old == new or baseline:
+                current[record.id] = new
+                continue
+            if old is not None:
+                current[record.id] = old  # until the change is reported
+            kind = ADDED if old is None else STATE_CHANGED if old[0] != new[0] else UPDATED
+            changes.append((kind, record, old, new))
+
+        events = []
+        if self._fetch_details and changes:
+            fetched = run_bulk(lambda change: self._session.cert.details(change[1].id), changes,
+                               self._max_workers, ordered=True)
+            for result in fetched:
+                self.details_fetched += 1
+                if result.ok:
+                    events.append(self._changed(ca_id, current, result.item, result.result))
+        else:
+            events.extend(self._changed(ca_id, current, change, None) for change in changes)
+
+        gone = dict((cert_id, old) for cert_id, old in known.items() if cert_id not in current)
+        self._fingerprints[ca_id] = current
+        return events + self._removed(ca_id, gone)
+
+    @staticmethod
+    def _changed(ca_id, current, change, details):
+        kind, record, old, new = change
+        current[record.id] = new
+        return ChangeEvent(kind, ca_id, record.id, _state(old[0]) if old else None, _state(new[0]), record, details)
+
+    @staticmethod
+    def _removed(ca_id, fingerprints):
+        return [ChangeEvent(REMOVED, ca_id, cert_id, _state(old[0]), None, None, None)
+                for cert_id, old in fingerprints.items()]
+
+    def watch(self, interval=60.0, stop=None):
+        """Poll every interval seconds, yielding ChangeEvents, until stop (a threading.Event) is set."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            for event in self.poll():
+                yield event
+            stop.wait(interval)
+
+    def run(self, callback, interval=60.0, stop=None):
+        """Poll every interval seconds, calling callback(event) for each ChangeEvent, until stop is set."""
+        for event in self.watch(interval, stop):
+            callback(event)